@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/2026
+
+@author: 23
+
+@desc: Archivage sans affichage de toutes les caméras d'un ou plusieurs serveurs.\
+       Même recherche des caméras et même lecture des flux que le client \
+       (sources.py) : toutes les caméras sont lues par un seul sélecteur, dans \
+       un seul fil. Chaque flux est écrit en continu, en fichiers d'une durée \
+       fixe, par un fil d'écriture commun à toutes les caméras \
+       (recording.RecordThread, une file bornée par caméra) : la mémoire utilisée \
+       ne dépend pas de la durée d'archivage, ni le nombre de fils du nombre de \
+       caméras. Les plus anciens fichiers sont supprimés au-delà des quotas \
+       (retention.py).
+       Usage : archiver.py [--hosts <192.168.10.2>] [--ports <8001-8016>] [--directory <./archive/>] \
+               [--record-format <mjpeg|mp4>] [--segment <600>] [--rescan <30>] [--legacy] \
+               [--storage-quota <Go>] [--camera-quota <Go>] [--max-age <jours>]
+"""
+
+import os
+import sys
+import time
+import queue
+import threading
+import selectors
+
+from sources import VideoSource, discover, parse_ports
+from recording import RecordWriter, RecordThread, PreEventBuffer
+from metrics import process_usage
+from retention import RetentionManager, GIGABYTE, DAY
+import protocol
+
+PREFIX = "[ARCHIVE]"
+DEFAULT_HOSTS = ["192.168.10.2"]
+DEFAULT_PORTS = list(range(8001, 8017))
+DISCOVERY_TIMEOUT = 0.5
+
+
+class CameraArchive():
+    """Archivage d'une caméra : fréquence mesurée, fichiers d'une durée fixe (RecordWriter) et statistiques.
+
+    Les images reçues avant l'ouverture du premier fichier (mesure de la fréquence)
+    sont gardées dans un PreEventBuffer puis écrites au début du fichier.
+    """
+    def __init__(self, address, directory, record_format, segment_seconds, max_queue, writer_thread):
+        self.address = address
+        self.name = str(address[0]) + "_" + str(address[1])
+        self.prefix = PREFIX + "[" + self.name + "]"
+        self.recorder = RecordWriter(self.prefix, os.path.join(directory, self.name, ""), max_queue=max_queue,
+                                     record_format=record_format, camera_id=address[1], segment_seconds=segment_seconds,
+                                     writer_thread=writer_thread)
+        self.waiting = PreEventBuffer(max_seconds=2, max_bytes=2 * 1024 * 1024)
+        self.source = None
+        #Mesure de la fréquence sur les premières images d'une connexion
+        self.first_timestamp = None
+        self.measured_frames = 0
+        #Statistiques
+        self.frames = 0
+        self.bytes = 0
+        self.connections = 0
+
+    def connected(self, source):
+        """Nouvelle connexion à la caméra."""
+        self.source = source
+        self.connections += 1
+        self.first_timestamp = None
+        self.measured_frames = 0
+
+    def lost(self):
+        """Connexion perdue : le fichier en cours est terminé, un nouveau sera ouvert à la reconnexion."""
+        self.source = None
+        self.recorder.close()
+        self.waiting.drain()
+
+    def write(self, jpeg, timestamp_us):
+        """Ajoute une image (bytes) à l'archive, ouvre le fichier au besoin."""
+        self.frames += 1
+        self.bytes += len(jpeg)
+        if not self.recorder.is_open:
+            if self.first_timestamp is None:
+                self.first_timestamp = timestamp_us
+            self.measured_frames += 1
+            elapsed_us = timestamp_us - self.first_timestamp
+            if elapsed_us < 1000000 or self.measured_frames < 2:
+                self.waiting.push(jpeg, timestamp_us)
+                return
+            self.recorder.open(fps=round((self.measured_frames - 1) * 1000000.0 / elapsed_us, 2))
+            for waiting_timestamp_us, waiting_jpeg in self.waiting.drain():
+                self.recorder.write(waiting_jpeg, waiting_timestamp_us)
+        self.recorder.write(jpeg, timestamp_us)
+
+    def stop(self):
+        """Termine le fichier en cours et attend la fin des écritures."""
+        self.recorder.stop()
+
+
+class Archiver():
+    """Lecture de toutes les caméras dans un seul fil et écriture continue de chaque flux."""
+    def __init__(self, hosts, ports, directory="./archive/", record_format="mjpeg", segment_seconds=600,
+                 rescan_interval=30, stream_protocol=protocol.PROTOCOL_BINARY, max_queue=64, report_interval=60,
+                 retention=None):
+        self.hosts = hosts
+        self.ports = ports
+        self.directory = directory
+        self.record_format = record_format
+        self.segment_seconds = segment_seconds
+        self.rescan_interval = rescan_interval
+        self.stream_protocol = stream_protocol
+        self.max_queue = max_queue
+        self.report_interval = report_interval
+        #Suppression des plus anciens fichiers (retention.RetentionManager sur directory), None : aucune
+        self.retention = retention
+        self.selector = selectors.DefaultSelector()
+        #Fil d'écriture commun à toutes les caméras
+        self.writer_thread = RecordThread()
+        #Archives par adresse (conservées après une déconnexion) et adresses connectées
+        self.cameras = {}
+        self.known_addresses = set()
+        self.lock = threading.Lock()
+        self.new_sources = queue.Queue()
+        self.stopping = threading.Event()
+        self.rescan_event = threading.Event()
+        self.thread_discovery = threading.Thread(target=self.discovery_loop, args=(), daemon=True)
+
+    def discovery_loop(self):
+        """Recherche périodique des caméras : les nouvelles sources sont transmises à la boucle de lecture."""
+        while not self.stopping.is_set():
+            with self.lock:
+                exclude = set(self.known_addresses)
+            for sock, address in discover(self.hosts, self.ports, DISCOVERY_TIMEOUT, exclude=exclude):
+                try:
+                    source = VideoSource(sock, address, self.stream_protocol)
+                except OSError:
+                    sock.close()
+                    continue
+                with self.lock:
+                    self.known_addresses.add(address)
+                self.new_sources.put(source)
+            self.rescan_event.wait(self.rescan_interval if self.known_addresses else 2)
+            self.rescan_event.clear()
+
+    def add_sources(self):
+        """Ajoute au sélecteur les sources trouvées par la recherche."""
+        while True:
+            try:
+                source = self.new_sources.get_nowait()
+            except queue.Empty:
+                return
+            camera = self.cameras.get(source.address)
+            if camera is None:
+                camera = self.cameras[source.address] = CameraArchive(source.address, self.directory, self.record_format,
+                                                                      self.segment_seconds, self.max_queue,
+                                                                      self.writer_thread)
+            camera.connected(source)
+            self.selector.register(source, selectors.EVENT_READ, camera)
+            print(camera.prefix + "[INFO] Connected (" + str(len(self.known_addresses)) + " camera(s))")
+
+    def remove_source(self, source, camera, reason):
+        """Retire une source perdue ; elle sera retrouvée par une prochaine recherche."""
+        print(camera.prefix + "[ALERT] Source lost (" + str(reason) + ")")
+        try:
+            self.selector.unregister(source)
+        except (KeyError, ValueError):
+            pass
+        source.close()
+        camera.lost()
+        with self.lock:
+            self.known_addresses.discard(source.address)
+        #Nouvelle tentative rapide
+        self.rescan_event.set()
+
+    def report(self, elapsed):
+        """Affiche le débit, les pertes et la mémoire utilisée."""
+        rss, cpu = process_usage()
+        print(PREFIX + "[STATS] " + str(len(self.known_addresses)) + "/" + str(len(self.cameras)) + " camera(s) connected, RSS "
+              + str(round(rss / 1048576.0, 1)) + " MB, CPU " + str(round(cpu, 1)) + " s")
+        for camera in self.cameras.values():
+            print(camera.prefix + "[STATS] " + str(round(camera.frames / elapsed, 1)) + " fps, "
+                  + str(round(camera.bytes * 8 / elapsed / 1000000.0, 2)) + " Mbit/s, queue "
+                  + str(camera.recorder.queue.qsize()) + "/" + str(self.max_queue) + ", "
+                  + str(camera.recorder.dropped_frames) + " frame(s) dropped, " + str(camera.connections) + " connection(s)")
+            camera.frames = 0
+            camera.bytes = 0
+
+    def run(self):
+        """Boucle de lecture jusqu'à l'arrêt."""
+        print(PREFIX + "[START] Archiving " + ",".join(self.hosts) + " ports " + str(self.ports[0]) + "-" + str(self.ports[-1])
+              + " to " + str(self.directory) + " (" + str(self.record_format) + ", " + str(self.segment_seconds) + " s files)")
+        self.writer_thread.start()
+        self.thread_discovery.start()
+        if self.retention is not None:
+            self.retention.start()
+        last_report = time.monotonic()
+        while not self.stopping.is_set():
+            self.add_sources()
+            if not self.selector.get_map():
+                time.sleep(0.2)
+                continue
+            for key, mask in self.selector.select(timeout=1):
+                source = key.fileobj
+                camera = key.data
+                try:
+                    frames = source.poll()
+                except (OSError, protocol.ProtocolError) as err:
+                    self.remove_source(source, camera, err)
+                    continue
+                for metadatas_text, jpg, timestamp_us in frames:
+                    camera.write(bytes(jpg), timestamp_us)
+            now = time.monotonic()
+            if now - last_report >= self.report_interval:
+                self.report(now - last_report)
+                last_report = now
+
+    def stop(self):
+        """Ferme les connexions et termine les fichiers en cours."""
+        self.stopping.set()
+        self.rescan_event.set()
+        if self.retention is not None:
+            self.retention.stop()
+        for key in list(self.selector.get_map().values()):
+            key.fileobj.close()
+        self.selector.close()
+        for camera in self.cameras.values():
+            camera.stop()
+        print(PREFIX + "[INFO] " + str(len(self.cameras)) + " camera(s) archived, files closed")
+
+
+def main():
+    """Fonction principale : vérification des arguments et démarrage de l'archivage."""
+    usage = "Usage : archiver.py [--hosts <192.168.10.2,...>] [--ports <8001-8016>] [--directory <./archive/>]\n" \
+            "        [--record-format <mjpeg|mp4>] [--segment <seconds>] [--rescan <seconds>] [--legacy]\n" \
+            "        [--storage-quota <GB>] [--camera-quota <GB>] [--max-age <days>]"
+    hosts = DEFAULT_HOSTS
+    ports = DEFAULT_PORTS
+    directory = "./archive/"
+    record_format = "mjpeg"
+    segment_seconds = 600
+    rescan_interval = 30
+    stream_protocol = protocol.PROTOCOL_BINARY
+    quotas = {"--storage-quota": 0, "--camera-quota": 0, "--max-age": 0}
+    args = sys.argv[1:]
+    i = 0
+    while i < len(args):
+        if args[i] == "--legacy":
+            stream_protocol = protocol.PROTOCOL_LEGACY
+        elif i + 1 >= len(args):
+            print(usage)
+            sys.exit()
+        elif args[i] == "--hosts":
+            hosts = [host for host in args[i + 1].split(",") if host]
+            i += 1
+        elif args[i] == "--ports":
+            try:
+                ports = parse_ports(args[i + 1])
+            except ValueError:
+                print("--ports must be a list of int (8001-8016,8020)")
+                sys.exit()
+            i += 1
+        elif args[i] == "--directory":
+            directory = args[i + 1]
+            i += 1
+        elif args[i] == "--record-format":
+            if args[i + 1] not in ("mp4", "mjpeg"):
+                print("--record-format must be mp4 or mjpeg")
+                sys.exit()
+            record_format = args[i + 1]
+            i += 1
+        elif args[i] in ("--segment", "--rescan"):
+            if not args[i + 1].isdigit() or int(args[i + 1]) == 0:
+                print(args[i] + " must be a positive int")
+                sys.exit()
+            if args[i] == "--segment":
+                segment_seconds = int(args[i + 1])
+            else:
+                rescan_interval = int(args[i + 1])
+            i += 1
+        elif args[i] in quotas:
+            if not args[i + 1].isdigit():
+                print(args[i] + " must be int")
+                sys.exit()
+            quotas[args[i]] = int(args[i + 1])
+            i += 1
+        else:
+            print(usage)
+            sys.exit()
+        i += 1
+    if not hosts or not ports:
+        print(usage)
+        sys.exit()
+    retention = None
+    if any(quotas.values()):
+        retention = RetentionManager(directory, quotas["--storage-quota"] * GIGABYTE, quotas["--camera-quota"] * GIGABYTE,
+                                     quotas["--max-age"] * DAY)
+    archiver = Archiver(hosts, ports, directory, record_format, segment_seconds, rescan_interval, stream_protocol,
+                        retention=retention)
+    try:
+        archiver.run()
+    except KeyboardInterrupt:
+        print(PREFIX + "[ALERT] Stopped by user...")
+    archiver.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/2026
+
+@author: 23
+
+@desc: Benchmark des détecteurs de mouvement sur une vidéo enregistrée.\
+       Compare l'ancienne détection (référence fixe, décodage pleine résolution, \
+       boucle sur findContours) aux modèles de fond adaptatifs de detection.py.
+       Usage : bench_detector.py <video.mp4 | dossier de .jpg> [scale]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+import cv2
+
+from detection import MotionDetector
+
+
+def load_jpegs(path, limit=2000):
+    """Renvoie les images de la vidéo (ou du dossier) encodées en JPEG, comme reçues de la caméra."""
+    jpegs = []
+    if os.path.isdir(path):
+        for filename in sorted(os.listdir(path))[:limit]:
+            if filename.lower().endswith((".jpg", ".jpeg")):
+                with open(os.path.join(path, filename), "rb") as jpeg_file:
+                    jpegs.append(jpeg_file.read())
+        return jpegs
+    capture = cv2.VideoCapture(path)
+    while len(jpegs) < limit:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        jpegs.append(cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 80])[1].tobytes())
+    capture.release()
+    return jpegs
+
+
+class LegacyDetector():
+    """Détection d'origine de stream_and_surveillance.py."""
+    def __init__(self):
+        self.img_reference = None
+
+    def analyse(self, jpeg):
+        """Renvoie True si un contour de plus de 500 pixels diffère de la référence."""
+        jpg = cv2.imdecode(np.frombuffer(jpeg, dtype='int8'), cv2.IMREAD_COLOR)
+        gray = cv2.cvtColor(jpg, cv2.COLOR_BGR2GRAY)
+        gray = cv2.GaussianBlur(gray, (21, 21), 0)
+        if self.img_reference is None:
+            self.img_reference = gray
+            return False
+        frame_delta = cv2.absdiff(self.img_reference, gray)
+        thresh = cv2.threshold(frame_delta, 50, 255, cv2.THRESH_BINARY)[1]
+        thresh = cv2.dilate(thresh, None, iterations=2)
+        cnts = cv2.findContours(thresh.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        cnts = cnts[0] if len(cnts) == 2 else cnts[1]
+        detected = False
+        for c in cnts:
+            if cv2.contourArea(c) >= 500:
+                detected = True
+        return detected
+
+
+def run(name, analyse, jpegs):
+    """Analyse toutes les images, affiche le débit et la proportion d'images en mouvement."""
+    motion = 0
+    begin = time.perf_counter()
+    for jpeg in jpegs:
+        result = analyse(jpeg)
+        if result is True or (result is not None and result is not False and result.motion):
+            motion += 1
+    elapsed = time.perf_counter() - begin
+    print("%-28s %8.1f fps %6.1f%% frames with motion" % (name, len(jpegs) / elapsed, 100.0 * motion / len(jpegs)))
+
+
+def main():
+    """Point d'entrée du benchmark."""
+    if len(sys.argv) < 2:
+        print("Usage : bench_detector.py <video.mp4 | jpeg directory> [scale]")
+        sys.exit()
+    scale = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    jpegs = load_jpegs(sys.argv[1])
+    if len(jpegs) == 0:
+        print("No frame found in " + str(sys.argv[1]))
+        sys.exit()
+    print(str(len(jpegs)) + " frame(s), detection scale 1/" + str(scale))
+    run("legacy (static reference)", LegacyDetector().analyse, jpegs)
+    run("running average", MotionDetector("average", scale=scale, idle_interval=1).analyse, jpegs)
+    run("MOG2", MotionDetector("mog", scale=scale, idle_interval=1).analyse, jpegs)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/2026
+
+@author: 23
+
+@desc: Benchmark de bout en bout du serveur de diffusion et de surveillance.\
+       Pour chaque nombre de caméras demandé : caméras simulées (fake_camera.py), \
+       serveur(s) stream_and_surveillance.py lancés comme en production (un \
+       processus par caméra ou mode multi-caméras), client sans affichage \
+       (headless_client.py). Après une période de chauffe, mesure pendant la durée \
+       demandée : images par seconde reçues par le client, CPU et mémoire du \
+       serveur (processus de détection compris), taux d'images perdues, latence \
+       entre l'envoi par la caméra et la réception par le client, et mesures du \
+       serveur (metrics.py). Résultats en JSON, pour suivre les régressions.
+       Usage : bench_end_to_end.py [--cameras <1,4,16>] [--mode <single|multi>] [--duration <30>] \
+               [--warmup <5>] [--fps <25>] [--size <640x480>] [--scenario <idle:10,walk:5>] \
+               [--replay <dossier | .mjpeg | vidéo>] [--legacy] [--output <results.json>]
+       Linux uniquement (CPU et mémoire lus dans /proc).
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import platform
+import tempfile
+import subprocess
+import urllib.request
+
+BENCHMARK_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIRECTORY = os.path.join(BENCHMARK_DIRECTORY, "..")
+sys.path.insert(0, ROOT_DIRECTORY)
+
+import protocol
+from fake_camera import FakeCameraGroup, load_frames, DEFAULT_SCENARIO
+from headless_client import HeadlessClient
+
+PREFIX = "[BENCH]"
+#Ports des caméras simulées, des serveurs et de leurs mesures
+CAMERA_PORT = 18101
+STREAM_PORT = 28101
+METRICS_PORT = 38101
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def read_proc_stat(pid):
+    """(ppid, temps CPU en secondes, mémoire résidente en octets) d'un processus, None s'il n'existe plus."""
+    try:
+        with open("/proc/" + str(pid) + "/stat", "r") as stat:
+            fields = stat.read().rsplit(")", 1)[1].split()
+    except (OSError, IndexError):
+        return None
+    return int(fields[1]), (int(fields[11]) + int(fields[12])) / float(CLOCK_TICKS), int(fields[21]) * PAGE_SIZE
+
+
+def process_tree_usage(root_pids):
+    """(temps CPU en s, mémoire résidente en octets) des processus donnés et de leurs descendants."""
+    children = {}
+    usage = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            stat = read_proc_stat(entry)
+            if stat is not None:
+                children.setdefault(stat[0], []).append(int(entry))
+                usage[int(entry)] = stat
+    cpu = 0.0
+    rss = 0
+    stack = list(root_pids)
+    while stack:
+        pid = stack.pop()
+        if pid in usage:
+            cpu += usage[pid][1]
+            rss += usage[pid][2]
+        stack.extend(children.get(pid, []))
+    return cpu, rss
+
+
+def read_metrics(port, timeout=1):
+    """Mesures d'un serveur (metrics.py) : {(nom, caméra): valeur}, None s'il ne répond pas."""
+    try:
+        with urllib.request.urlopen("http://127.0.0.1:" + str(port) + "/metrics", timeout=timeout) as response:
+            text = response.read().decode()
+    except OSError:
+        return None
+    metrics = {}
+    for line in text.splitlines():
+        name, _, value = line.rpartition(" ")
+        if "_bucket" in name or not name:
+            continue
+        camera = None
+        if "{" in name:
+            name, _, labels = name.partition("{")
+            for label in labels.rstrip("}").split(","):
+                key, _, label_value = label.partition("=")
+                if key == "camera":
+                    camera = label_value.strip('"')
+                elif key == "stage":
+                    name += "_" + label_value.strip('"')
+        metrics[(name, camera)] = float(value)
+    return metrics
+
+
+def metrics_delta(before, after, name):
+    """Somme sur toutes les caméras de l'évolution d'une mesure entre deux relevés."""
+    total = 0.0
+    for key, value in after.items():
+        if key[0] == name:
+            total += value - before.get(key, 0.0)
+    return total
+
+
+def start_servers(cameras, mode, directory):
+    """Lance le(s) serveur(s) à tester, renvoie (processus, ports des mesures)."""
+    script = os.path.join(ROOT_DIRECTORY, "stream_and_surveillance.py")
+    log = open(os.path.join(directory, "server.log"), "ab")
+    processes = []
+    if mode == "single":
+        metrics_ports = []
+        for index in range(cameras):
+            command = [sys.executable, script, "--url", "http://127.0.0.1:" + str(CAMERA_PORT + index),
+                       "--port", str(STREAM_PORT + index), "--metrics-port", str(METRICS_PORT + index)]
+            processes.append(subprocess.Popen(command, cwd=directory, stdout=log, stderr=subprocess.STDOUT))
+            metrics_ports.append(METRICS_PORT + index)
+    else:
+        config_path = os.path.join(directory, "cameras.json")
+        with open(config_path, "w") as config_file:
+            json.dump({"metrics_port": METRICS_PORT,
+                       "cameras": [{"url": "http://127.0.0.1:" + str(CAMERA_PORT + index), "port": STREAM_PORT + index}
+                                   for index in range(cameras)]}, config_file)
+        command = [sys.executable, script, "--config", config_path]
+        processes.append(subprocess.Popen(command, cwd=directory, stdout=log, stderr=subprocess.STDOUT))
+        metrics_ports = [METRICS_PORT]
+    log.close()
+    return processes, metrics_ports
+
+
+def stop_servers(processes):
+    """Arrêt des serveurs comme par Ctrl+C, puis de force s'ils ne s'arrêtent pas."""
+    for process in processes:
+        if process.poll() is None:
+            process.send_signal(signal.SIGINT)
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def collect_metrics(metrics_ports):
+    """Mesures de tous les serveurs réunies."""
+    metrics = {}
+    for port in metrics_ports:
+        metrics.update(read_metrics(port) or {})
+    return metrics
+
+
+def run_benchmark(cameras, mode, frames, fps, duration, warmup, stream_protocol):
+    """Une mesure pour un nombre de caméras, renvoie ses résultats (dictionnaire)."""
+    camera_ports = [CAMERA_PORT + index for index in range(cameras)]
+    group = FakeCameraGroup(camera_ports, frames, fps)
+    group.start()
+    directory = tempfile.mkdtemp(prefix="bench-")
+    processes, metrics_ports = start_servers(cameras, mode, directory)
+    pids = [process.pid for process in processes]
+    client = HeadlessClient(stream_protocol)
+    try:
+        #Attente du démarrage des serveurs (port des mesures ouvert) puis connexion du client
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline and any(read_metrics(port) is None for port in metrics_ports):
+            if any(process.poll() is not None for process in processes):
+                raise RuntimeError("Server exited, see " + os.path.join(directory, "server.log"))
+            time.sleep(0.5)
+        while time.monotonic() < deadline and client.connect(["127.0.0.1"], [STREAM_PORT + index for index in range(cameras)]) < cameras:
+            time.sleep(0.5)
+        if len(client.sources) < cameras:
+            raise RuntimeError(str(len(client.sources)) + "/" + str(cameras) + " camera(s) reachable")
+        client.run(warmup)
+        #Début de la mesure
+        camera_before = group.stats()
+        metrics_before = collect_metrics(metrics_ports)
+        cpu_before, rss_before = process_tree_usage(pids)
+        client.start_window()
+        client.run(duration)
+        client.stop_window()
+        cpu_after, rss_after = process_tree_usage(pids)
+        metrics_after = collect_metrics(metrics_ports)
+        camera_after = group.stats()
+    finally:
+        client.close()
+        stop_servers(processes)
+        group.close()
+    received = client.results()
+    elapsed = received["duration"]
+    sent = sum(camera_after[port][0] - camera_before[port][0] for port in camera_ports)
+    late = sum(camera_after[port][2] - camera_before[port][2] for port in camera_ports)
+    return {"cameras": cameras,
+            "mode": mode,
+            "duration": elapsed,
+            "source": {"fps_per_camera": round(sent / elapsed / cameras, 2), "late_frames": late},
+            "server": {"fps_in_per_camera": round(metrics_delta(metrics_before, metrics_after, "rds_frames_in_total")
+                                                  / elapsed / cameras, 2),
+                       "cpu_percent_per_camera": round(100.0 * (cpu_after - cpu_before) / elapsed / cameras, 2),
+                       "rss_mb": round(rss_after / 1048576.0, 1),
+                       "rss_growth_mb": round((rss_after - rss_before) / 1048576.0, 2),
+                       "frames_analysed": int(metrics_delta(metrics_before, metrics_after, "rds_frames_analysed_total")),
+                       "buffer_resets": int(metrics_delta(metrics_before, metrics_after, "rds_buffer_resets_total")),
+                       "frames_dropped_clients": int(metrics_delta(metrics_before, metrics_after,
+                                                                   "rds_frames_dropped_clients_total")),
+                       "frames_dropped_record": int(metrics_delta(metrics_before, metrics_after,
+                                                                  "rds_frames_dropped_record_total")),
+                       "frame_latency_ms_avg": round(
+                           metrics_delta(metrics_before, metrics_after, "rds_stage_latency_ms_sum_frame")
+                           / max(1.0, metrics_delta(metrics_before, metrics_after, "rds_stage_latency_ms_count_frame")), 3)},
+            "client": {"fps_per_camera": received["fps_per_camera"],
+                       "drop_rate": round(max(0.0, 1.0 - received["frames"] / float(max(1, sent))), 4),
+                       "latency_ms": received["latency_ms"],
+                       "parser_cpu_percent": received["parser_cpu_percent"],
+                       "errors": received["errors"]},
+            "log": os.path.join(directory, "server.log")}
+
+
+def main():
+    """Fonction principale : mesures pour chaque nombre de caméras, résultats en JSON."""
+    usage = "Usage : bench_end_to_end.py [--cameras <1,4,16>] [--mode <single|multi>] [--duration <30>] [--warmup <5>]\n" \
+            "        [--fps <25>] [--size <640x480>] [--scenario <idle:10,walk:5>] [--replay <dir | .mjpeg | video>]\n" \
+            "        [--legacy] [--output <results.json>]"
+    options = {"--cameras": "1,4", "--mode": "multi", "--duration": "30", "--warmup": "5", "--fps": "25",
+               "--size": "640x480", "--scenario": DEFAULT_SCENARIO, "--replay": None, "--output": None}
+    stream_protocol = protocol.PROTOCOL_BINARY
+    args = sys.argv[1:]
+    i = 0
+    while i < len(args):
+        if args[i] == "--legacy":
+            stream_protocol = protocol.PROTOCOL_LEGACY
+        elif args[i] in options and i + 1 < len(args):
+            options[args[i]] = args[i + 1]
+            i += 1
+        else:
+            print(usage)
+            sys.exit()
+        i += 1
+    for name in ("--duration", "--warmup", "--fps"):
+        if not options[name].isdigit():
+            print(name + " must be int")
+            sys.exit()
+    if options["--mode"] not in ("single", "multi"):
+        print("--mode must be single or multi")
+        sys.exit()
+    try:
+        camera_counts = [int(count) for count in options["--cameras"].split(",")]
+        frames = load_frames(options["--scenario"], options["--replay"], int(options["--fps"]), options["--size"])
+    except (OSError, ValueError) as err:
+        print(PREFIX + "[ERROR] " + str(err))
+        sys.exit()
+    results = {"date": time.strftime("%Y-%m-%d %H:%M:%S"),
+               "host": platform.node(),
+               "python": platform.python_version(),
+               "cpu_count": os.cpu_count(),
+               "parameters": {"mode": options["--mode"], "fps": int(options["--fps"]), "size": options["--size"],
+                              "scenario": options["--scenario"] if options["--replay"] is None else None,
+                              "replay": options["--replay"], "protocol": stream_protocol,
+                              "duration": int(options["--duration"]), "warmup": int(options["--warmup"]),
+                              "frame_count": len(frames),
+                              "frame_size_avg": int(sum(len(frame) for frame in frames) / len(frames))},
+               "runs": []}
+    for cameras in camera_counts:
+        print(PREFIX + "[INFO] " + str(cameras) + " camera(s), " + options["--mode"] + " mode...", file=sys.stderr)
+        try:
+            run = run_benchmark(cameras, options["--mode"], frames, int(options["--fps"]), int(options["--duration"]),
+                                int(options["--warmup"]), stream_protocol)
+        except (OSError, RuntimeError) as err:
+            print(PREFIX + "[ERROR] " + str(cameras) + " camera(s) : " + str(err), file=sys.stderr)
+            run = {"cameras": cameras, "mode": options["--mode"], "error": str(err)}
+        results["runs"].append(run)
+    output = json.dumps(results, indent=2)
+    if options["--output"] is not None:
+        with open(options["--output"], "w") as output_file:
+            output_file.write(output + "\n")
+        print(PREFIX + "[INFO] Results saved as " + options["--output"], file=sys.stderr)
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
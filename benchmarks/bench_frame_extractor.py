@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/2026
+
+@author: 23
+
+@desc: Micro-benchmark de l'extraction d'images MJPEG :\
+       ancienne méthode (data += read(), find() depuis le début, re-découpage) \
+       contre FrameExtractor (tampon réutilisé, recherche incrémentale, vues).
+"""
+
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mjpeg import FrameExtractor
+
+
+def make_stream(frame_count, frame_size, prefix=b"camera:8001;timestamp:2021-05-19 12:00:00;record:False"):
+    """Génère un flux de frame_count images factices de frame_size octets."""
+    rng = random.Random(23)
+    #Corps sans octet 0xFF pour ne pas créer de faux marqueurs
+    body = bytes(rng.randrange(0, 0xff) for _ in range(frame_size))
+    frame = b'\xff\xd8' + body + b'\xff\xd9'
+    return prefix.join([b''] + [frame] * frame_count), frame_count
+
+
+def legacy(stream, chunk):
+    """Reproduction de l'ancienne boucle de stream_and_surveillance.py / client.py."""
+    data = b''
+    count = 0
+    for pos in range(0, len(stream), chunk):
+        data += stream[pos:pos + chunk]
+        img_start = data.find(b'\xff\xd8')
+        img_end = data.find(b'\xff\xd9')
+        if img_start > -1 and img_end > -1:
+            extracted_img = data[img_start:img_end+2]
+            data = data[img_end+2:]
+            count += 1
+    return count
+
+
+def extractor(stream, chunk):
+    """Même flux traité par FrameExtractor."""
+    frame_extractor = FrameExtractor()
+    view = memoryview(stream)
+    count = 0
+    for pos in range(0, len(stream), chunk):
+        frame_extractor.feed(view[pos:pos + chunk])
+        for header, frame in frame_extractor.frames():
+            count += 1
+    return count
+
+
+def main():
+    """Lance les mesures pour plusieurs tailles d'image et de lecture."""
+    print("frame_size chunk  legacy(fps)  extractor(fps)  speedup  frames(legacy/extractor)")
+    for frame_size in (8000, 30000, 120000):
+        for chunk in (512, 4096):
+            stream, frame_count = make_stream(200, frame_size)
+            results = []
+            for func in (legacy, extractor):
+                begin = time.perf_counter()
+                found = func(stream, chunk)
+                results.append((frame_count / (time.perf_counter() - begin), found))
+            print("%10d %5d %12.0f %15.0f %7.1fx  %d/%d" % (frame_size, chunk, results[0][0], results[1][0],
+                                                          results[1][0] / results[0][0],
+                                                          results[0][1], results[1][1]))
+
+if __name__ == '__main__':
+    main()
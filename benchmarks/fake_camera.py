@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/2026
+
+@author: 23
+
+@desc: Caméra IP simulée : flux MJPEG sur HTTP (multipart/x-mixed-replace), \
+       comme les caméras du réseau 192.168.10.x.\
+       Les images sont générées (scénario de mouvement) ou rejouées (dossier \
+       de .jpg, séquence .mjpeg enregistrée, vidéo), encodées une seule fois au \
+       démarrage puis envoyées en boucle à la fréquence demandée. Chaque image \
+       porte son heure d'envoi dans un segment commentaire JPEG, ce qui permet \
+       au client de mesurer la latence de bout en bout.
+       Usage : fake_camera.py [--cameras <n>] [--port <18001>] [--fps <25>] [--size <640x480>] \
+               [--scenario <idle:10,walk:5,...>] [--replay <dossier | .mjpeg | vidéo>] [--quality <80>]
+"""
+
+import os
+import sys
+import time
+import struct
+import asyncio
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+PREFIX = "[FAKE CAMERA]"
+BOUNDARY = b"frame"
+#Scénario par défaut : repos, passage d'une personne, changement de lumière
+DEFAULT_SCENARIO = "idle:10,walk:5,idle:5,flicker:2"
+SCENARIO_KINDS = ("idle", "walk", "flicker", "noise")
+#Segment commentaire JPEG (0xFFFE) : marque et heure d'envoi en µs (time.time()), en chiffres
+#ASCII pour ne jamais former de marqueur JPEG (0xFFD8, 0xFFD9) dans le commentaire
+COMMENT_MARKER = b'\xff\xfe'
+STAMP_MAGIC = b'RDST'
+STAMP_SIZE = len(STAMP_MAGIC) + 16
+
+
+def stamp(jpeg, sent_at):
+    """Ajoute l'heure d'envoi dans un segment commentaire placé juste après le marqueur de début."""
+    payload = STAMP_MAGIC + str(int(sent_at * 1000000)).zfill(16).encode()
+    return b''.join((jpeg[:2], COMMENT_MARKER, struct.pack('!H', len(payload) + 2), payload, jpeg[2:]))
+
+
+def read_stamp(jpeg):
+    """Heure d'envoi d'une image marquée par stamp(), None sinon (jpeg : bytes ou memoryview)."""
+    end = 6 + STAMP_SIZE
+    if len(jpeg) < end or bytes(jpeg[2:4]) != COMMENT_MARKER or bytes(jpeg[6:10]) != STAMP_MAGIC:
+        return None
+    return int(bytes(jpeg[10:end])) / 1000000.0
+
+
+def parse_scenario(text):
+    """Scénario "idle:10,walk:5" -> [("idle", 10.0), ("walk", 5.0)]."""
+    scenario = []
+    for part in text.split(","):
+        kind, _, seconds = part.partition(":")
+        if kind not in SCENARIO_KINDS:
+            raise ValueError("Unknown scenario step : " + str(kind) + " (" + ", ".join(SCENARIO_KINDS) + ")")
+        scenario.append((kind, float(seconds or 5)))
+    return scenario
+
+
+def render_scenario(scenario, fps, width, height, quality=80, max_frames=3000):
+    """Images JPEG d'un scénario : scène fixe, bruit du capteur, personne qui traverse, changement de lumière."""
+    import numpy as np
+    import cv2
+    rng = np.random.RandomState(23)
+    #Scène fixe : dégradé et quelques objets
+    background = np.tile(np.linspace(60, 180, width, dtype=np.float32), (height, 1))
+    background = cv2.merge([background, background * 0.9, background * 0.8])
+    cv2.rectangle(background, (width // 10, height // 2), (width // 3, height - 10), (90, 60, 40), -1)
+    cv2.rectangle(background, (2 * width // 3, height // 5), (width - 20, height // 2), (40, 120, 160), -1)
+    frames = []
+    for kind, seconds in scenario:
+        count = max(1, int(seconds * fps))
+        for index in range(count):
+            if len(frames) >= max_frames:
+                print(PREFIX + "[ALERT] Scenario truncated to " + str(max_frames) + " frames")
+                return frames
+            frame = background.copy()
+            if kind == "walk":
+                #Silhouette qui traverse l'image de gauche à droite pendant l'étape
+                x = int((width + width // 6) * index / count) - width // 6
+                cv2.rectangle(frame, (x, height // 3), (x + width // 6, height - 20), (30, 30, 30), -1)
+            elif kind == "flicker":
+                frame *= 1.3 if (index // max(1, int(fps / 2))) % 2 == 0 else 0.8
+            amplitude = 25 if kind == "noise" else 3
+            frame += rng.normal(0, amplitude, (height, width, 1)).astype(np.float32)
+            image = np.clip(frame, 0, 255).astype(np.uint8)
+            ok, jpeg = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            if ok:
+                frames.append(jpeg.tobytes())
+    return frames
+
+
+def load_replay(path, width=None, height=None, quality=80, max_frames=3000):
+    """Images JPEG à rejouer : dossier de .jpg, séquence .mjpeg (recording.py) ou vidéo (ré-encodée)."""
+    if os.path.isdir(path):
+        frames = []
+        for filename in sorted(os.listdir(path)):
+            if filename.lower().endswith((".jpg", ".jpeg")) and len(frames) < max_frames:
+                with open(os.path.join(path, filename), "rb") as jpeg_file:
+                    frames.append(jpeg_file.read())
+        return frames
+    if path.endswith(".mjpeg"):
+        from recording import read_jpeg_sequence
+        frames = []
+        for timestamp_us, jpeg in read_jpeg_sequence(path):
+            frames.append(jpeg)
+            if len(frames) >= max_frames:
+                break
+        return frames
+    import cv2
+    capture = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < max_frames:
+        ok, image = capture.read()
+        if not ok:
+            break
+        if width and height:
+            image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+        ok, jpeg = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if ok:
+            frames.append(jpeg.tobytes())
+    capture.release()
+    return frames
+
+
+class FakeCamera():
+    """Une caméra simulée : chaque client reçoit le flux MJPEG à fps images par seconde."""
+    def __init__(self, port, frames, fps=25, host="127.0.0.1"):
+        self.port = port
+        self.frames = frames
+        self.fps = fps
+        self.host = host
+        self.server = None
+        #Statistiques (tous clients confondus)
+        self.sent_frames = 0
+        self.sent_bytes = 0
+        self.late_frames = 0
+        self.clients = 0
+
+    async def start(self):
+        """Ouvre le port de la caméra dans la boucle courante."""
+        self.server = await asyncio.start_server(self.handle_client, self.host, self.port)
+
+    async def handle_client(self, reader, writer):
+        """Lecture de la requête HTTP puis envoi des images jusqu'à la déconnexion du client."""
+        try:
+            await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), 5)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, OSError):
+            writer.close()
+            return
+        self.clients += 1
+        loop = asyncio.get_event_loop()
+        interval = 1.0 / self.fps
+        #Les caméras ne sont pas synchronisées entre elles
+        index = self.port % len(self.frames)
+        try:
+            writer.write(b"HTTP/1.0 200 OK\r\nContent-Type: multipart/x-mixed-replace; boundary=" + BOUNDARY + b"\r\n\r\n")
+            next_time = loop.time()
+            while True:
+                jpeg = stamp(self.frames[index], time.time())
+                index = (index + 1) % len(self.frames)
+                writer.write(b"--" + BOUNDARY + b"\r\nContent-Type: image/jpeg\r\nContent-Length: "
+                             + str(len(jpeg)).encode() + b"\r\n\r\n")
+                writer.write(jpeg)
+                writer.write(b"\r\n")
+                await writer.drain()
+                self.sent_frames += 1
+                self.sent_bytes += len(jpeg)
+                next_time += interval
+                delay = next_time - loop.time()
+                if delay < -interval:
+                    #Client trop lent : l'image en retard est comptée, le rythme repart de maintenant
+                    self.late_frames += 1
+                    next_time = loop.time()
+                    delay = 0
+                await asyncio.sleep(max(0.0, delay))
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.clients -= 1
+            writer.close()
+
+    def stats(self):
+        """Statistiques de la caméra : (images envoyées, octets envoyés, images en retard)."""
+        return self.sent_frames, self.sent_bytes, self.late_frames
+
+    def close(self):
+        """Ferme le port de la caméra."""
+        if self.server is not None:
+            self.server.close()
+
+
+class FakeCameraGroup():
+    """Plusieurs caméras simulées dans une boucle asyncio tournant dans un fil de fond."""
+    def __init__(self, ports, frames, fps=25, host="127.0.0.1"):
+        self.cameras = [FakeCamera(port, frames, fps, host) for port in ports]
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, args=(), daemon=True)
+
+    def start(self):
+        """Démarre la boucle et ouvre les ports de toutes les caméras."""
+        self.thread.start()
+        for camera in self.cameras:
+            asyncio.run_coroutine_threadsafe(camera.start(), self.loop).result(5)
+
+    def stats(self):
+        """Statistiques par port : {port: (images envoyées, octets envoyés, images en retard)}."""
+        return {camera.port: camera.stats() for camera in self.cameras}
+
+    def close(self):
+        """Ferme les caméras et arrête la boucle."""
+        for camera in self.cameras:
+            self.loop.call_soon_threadsafe(camera.close)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=2)
+
+
+def parse_size(text):
+    """Résolution "640x480" -> (640, 480)."""
+    width, _, height = text.lower().partition("x")
+    if not width.isdigit() or not height.isdigit():
+        raise ValueError("Invalid size : " + str(text))
+    return int(width), int(height)
+
+
+def load_frames(scenario=DEFAULT_SCENARIO, replay=None, fps=25, size="640x480", quality=80):
+    """Images de la caméra simulée (rejouées ou générées)."""
+    width, height = parse_size(size)
+    if replay is not None:
+        frames = load_replay(replay, width, height, quality)
+    else:
+        frames = render_scenario(parse_scenario(scenario), fps, width, height, quality)
+    if not frames:
+        raise ValueError("No frame to send")
+    return frames
+
+
+def main():
+    """Fonction principale : caméras simulées jusqu'à l'arrêt par l'utilisateur."""
+    usage = "Usage : fake_camera.py [--cameras <n>] [--port <18001>] [--fps <25>] [--size <640x480>]\n" \
+            "        [--scenario <idle:10,walk:5,flicker:2,noise:3>] [--replay <dir | .mjpeg | video>] [--quality <80>]"
+    options = {"--cameras": "1", "--port": "18001", "--fps": "25", "--size": "640x480",
+               "--scenario": DEFAULT_SCENARIO, "--replay": None, "--quality": "80"}
+    if len(sys.argv) % 2 == 0:
+        print(usage)
+        sys.exit()
+    for i in range(1, len(sys.argv), 2):
+        if sys.argv[i] not in options:
+            print(usage)
+            sys.exit()
+        options[sys.argv[i]] = sys.argv[i + 1]
+    for name in ("--cameras", "--port", "--fps", "--quality"):
+        if not options[name].isdigit():
+            print(name + " must be int")
+            sys.exit()
+    try:
+        frames = load_frames(options["--scenario"], options["--replay"], int(options["--fps"]), options["--size"],
+                             int(options["--quality"]))
+    except (OSError, ValueError) as err:
+        print(PREFIX + "[ERROR] " + str(err))
+        sys.exit()
+    first_port = int(options["--port"])
+    ports = list(range(first_port, first_port + int(options["--cameras"])))
+    group = FakeCameraGroup(ports, frames, int(options["--fps"]), host="0.0.0.0")
+    group.start()
+    print(PREFIX + "[START] " + str(len(ports)) + " camera(s) on port(s) " + str(ports[0]) + "-" + str(ports[-1])
+          + ", " + str(len(frames)) + " frame(s) at " + options["--fps"] + " fps")
+    try:
+        while True:
+            time.sleep(10)
+            for port, (sent_frames, sent_bytes, late_frames) in sorted(group.stats().items()):
+                print(PREFIX + "[STATS] Port " + str(port) + " : " + str(sent_frames) + " frame(s) sent, "
+                      + str(late_frames) + " late")
+    except KeyboardInterrupt:
+        print(PREFIX + "[ALERT] Stopped by user...")
+    group.close()
+
+if __name__ == '__main__':
+    main()
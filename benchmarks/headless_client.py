@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/2026
+
+@author: 23
+
+@desc: Client de test sans affichage.\
+       Lit toutes les caméras d'un serveur avec le même code que le client \
+       (sources.discover, sources.VideoSource) et mesure le nombre d'images \
+       reçues, le temps CPU du décodage des flux et la latence de bout en bout \
+       des images marquées par fake_camera.py.
+       Usage : headless_client.py [--hosts <127.0.0.1>] [--ports <8001-8010>] [--duration <30>] [--legacy] \
+               [--tier <full|640|320|low>]
+"""
+
+import os
+import sys
+import json
+import time
+import selectors
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import protocol
+from sources import VideoSource, discover, parse_ports
+from fake_camera import read_stamp
+
+PREFIX = "[HEADLESS CLIENT]"
+
+
+def percentiles(values, points=(50, 95, 99)):
+    """Percentiles d'une liste de valeurs, plus le maximum : {"p50": ..., "max": ...}."""
+    if not values:
+        return {}
+    ordered = sorted(values)
+    result = {}
+    for point in points:
+        result["p" + str(point)] = round(ordered[min(len(ordered) - 1, int(len(ordered) * point / 100.0))], 2)
+    result["max"] = round(ordered[-1], 2)
+    return result
+
+
+class SourceStats():
+    """Mesures d'une caméra : images et octets reçus, latences (ms) des images marquées."""
+    def __init__(self):
+        self.frames = 0
+        self.bytes = 0
+        self.latencies = []
+
+
+class HeadlessClient():
+    """Lecture de toutes les caméras dans un seul fil, sans décodage ni affichage des images."""
+    def __init__(self, stream_protocol=protocol.PROTOCOL_BINARY, tier=protocol.TIER_FULL):
+        self.stream_protocol = stream_protocol
+        self.tier = tier
+        self.selector = selectors.DefaultSelector()
+        self.sources = {}
+        self.stats = {}
+        self.errors = 0
+        #Temps CPU du fil de lecture (réception et découpage des flux)
+        self.cpu_time = 0.0
+        #Les mesures ne sont faites qu'entre start_window() et stop_window()
+        self.measuring = False
+        self.window_start = None
+        self.window_duration = 0.0
+
+    def connect(self, hosts, ports, timeout=1):
+        """Connexion à toutes les caméras trouvées, renvoie leur nombre."""
+        for sock, address in discover(hosts, ports, timeout, exclude=list(self.sources)):
+            source = VideoSource(sock, address, self.stream_protocol, self.tier)
+            self.sources[address] = source
+            self.stats.setdefault(address[1], SourceStats())
+            self.selector.register(source, selectors.EVENT_READ)
+        return len(self.sources)
+
+    def start_window(self):
+        """Début de la fenêtre de mesure : les compteurs repartent de zéro."""
+        for port in self.stats:
+            self.stats[port] = SourceStats()
+        self.cpu_time = 0.0
+        self.measuring = True
+        self.window_start = time.monotonic()
+
+    def stop_window(self):
+        """Fin de la fenêtre de mesure."""
+        self.measuring = False
+        self.window_duration = time.monotonic() - self.window_start
+
+    def run(self, duration, stop=None):
+        """Lecture pendant duration secondes (ou jusqu'à ce que stop() soit vrai)."""
+        end = time.monotonic() + duration
+        while time.monotonic() < end and self.sources and not (stop is not None and stop()):
+            started = time.thread_time()
+            for key, events in self.selector.select(0.2):
+                source = key.fileobj
+                try:
+                    frames = source.poll()
+                except (OSError, protocol.ProtocolError) as err:
+                    print(PREFIX + "[ERROR] Port " + str(source.port) + " : " + str(err))
+                    self.errors += 1
+                    self.selector.unregister(source)
+                    source.close()
+                    del self.sources[source.address]
+                    continue
+                if not self.measuring:
+                    continue
+                now = time.time()
+                stats = self.stats[source.port]
+                for text, jpg, timestamp_us in frames:
+                    stats.frames += 1
+                    stats.bytes += len(jpg)
+                    sent_at = read_stamp(jpg)
+                    if sent_at is not None:
+                        stats.latencies.append((now - sent_at) * 1000.0)
+            if self.measuring:
+                self.cpu_time += time.thread_time() - started
+
+    def results(self):
+        """Résultats de la fenêtre de mesure : par caméra et au total."""
+        duration = max(self.window_duration, 0.001)
+        cameras = {}
+        latencies = []
+        for port, stats in sorted(self.stats.items()):
+            cameras[str(port)] = {"frames": stats.frames, "fps": round(stats.frames / duration, 2),
+                                  "mbit_per_s": round(stats.bytes * 8 / duration / 1000000.0, 2),
+                                  "latency_ms": percentiles(stats.latencies)}
+            latencies += stats.latencies
+        count = max(1, len(self.stats))
+        return {"cameras": cameras,
+                "frames": sum(stats.frames for stats in self.stats.values()),
+                "fps_per_camera": round(sum(stats.frames for stats in self.stats.values()) / duration / count, 2),
+                "latency_ms": percentiles(latencies),
+                "parser_cpu_percent": round(100.0 * self.cpu_time / duration, 2),
+                "duration": round(duration, 2),
+                "errors": self.errors}
+
+    def close(self):
+        """Ferme toutes les connexions."""
+        for source in self.sources.values():
+            self.selector.unregister(source)
+            source.close()
+        self.sources = {}
+
+
+def main():
+    """Fonction principale : mesure de réception, résultats en JSON sur la sortie standard."""
+    usage = "Usage : headless_client.py [--hosts <127.0.0.1>] [--ports <8001-8010>] [--duration <30>] [--legacy]\n" \
+            "        [--tier <full|640|320|low>]"
+    hosts = ["127.0.0.1"]
+    ports = list(range(8001, 8011))
+    duration = 30
+    stream_protocol = protocol.PROTOCOL_BINARY
+    tier = protocol.TIER_FULL
+    args = sys.argv[1:]
+    i = 0
+    while i < len(args):
+        if args[i] == "--legacy":
+            stream_protocol = protocol.PROTOCOL_LEGACY
+        elif args[i] == "--hosts" and i + 1 < len(args):
+            hosts = [host for host in args[i + 1].split(",") if host]
+            i += 1
+        elif args[i] == "--ports" and i + 1 < len(args):
+            try:
+                ports = parse_ports(args[i + 1])
+            except ValueError:
+                print("--ports must be a list of int (8001-8010,8020)")
+                sys.exit()
+            i += 1
+        elif args[i] == "--duration" and i + 1 < len(args) and args[i + 1].isdigit():
+            duration = int(args[i + 1])
+            i += 1
+        elif args[i] == "--tier" and i + 1 < len(args):
+            try:
+                tier = protocol.tier_by_name(args[i + 1])
+            except ValueError as err:
+                print("--tier : " + str(err))
+                sys.exit()
+            i += 1
+        else:
+            print(usage)
+            sys.exit()
+        i += 1
+    client = HeadlessClient(stream_protocol, tier)
+    if client.connect(hosts, ports) == 0:
+        print(PREFIX + "[ERROR] No camera found")
+        sys.exit()
+    client.start_window()
+    try:
+        client.run(duration)
+    except KeyboardInterrupt:
+        print(PREFIX + "[ALERT] Stopped by user...")
+    client.stop_window()
+    client.close()
+    print(json.dumps(client.results(), indent=2))
+
+if __name__ == '__main__':
+    main()
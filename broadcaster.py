@@ -0,0 +1,520 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/2026
+
+@author: 23
+
+@desc: Diffusion d'un flux vers plusieurs clients.\
+       Chaque client dispose d'une file d'envoi bornée (l'image la plus ancienne \
+       est abandonnée quand la file est pleine) et les envois non bloquants sont \
+       faits par un fil dédié : la lecture et la surveillance ne sont jamais bloquées.
+       Le format de diffusion (legacy ou binaire) et le niveau de qualité sont \
+       négociés par client (voir protocol.py) ; les images réduites sont préparées \
+       une fois par niveau demandé (tiers.TierEncoder), hors du fil de lecture : \
+       un encodage au plus par niveau, la plus récente des images en attente gagne.
+"""
+
+import time
+import asyncio
+import threading
+import collections
+import selectors
+import socket
+import errno
+import concurrent.futures
+
+import protocol
+
+
+class ClientConnection():
+    """Client connecté au port de diffusion et sa file d'envoi."""
+    def __init__(self, sock, address, max_queue):
+        self.socket = sock
+        self.address = address
+        self.queue = collections.deque()
+        self.max_queue = max_queue
+        #Image en cours d'envoi (jamais abandonnée pour ne pas corrompre le flux)
+        self.pending = None
+        self.sent_frames = 0
+        self.sent_bytes = 0
+        self.dropped_frames = 0
+        self.connected_since = time.time()
+        #Format de diffusion, None tant que la négociation n'est pas terminée, et niveau de qualité
+        self.protocol = None
+        self.tier = protocol.TIER_FULL
+        self.hello = b''
+
+    def push(self, data):
+        """Ajoute une image à la file, en abandonnant la plus ancienne si elle est pleine."""
+        if len(self.queue) >= self.max_queue:
+            self.queue.popleft()
+            self.dropped_frames += 1
+        self.queue.append(data)
+
+    def has_data(self):
+        """Vrai si des données attendent d'être envoyées."""
+        return self.pending is not None or len(self.queue) > 0
+
+    def send(self):
+        """Envoie autant de données que possible sans bloquer."""
+        while True:
+            if self.pending is None:
+                if len(self.queue) == 0:
+                    return
+                self.pending = memoryview(self.queue.popleft())
+            sent = self.socket.send(self.pending)
+            self.sent_bytes += sent
+            if sent < len(self.pending):
+                self.pending = self.pending[sent:]
+                return
+            self.pending = None
+            self.sent_frames += 1
+
+    def __str__(self):
+        return str(self.address) + " sent:" + str(self.sent_frames) + " dropped:" + str(self.dropped_frames)
+
+
+class BaseBroadcaster():
+    """Éléments communs aux diffuseurs : clients, publication et statistiques.
+
+    Sans encoder (tiers.TierEncoder), tous les clients reçoivent l'image d'origine.
+    Les images réduites sont encodées par executor (concurrent.futures), dans le fil
+    de l'appelant sans exécuteur, puis envoyées aux seuls clients de leur niveau
+    quand elles sont prêtes.
+    """
+    def __init__(self, port, prefix="", max_queue=4, negotiation_timeout=0.2, encoder=None, executor=None):
+        self.port = port
+        self.prefix = prefix
+        self.max_queue = max_queue
+        self.negotiation_timeout = negotiation_timeout
+        self.encoder = encoder
+        self.executor = executor
+        #Niveaux en cours d'encodage -> image suivante à encoder (None : aucune en attente)
+        self.encoding = {}
+        #Par niveau : images remplacées par une plus récente avant leur encodage
+        self.skipped_encodings = {}
+        self.clients = {}
+        self.lock = threading.Lock()
+        #Totaux des clients déconnectés : images envoyées, octets envoyés, images abandonnées
+        self.closed_totals = [0, 0, 0]
+        #Octets envoyés par niveau de qualité (clients déconnectés), et au dernier rapport
+        self.closed_tier_bytes = {}
+        self.reported_tier_bytes = {}
+        self.reported_at = time.time()
+
+    def client_count(self):
+        """Nombre de clients connectés."""
+        return len(self.clients)
+
+    def publish(self, message):
+        """Met une image (protocol.FrameMessage) en file pour chaque client, sans jamais bloquer.
+
+        L'image d'origine est mise en file aussitôt ; celle de chaque niveau réduit est
+        encodée une seule fois, hors de l'appelant, et mise en file quand elle est prête.
+        """
+        if len(self.clients) == 0:
+            return
+        with self.lock:
+            tiers = set(client.tier for client in self.clients.values() if client.protocol is not None)
+        for tier in tiers:
+            if tier != protocol.TIER_FULL and self.encoder.admit(tier, message):
+                self._submit(tier, message)
+        if protocol.TIER_FULL in tiers:
+            self._deliver(protocol.TIER_FULL, message)
+
+    def _deliver(self, tier, message):
+        """Met l'image du niveau en file pour les clients de ce niveau."""
+        with self.lock:
+            for client in self.clients.values():
+                if client.protocol is not None and client.tier == tier:
+                    client.push(message.encode(client.protocol, tier))
+
+    def _submit(self, tier, message):
+        """Encode l'image d'un niveau réduit, ou la garde en attente si un encodage du niveau est en cours."""
+        with self.lock:
+            if tier in self.encoding:
+                if self.encoding[tier] is not None:
+                    self.skipped_encodings[tier] = self.skipped_encodings.get(tier, 0) + 1
+                self.encoding[tier] = message
+                return
+            self.encoding[tier] = None
+        self._start_encoding(tier, message)
+
+    def _start_encoding(self, tier, message):
+        """Lance encoder.prepare(tier, message) dans l'exécuteur, puis _encoded() dans le fil de l'exécuteur."""
+        if self.executor is None:
+            future = concurrent.futures.Future()
+            try:
+                future.set_result(self.encoder.prepare(tier, message))
+            except Exception as err:
+                future.set_exception(err)
+            self._encoded(tier, message, future)
+            return
+        try:
+            future = self.executor.submit(self.encoder.prepare, tier, message)
+        except RuntimeError:
+            #Exécuteur arrêté (diffuseur fermé)
+            return
+        future.add_done_callback(lambda done: self._encoded(tier, message, done))
+
+    def _encoded(self, tier, message, future):
+        """Fin de l'encodage d'un niveau : envoi aux clients du niveau puis encodage de l'image en attente."""
+        if future.cancelled():
+            #Arrêt du diffuseur ou de la boucle
+            ready = False
+        elif future.exception() is not None:
+            print(str(self.prefix) + "[ERROR] Tier " + protocol.TIERS[tier].name + " encoding : " + str(future.exception()))
+            ready = False
+        else:
+            ready = future.result()
+        if ready:
+            self._deliver(tier, message)
+            self._wakeup()
+        with self.lock:
+            pending = self.encoding.pop(tier, None)
+            if pending is not None:
+                self.encoding[tier] = None
+        if pending is not None:
+            self._start_encoding(tier, pending)
+
+    def _wakeup(self):
+        """Prévient l'envoi qu'une image a été mise en file (hors de publish())."""
+        pass
+
+    def stats(self):
+        """Statistiques par client : (adresse, images envoyées, octets envoyés, images abandonnées)."""
+        with self.lock:
+            return [(client.address, client.sent_frames, client.sent_bytes, client.dropped_frames)
+                    for client in self.clients.values()]
+
+    def totals(self):
+        """Totaux depuis le démarrage, clients déconnectés compris : (images envoyées, octets envoyés, images abandonnées)."""
+        with self.lock:
+            totals = list(self.closed_totals)
+            for client in self.clients.values():
+                totals[0] += client.sent_frames
+                totals[1] += client.sent_bytes
+                totals[2] += client.dropped_frames
+        return tuple(totals)
+
+    def tier_stats(self):
+        """Par niveau de qualité : (clients connectés, octets envoyés depuis le démarrage)."""
+        with self.lock:
+            stats = {tier: [0, sent_bytes] for tier, sent_bytes in self.closed_tier_bytes.items()}
+            for client in self.clients.values():
+                tier_stats = stats.setdefault(client.tier, [0, 0])
+                tier_stats[0] += 1
+                tier_stats[1] += client.sent_bytes
+        return {tier: tuple(tier_stats) for tier, tier_stats in stats.items()}
+
+    def _forget(self, key):
+        """Retire un client (appelé avec le verrou) en conservant ses totaux."""
+        client = self.clients.pop(key, None)
+        if client is not None:
+            self.closed_totals[0] += client.sent_frames
+            self.closed_totals[1] += client.sent_bytes
+            self.closed_totals[2] += client.dropped_frames
+            self.closed_tier_bytes[client.tier] = self.closed_tier_bytes.get(client.tier, 0) + client.sent_bytes
+
+    def report(self):
+        """Affiche le nombre d'images abandonnées pour chaque client et le débit de chaque niveau de qualité."""
+        for address, sent_frames, sent_bytes, dropped_frames in self.stats():
+            print(str(self.prefix) + "[STATS] Client " + str(address) + " : " + str(sent_frames)
+                  + " frame(s) sent, " + str(dropped_frames) + " dropped")
+        now = time.time()
+        elapsed = max(now - self.reported_at, 0.001)
+        for tier, (clients, sent_bytes) in sorted(self.tier_stats().items()):
+            rate = (sent_bytes - self.reported_tier_bytes.get(tier, 0)) / elapsed
+            print(str(self.prefix) + "[STATS] Tier " + protocol.TIERS[tier].name + " : " + str(clients) + " client(s), "
+                  + str(round(rate / 1024.0, 1)) + " KB/s")
+            self.reported_tier_bytes[tier] = sent_bytes
+        self.reported_at = now
+
+    def negotiate(self, client, hello):
+        """Choisit le format de diffusion d'un client à partir de son message HELLO."""
+        try:
+            version, tier = protocol.decode_hello(hello)
+        except protocol.ProtocolError as p_err:
+            print(str(self.prefix) + "[ALERT] Client " + str(client.address) + " : " + str(p_err) + ", legacy format used")
+            client.protocol = protocol.PROTOCOL_LEGACY
+        else:
+            if version == protocol.VERSION:
+                client.protocol = protocol.PROTOCOL_BINARY
+                if tier not in protocol.TIERS or (tier != protocol.TIER_FULL and self.encoder is None):
+                    print(str(self.prefix) + "[ALERT] Client " + str(client.address) + " : unavailable tier " + str(tier) + ", full tier used")
+                else:
+                    client.tier = tier
+            else:
+                print(str(self.prefix) + "[ALERT] Client " + str(client.address) + " : unsupported version " + str(version) + ", legacy format used")
+                client.protocol = protocol.PROTOCOL_LEGACY
+        print(str(self.prefix) + "[INFO] Client " + str(client.address) + " uses " + str(client.protocol) + " format, tier "
+              + protocol.TIERS[client.tier].name)
+
+
+class Broadcaster(BaseBroadcaster):
+    """Accepte un nombre quelconque de clients sur un port et leur diffuse les images publiées."""
+    def __init__(self, port, prefix="", max_queue=4, host="0.0.0.0", report_interval=60, negotiation_timeout=0.2,
+                 encoder=None):
+        #Fil d'encodage des niveaux réduits (seul à modifier l'encoder), créé au premier encodage
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=1) if encoder is not None else None
+        BaseBroadcaster.__init__(self, port, prefix, max_queue, negotiation_timeout, encoder, executor)
+        self.report_interval = report_interval
+
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind((host, self.port))
+        self.socket.listen(16)
+        self.socket.setblocking(False)
+
+        #Paire de sockets servant à réveiller le fil d'envoi lors d'une publication
+        self.wakeup_receiver, self.wakeup_sender = socket.socketpair()
+        self.wakeup_receiver.setblocking(False)
+        self.wakeup_sender.setblocking(False)
+
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.socket, selectors.EVENT_READ, "accept")
+        self.selector.register(self.wakeup_receiver, selectors.EVENT_READ, "wakeup")
+
+        self.running = False
+        self.thread = threading.Thread(target=self.run, args=(), daemon=True)
+
+    def start(self):
+        """Démarre le fil de diffusion."""
+        self.running = True
+        self.thread.start()
+
+    def publish(self, message):
+        """Met une image en file pour chaque client puis réveille le fil d'envoi."""
+        if len(self.clients) == 0:
+            return
+        BaseBroadcaster.publish(self, message)
+        self._wakeup()
+
+    def _wakeup(self):
+        """Réveille le fil d'envoi."""
+        try:
+            self.wakeup_sender.send(b'\x00')
+        except (BlockingIOError, OSError):
+            #Le fil d'envoi a déjà un réveil en attente (ou le diffuseur est fermé)
+            pass
+
+    def _accept(self):
+        """Accepte les nouveaux clients en attente."""
+        while True:
+            try:
+                client_socket, address = self.socket.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            client_socket.setblocking(False)
+            client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            client = ClientConnection(client_socket, address, self.max_queue)
+            with self.lock:
+                self.clients[client_socket] = client
+            self.selector.register(client_socket, selectors.EVENT_READ, client)
+            print(str(self.prefix) + "[INFO] New client : " + str(address) + " (" + str(len(self.clients)) + " connected)")
+
+    def _disconnect(self, client, reason=None):
+        """Ferme la connexion d'un client."""
+        with self.lock:
+            self._forget(client.socket)
+        try:
+            self.selector.unregister(client.socket)
+        except (KeyError, ValueError):
+            pass
+        client.socket.close()
+        print(str(self.prefix) + "[INFO] Client disconnected : " + str(client)
+              + ("" if reason is None else " (" + str(reason) + ")"))
+
+    def _negotiate(self, client, data):
+        """Accumule le message HELLO d'un client demandant le format binaire."""
+        client.hello += data
+        if len(client.hello) >= protocol.HELLO.size:
+            self.negotiate(client, client.hello)
+            client.hello = b''
+
+    def _negotiation_timeouts(self):
+        """Les clients n'ayant rien envoyé à temps reçoivent le format legacy."""
+        now = time.time()
+        for client in list(self.clients.values()):
+            if client.protocol is None and now - client.connected_since >= self.negotiation_timeout:
+                client.protocol = protocol.PROTOCOL_LEGACY
+                client.hello = b''
+
+    def _update_events(self):
+        """Active la surveillance en écriture des seuls clients ayant des données en attente."""
+        for client in list(self.clients.values()):
+            events = selectors.EVENT_READ
+            if client.has_data():
+                events |= selectors.EVENT_WRITE
+            try:
+                if self.selector.get_key(client.socket).events != events:
+                    self.selector.modify(client.socket, events, client)
+            except (KeyError, ValueError):
+                continue
+
+    def run(self):
+        """Boucle du fil d'envoi."""
+        last_report = time.time()
+        while self.running:
+            with self.lock:
+                self._negotiation_timeouts()
+                self._update_events()
+            negotiating = any(client.protocol is None for client in self.clients.values())
+            for key, mask in self.selector.select(timeout=self.negotiation_timeout if negotiating else 1):
+                if key.data == "accept":
+                    self._accept()
+                elif key.data == "wakeup":
+                    try:
+                        while self.wakeup_receiver.recv(4096):
+                            pass
+                    except (BlockingIOError, InterruptedError):
+                        pass
+                else:
+                    client = key.data
+                    if mask & selectors.EVENT_READ:
+                        try:
+                            data = client.socket.recv(4096)
+                            if not data:
+                                self._disconnect(client)
+                                continue
+                            if client.protocol is None:
+                                self._negotiate(client, data)
+                        except (BlockingIOError, InterruptedError):
+                            pass
+                        except OSError as s_err:
+                            self._disconnect(client, s_err)
+                            continue
+                    if mask & selectors.EVENT_WRITE:
+                        try:
+                            with self.lock:
+                                client.send()
+                        except (BlockingIOError, InterruptedError):
+                            pass
+                        except OSError as s_err:
+                            if s_err.errno in (errno.ECONNRESET, errno.EPIPE):
+                                self._disconnect(client)
+                            else:
+                                self._disconnect(client, s_err)
+            if self.report_interval and time.time() - last_report >= self.report_interval:
+                last_report = time.time()
+                self.report()
+
+    def close(self):
+        """Arrête la diffusion et ferme toutes les connexions."""
+        self.running = False
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+        if self.thread.is_alive() and self.thread is not threading.current_thread():
+            try:
+                self.wakeup_sender.send(b'\x00')
+            except OSError:
+                pass
+            self.thread.join(timeout=2)
+        for client in list(self.clients.values()):
+            self._disconnect(client)
+        self.selector.close()
+        self.socket.close()
+        self.wakeup_receiver.close()
+        self.wakeup_sender.close()
+
+
+class AsyncClientConnection(ClientConnection):
+    """Client d'un AsyncBroadcaster : l'envoi est fait par une tâche asyncio."""
+    def __init__(self, writer, address, max_queue):
+        ClientConnection.__init__(self, writer, address, max_queue)
+        self.ready = asyncio.Event()
+
+    def push(self, data):
+        """Ajoute une image à la file et réveille la tâche d'envoi."""
+        ClientConnection.push(self, data)
+        self.ready.set()
+
+
+class AsyncBroadcaster(BaseBroadcaster):
+    """Diffuseur fonctionnant dans une boucle asyncio (mode multi-caméras).
+
+    Les niveaux réduits sont encodés par executor (celui de la boucle par défaut, partagé
+    par plusieurs threads : tiers.TierEncoder protège son état) ; les images prêtes sont
+    mises en file depuis la boucle.
+    """
+    def __init__(self, port, prefix="", max_queue=4, host="0.0.0.0", negotiation_timeout=0.2, encoder=None,
+                 executor=None):
+        BaseBroadcaster.__init__(self, port, prefix, max_queue, negotiation_timeout, encoder, executor)
+        self.host = host
+        self.server = None
+        self.loop = None
+
+    async def start(self):
+        """Ouvre le port de diffusion dans la boucle courante."""
+        self.loop = asyncio.get_event_loop()
+        self.server = await asyncio.start_server(self.handle_client, self.host, self.port)
+
+    def _start_encoding(self, tier, message):
+        """Encodage dans l'exécuteur ; _encoded() est appelée dans la boucle."""
+        future = self.loop.run_in_executor(self.executor, self.encoder.prepare, tier, message)
+        future.add_done_callback(lambda done: self._encoded(tier, message, done))
+
+    async def handle_client(self, reader, writer):
+        """Négociation du format puis envoi des images d'un client jusqu'à sa déconnexion."""
+        address = writer.get_extra_info("peername")
+        client = AsyncClientConnection(writer, address, self.max_queue)
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        #Les données restent dans la file du client, pas dans le tampon du transport
+        writer.transport.set_write_buffer_limits(high=0)
+        print(str(self.prefix) + "[INFO] New client : " + str(address) + " (" + str(len(self.clients) + 1) + " connected)")
+        try:
+            try:
+                hello = await asyncio.wait_for(reader.readexactly(protocol.HELLO.size), self.negotiation_timeout)
+            except asyncio.TimeoutError:
+                client.protocol = protocol.PROTOCOL_LEGACY
+            else:
+                self.negotiate(client, hello)
+            with self.lock:
+                self.clients[writer] = client
+            sender = asyncio.ensure_future(self._send_loop(client))
+            #Les clients n'envoient plus rien : une lecture vide signifie une déconnexion
+            watcher = asyncio.ensure_future(self._wait_disconnect(reader))
+            done, pending = await asyncio.wait((sender, watcher), return_when=asyncio.FIRST_COMPLETED)
+            for task in pending:
+                task.cancel()
+            for task in done:
+                if not task.cancelled() and task.exception() is not None:
+                    raise task.exception()
+            reason = None
+        except (asyncio.IncompleteReadError, OSError) as s_err:
+            reason = s_err
+        finally:
+            with self.lock:
+                self._forget(writer)
+            writer.close()
+        print(str(self.prefix) + "[INFO] Client disconnected : " + str(client)
+              + ("" if reason is None else " (" + str(reason) + ")"))
+
+    @staticmethod
+    async def _wait_disconnect(reader):
+        """Se termine quand le client ferme la connexion."""
+        while await reader.read(4096):
+            pass
+
+    @staticmethod
+    async def _send_loop(client):
+        """Envoie les images en file, la plus ancienne étant abandonnée si le client est lent."""
+        writer = client.socket
+        while True:
+            await client.ready.wait()
+            client.ready.clear()
+            while len(client.queue) > 0:
+                data = client.queue.popleft()
+                writer.write(data)
+                await writer.drain()
+                client.sent_frames += 1
+                client.sent_bytes += len(data)
+
+    def close(self):
+        """Ferme le port de diffusion et les connexions clients."""
+        if self.server is not None:
+            self.server.close()
+        for writer in list(self.clients):
+            writer.close()
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/2026
+
+@author: 23
+
+@desc: Catalogue des enregistrements (SQLite).\
+       Chaque enregistrement terminé y est ajouté par le fil d'écriture : caméra, \
+       début et fin, nombre d'images, plus grande zone en mouvement, vignette JPEG \
+       et instants des détections (en secondes depuis le début du fichier).
+       Le catalogue est interrogé par HTTP (JSON), sans lister ni télécharger \
+       les fichiers.
+       Usage : catalog.py [<catalog.sqlite>] [--port <port>]
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import datetime
+import threading
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import cv2
+
+PREFIX = "[CATALOG]"
+DEFAULT_PATH = "./storage/catalog.sqlite"
+DEFAULT_PORT = 8090
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    id INTEGER PRIMARY KEY,
+    camera INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    frames INTEGER NOT NULL,
+    peak_area INTEGER NOT NULL,
+    events TEXT NOT NULL,
+    thumbnail BLOB
+);
+CREATE INDEX IF NOT EXISTS recordings_camera_start ON recordings (camera, start);
+CREATE INDEX IF NOT EXISTS recordings_start ON recordings (start);
+"""
+
+#Colonnes renvoyées par les recherches (la vignette est servie à part)
+COLUMNS = ("id", "camera", "path", "start", "end", "frames", "peak_area", "events")
+
+
+def make_thumbnail(jpeg, width=160, quality=70):
+    """Vignette JPEG d'une image (décodage réduit), None si l'image est invalide."""
+    frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_REDUCED_COLOR_4)
+    if frame is None:
+        return None
+    height = max(1, int(frame.shape[0] * width / float(frame.shape[1])))
+    frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+    ok, thumbnail = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return thumbnail.tobytes() if ok else None
+
+
+def parse_time(value):
+    """Instant donné en secondes depuis l'epoch ou au format "AAAA-MM-JJ[ HH:MM:SS]" (heure locale)."""
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    for date_format in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return time.mktime(datetime.datetime.strptime(value, date_format).timetuple())
+        except ValueError:
+            continue
+    raise ValueError("Invalid date : " + str(value))
+
+
+class RecordingCatalog():
+    """Catalogue SQLite partagé par les fils d'écriture (et les processus) du serveur."""
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.root = os.path.dirname(os.path.abspath(path))
+        if not os.path.isdir(self.root):
+            os.makedirs(self.root, exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        #Journal WAL : les lectures ne bloquent pas les écritures des autres processus
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+        self.connection.commit()
+
+    def relative_path(self, path):
+        """Chemin d'un fichier relatif au dossier du catalogue (chemin vu par le client FTP)."""
+        return os.path.relpath(os.path.abspath(path), self.root).replace(os.sep, "/")
+
+    def add(self, camera, path, start, end, frames, peak_area=0, events=(), thumbnail=None):
+        """Ajoute un enregistrement terminé (start, end : secondes depuis l'epoch), renvoie son identifiant."""
+        with self.lock:
+            cursor = self.connection.execute(
+                "INSERT INTO recordings (camera, path, start, end, frames, peak_area, events, thumbnail) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (camera, self.relative_path(path), start, end, frames, peak_area,
+                 json.dumps([round(offset, 3) for offset in events]), thumbnail))
+            self.connection.commit()
+            return cursor.lastrowid
+
+    def remove(self, path):
+        """Retire un enregistrement supprimé (retention.RetentionManager), renvoie le nombre de lignes retirées."""
+        with self.lock:
+            cursor = self.connection.execute("DELETE FROM recordings WHERE path = ?", (self.relative_path(path),))
+            self.connection.commit()
+            return cursor.rowcount
+
+    def query(self, camera=None, start=None, end=None, min_area=0, limit=100):
+        """Enregistrements d'une caméra (ou de toutes) qui recouvrent [start, end], les plus récents d'abord."""
+        conditions = ["peak_area >= ?"]
+        parameters = [min_area]
+        if camera is not None:
+            conditions.append("camera = ?")
+            parameters.append(camera)
+        if start is not None:
+            conditions.append("end >= ?")
+            parameters.append(start)
+        if end is not None:
+            conditions.append("start <= ?")
+            parameters.append(end)
+        parameters.append(limit)
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT " + ", ".join(COLUMNS) + " FROM recordings WHERE " + " AND ".join(conditions)
+                + " ORDER BY start DESC LIMIT ?", parameters).fetchall()
+        recordings = []
+        for row in rows:
+            recording = dict(zip(COLUMNS, row))
+            recording["events"] = json.loads(recording["events"])
+            recordings.append(recording)
+        return recordings
+
+    def thumbnail(self, recording_id):
+        """Vignette JPEG d'un enregistrement, None si absente."""
+        with self.lock:
+            row = self.connection.execute("SELECT thumbnail FROM recordings WHERE id = ?", (recording_id,)).fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        """Ferme la base."""
+        with self.lock:
+            self.connection.close()
+
+
+class CatalogRequestHandler(BaseHTTPRequestHandler):
+    """Requêtes HTTP du catalogue :
+      - GET /recordings?camera=8001&start=2026-10-18&end=2026-10-19%2012:00&min_area=0&limit=100 (JSON) ;
+      - GET /thumbnail?id=12 (image JPEG).
+    """
+    catalog = None
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        parameters = dict(urllib.parse.parse_qsl(url.query))
+        try:
+            if url.path == "/recordings":
+                camera = parameters.get("camera")
+                recordings = self.catalog.query(int(camera) if camera else None,
+                                                parse_time(parameters.get("start")),
+                                                parse_time(parameters.get("end")),
+                                                int(parameters.get("min_area", 0)),
+                                                min(int(parameters.get("limit", 100)), 10000))
+                self.reply(200, "application/json", json.dumps(recordings).encode())
+            elif url.path == "/thumbnail":
+                thumbnail = self.catalog.thumbnail(int(parameters.get("id", 0)))
+                if thumbnail is None:
+                    self.reply(404, "text/plain", b"No thumbnail")
+                else:
+                    self.reply(200, "image/jpeg", thumbnail)
+            else:
+                self.reply(404, "text/plain", b"Not found")
+        except ValueError as err:
+            self.reply(400, "text/plain", str(err).encode())
+
+    def reply(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Pas de journal par requête."""
+
+
+class CatalogClient():
+    """Interrogation du catalogue depuis le client."""
+    def __init__(self, host, port=DEFAULT_PORT, timeout=5):
+        self.url = "http://" + str(host) + ":" + str(port)
+        self.timeout = timeout
+
+    def query(self, camera=None, start=None, end=None, min_area=0, limit=100):
+        """Liste des enregistrements (dictionnaires : id, camera, path, start, end, frames, peak_area, events)."""
+        parameters = {"min_area": min_area, "limit": limit}
+        if camera is not None:
+            parameters["camera"] = camera
+        if start is not None:
+            parameters["start"] = start
+        if end is not None:
+            parameters["end"] = end
+        with urllib.request.urlopen(self.url + "/recordings?" + urllib.parse.urlencode(parameters),
+                                    timeout=self.timeout) as response:
+            return json.loads(response.read().decode())
+
+    def thumbnail(self, recording_id):
+        """Vignette JPEG d'un enregistrement."""
+        with urllib.request.urlopen(self.url + "/thumbnail?id=" + str(int(recording_id)), timeout=self.timeout) as response:
+            return response.read()
+
+
+def main():
+    """Fonction principale : service HTTP de consultation du catalogue."""
+    path = DEFAULT_PATH
+    port = DEFAULT_PORT
+    args = sys.argv[1:]
+    i = 0
+    while i < len(args):
+        if args[i] == "--port" and i + 1 < len(args) and args[i + 1].isdigit():
+            port = int(args[i + 1])
+            i += 1
+        elif not args[i].startswith("--"):
+            path = args[i]
+        else:
+            print("Usage : catalog.py [<catalog.sqlite>] [--port <port>]")
+            sys.exit()
+        i += 1
+    CatalogRequestHandler.catalog = RecordingCatalog(path)
+    server = ThreadingHTTPServer(("", port), CatalogRequestHandler)
+    print(PREFIX + "[INFO] Catalog " + str(path) + " served on port " + str(port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(PREFIX + "[ALERT] Stopped by user...")
+    server.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -10,10 +10,12 @@ Created on 05/2021
 """
 
 import os
+import sys
 import datetime
 import time
 import threading
-import socket
+import selectors
+import queue
 import urllib
 import tkinter as tki  # Librairie pour la création de l'interface
 from ftplib import FTP # Librairie de connexion au stockage serveur
@@ -22,13 +24,27 @@ import numpy as np
 # Librairies pour le traitement d'image (OpenCV, PIL)
 from PIL import Image
 from PIL import ImageTk
-import imageio         # Librairie de création des fichiers vidéo
 import cv2
 
+from render import FrameDecoder
+from sources import VideoSource, discover, parse_ports
+import protocol
+from storage import StorageIndex
+from storage_browser import StorageBrowser
+from downloads import DownloadManager
+from recording import CONTAINERS, RecordWriter  # Formats des fichiers vidéo (MP4 ou JPEG sans ré-encodage)
+
+#Serveur et ports testés par défaut lors de la recherche des caméras
+DEFAULT_HOST = "_._._._"
+DEFAULT_PORTS = list(range(8001, 8011))
+#Durée maximale d'une recherche (toutes les connexions sont tentées en même temps)
+DISCOVERY_TIMEOUT = 0.5
+
 class CameraMonitorApp():
     """Classe de l'application client."""
 
-    def __init__(self):
+    def __init__(self, stream_protocol=protocol.PROTOCOL_BINARY, record_format="mp4", display_fps=30,
+                 hosts=None, ports=None, rescan_interval=10, tier=protocol.TIER_FULL):
         """Initialise la classe, création de l'interface."""
         # Je crée une interface TKinter (Taille fixe, nom, icone)
         self.root = tki.Tk()
@@ -40,8 +56,9 @@ class CameraMonitorApp():
         #Création des widgets (Panneau + 3 boutons) dans un tableau
         self.widgets = []
         # Panneau qui servira à afficher l'image de la caméra
-        self.widgets.append( \
-            tki.Label(image=ImageTk.PhotoImage(Image.new("RGB", [300, 300])), bg="black"))
+        self.no_image = ImageTk.PhotoImage(Image.new("RGB", [300, 300]))
+        self.widgets.append(tki.Label(image=self.no_image, bg="black"))
+        self.widgets[0].image = self.no_image
         #Bouton prise de photo
         self.widgets.append( \
             tki.Button(self.root, text="Photo",\
@@ -53,97 +70,138 @@ class CameraMonitorApp():
             tki.Button(self.root, text=">", state="disabled", \
             command=lambda: self.change_source("next")))
         self.widgets.append( \
-            tki.Button(self.root, text="RELOAD", state="disabled"))
+            tki.Button(self.root, text="RELOAD", command=self.rescan))
         #Menu pour les différentes commandes (options, enregistrement)
         self.widgets.append(tki.Menu(self.root))
         menu_file = tki.Menu(self.widgets[2], tearoff=0)
         menu_record = tki.Menu(self.widgets[2], tearoff=0)
+        menu_view = tki.Menu(self.widgets[2], tearoff=0)
         menu_file.add_command(label="Quitter", command=lambda: self.on_close())
         menu_record.add_command(label="Demarrer l'enregistrement", command=self.record)
         menu_record.add_command(label="Arrêter l'enregistrement", \
-                                command=lambda: self.thread_save_record.start())
+                                command=self.stop_record)
         menu_record.add_command(label="Consulter les enregistrements", \
-                                command=lambda: self.thread_ftp.start())
+                                command=self.open_storage)
+        menu_view.add_command(label="Caméra seule", command=lambda: self.set_view(0))
+        menu_view.add_command(label="Mosaïque 2x2", command=lambda: self.set_view(2))
+        menu_view.add_command(label="Mosaïque 3x3", command=lambda: self.set_view(3))
         self.widgets[5].add_cascade(label="Fichier", menu=menu_file)
         self.widgets[5].add_cascade(label="Enregistrement", menu=menu_record)
+        self.widgets[5].add_cascade(label="Affichage", menu=menu_view)
+        #Fréquences de réception, de décodage et d'affichage
+        self.widgets.append(tki.Label(self.root, text=""))
         #Organisation des widgets
         self.widgets[0].grid(row=1, column=1, columnspan=4)
         self.widgets[1].grid(row=2, column=1, columnspan=1)
         self.widgets[2].grid(row=2, column=2, columnspan=1)
         self.widgets[3].grid(row=2, column=3, columnspan=1)
         self.widgets[4].grid(row=2, column=4, columnspan=1)
+        self.widgets[6].grid(row=3, column=1, columnspan=4)
         self.root.config(menu=self.widgets[5])
 
         self.video_source = []
         self.current_video_source = None
-        self.data_stream = b''
-        self.frame = None
+        #Source dont les images sont écrites dans l'enregistrement en cours (fil d'acquisition)
+        self.recorded_source = None
+        #Recherche des caméras en tâche de fond : hôtes et ports testés, période entre deux recherches
+        self.hosts = hosts or [DEFAULT_HOST]
+        self.ports = ports or DEFAULT_PORTS
+        self.rescan_interval = rescan_interval
+        self.rescan_event = threading.Event()
+        #Sources trouvées, en attente d'ajout par le fil d'acquisition, et adresses déjà connectées
+        self.new_sources = queue.Queue()
+        self.known_addresses = set()
+        #Format de diffusion demandé au serveur (binaire par défaut, legacy en repli)
+        self.protocol = stream_protocol
+        #Niveau de qualité demandé au serveur (protocol.TIERS : image réduite pour une liaison lente)
+        self.tier = tier
+        #Toutes les sources sont surveillées par un même sélecteur
+        self.selector = selectors.DefaultSelector()
+        #Mosaïque : 0 (une seule caméra), 2 (2x2) ou 3 (3x3)
+        self.mosaic = 0
+        self.mosaic_frame = None
+        self.tiles = []
+        self.tile_width = 720
+        self.tile_blank = None
+        #Décodage à la taille d'affichage dans un fil dédié, l'interface est mise à jour par refresh_display
+        self.decoder = FrameDecoder(width=720)
+        self.refresh_interval = max(1, int(1000 / display_fps))
+        self.displayed_frames = 0
+        self.fps_time = time.time()
+        self.fps_decoded = 0
+        self.fps_displayed = 0
         self.thread = None
-        self.thread_save_record = None
-        self.frames_to_save = []
+        #Enregistrement écrit au fil de l'eau par un fil dédié (file bornée : mémoire constante)
+        self.record_format = record_format
+        self.recorder = RecordWriter(prefix="", directory="./records/", record_format=record_format)
         self.recording = False
         self.fps = 30
 
-        self.ftp_server = None
-        self.ftp_window = None
+        #Index local du stockage, conservé entre deux ouvertures de la fenêtre de consultation
+        self.storage_index = StorageIndex("./cache/storage_index.json")
+        self.storage_index.load()
+        self.storage_browser = None
+        #Téléchargements : plusieurs connexions FTP en parallèle, reprise des transferts interrompus
+        self.downloads = DownloadManager(self.connect_ftp, directory="./download/")
 
         """
         La fonction d'acquisition de l'image sera placée dans un thread exécuté en boucle.
         """
         self.thread = threading.Thread(target=self.__get_videostream, args=(), daemon=True)
-        self.thread_save_record = threading.Thread(target=self.save_record, args=(), daemon=True)
-        self.thread_ftp = threading.Thread(target=self.get_storage, args=(), daemon=True)
+        self.thread_discovery = threading.Thread(target=self.discovery_loop, args=(), daemon=True)
         #Cette variable servira a arreter le thread d'acquisition depuis l'exterieur de celui-ci
         self.stop_thread = False
+    def start(self):
+        """Démarre l'acquisition, le décodage et la mise à jour de l'affichage."""
+        self.decoder.start()
+        self.recorder.start()
+        self.downloads.start()
+        self.thread_discovery.start()
+        self.thread.start()
+        self.root.after(self.refresh_interval, self.refresh_display)
     def __get_videostream(self):
-        """Acquisition et affichage de l'image de la camera."""
+        """Acquisition des images des caméras (fil réseau : aucun décodage ni accès à l'interface).
+
+        Toutes les sources sont lues en continu par un même sélecteur ; seules les images
+        affichées (source courante ou vignettes de la mosaïque) sont transmises au décodage.
+        """
+        start = time.time()
+        i = 0
         while True:
             # Si la variable d'arret du thread est définie (TRUE), on arrete le programme
             if self.stop_thread:
                 print("[INFO] Arret du fil d'acquisition...")
                 break
-            #S'il n'existe aucune source vidéo, les repérer
+            #Enregistrement demandé, arrêté ou changement de source : vérifié à chaque tour, même sans image
+            self.update_record()
+            #Ajout des sources trouvées en tâche de fond (attente s'il n'y en a encore aucune)
+            self.add_sources(timeout=1 if len(self.video_source) == 0 else None)
             if len(self.video_source) == 0:
-                self.video_source = self.find_video_sources()
+                continue
             #Si aucune source n'est affichée à l'écran, prendre la première disponible
-            elif self.current_video_source is None:
+            if self.current_video_source is None:
                 self.current_video_source = self.video_source[0]
                 start = time.time()
                 i = 0
-                #Activer les boutons de changements de source s'il existe plus d'une source
-                if len(self.video_source) > 1:
-                    #Bouton "source precédente"
-                    if self.widgets[2]["state"] == "disabled":
-                        self.widgets[2].config(state="normal")
-                    #Bouton "source suivante"
-                    if self.widgets[3]["state"] == "disabled":
-                        self.widgets[3].config(state="normal")
-                else:
-                    self.widgets[2].config(state="disabled")
-                    self.widgets[3].config(state="disabled")
-            else:
-                #Lecture du flux vidéo
+            try:
+                events = self.selector.select(timeout=1)
+            except (OSError, ValueError):
+                #Sources fermées pendant l'attente (arrêt de l'application)
+                continue
+            #Sources affichées en vignette : les premières sources, dans l'ordre
+            tiles = self.video_source[:self.mosaic * self.mosaic]
+            for key, mask in events:
+                source = key.fileobj
                 try:
-                    self.data_stream += self.current_video_source.recv(4096)
+                    frames = source.poll()
                 except Exception:
-                    #On reintialise la source vidéo si une erreur est detectée lors de la lecture
-                    print('[ALERT] Source vidéo actuelle perdue...')
-                    self.current_video_source.close()
-                    self.video_source.remove(self.current_video_source)
-                    self.current_video_source = None
-                    no_image = ImageTk.PhotoImage(Image.new("RGB", [300, 300]))
-                    self.widgets[0].configure(image=no_image)
-                    self.widgets[0].image = no_image
-                    self.data_stream = b''
-                    if self.widgets[1]["state"] == "normal":
-                        self.widgets[1].config(state="disabled")
+                    #On retire la source si une erreur est detectée lors de la lecture
+                    self.remove_source(source)
                     continue
-                else:
-                    #On recherche les marqueurs de début et de fin de l'image
-                    img_start = self.data_stream.find(b'\xff\xd8')
-                    img_end = self.data_stream.find(b'\xff\xd9')
-                    if img_start > -1 and img_end > -1:
-                        metadatas = self.data_stream[0:img_start].decode().split(";")
+                current = source is self.current_video_source
+                latest = None
+                for metadatas_text, jpg, timestamp_us in frames:
+                    if current:
                         #Calcul du nombre d'image par secondes (sur une échantillion de 60 images)
                         if i < 60:
                             i += 1
@@ -152,65 +210,155 @@ class CameraMonitorApp():
                             self.fps = 60 / (end - start)
                             i = 0
                             start = time.time()
-                        #On conserve le contenu de l'image
-                        jpg = self.data_stream[img_start:img_end+2]
-                        #Et on soustrait ces données au flux de donnée récupérées
-                        self.data_stream = self.data_stream[img_end+2:]
-                        try:
-                            if self.recording:
-                                self.frames_to_save.append(np.frombuffer(jpg, dtype='int8'))
-                            #Conversion des données de l'image en matrice avec OpenCV
-                            jpg = cv2.imdecode(np.frombuffer(jpg, dtype='int8'), cv2.IMREAD_COLOR)
-                            #Les couleurs de l'image étant mal-étalonnées (BGR)
-                            #On les réétalonne BGR vers RGB
-                            self.frame = cv2.cvtColor(jpg, cv2.COLOR_BGR2RGB)
-                            if self.recording:
-                                self.frames_to_save.append(self.frame)
-                                cv2.putText(self.frame, "RECORDING...", (10, 20), \
-                                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2)
-                            metadatas_text = "Port " + str(metadatas[0].split(':')[1]) + " - " + str(metadatas[1].split('timestamp:')[1])
-                            cv2.putText(self.frame, metadatas_text, ((10, 480 - 30)), \
-                                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2)
-                            #L'image étant sous forme de matrice, on la convertie en image PIL
-                            image = Image.fromarray(self.frame)
-                            #On redimensionne l'image
-                            ratio = image.size[0]/float(image.size[1])
-                            image = image.resize((720, int(720/float(ratio))), Image.ANTIALIAS)
-                            #Enfin, on convertie en PhotoImage PIL pour pouvoir l'afficher
-                            image = ImageTk.PhotoImage(image)
-
-                            #Mise a jour de l'image affichée à l'écran
-                            self.widgets[0].configure(image=image)
-                            self.widgets[0].image = image
-                            #Réactivation du bouton de prise de photo si besoin
-                            if self.widgets[1]["state"] == "disabled":
-                                self.widgets[1].config(state="normal")
-                        except cv2.error:
-                            #On abandonne le traitement de l'image par openCV si en cas d'erreur
-                            continue
-                        except socket.timeout:
-                            #On ignore les temps mort du socket
-                            pass
+                    if source is self.recorded_source and self.recorder.is_open:
+                        self.recorder.write(bytes(jpg), timestamp_us)
+                    latest = (metadatas_text, jpg)
+                if latest is None:
+                    continue
+                #Seule la plus récente des images reçues est transmise au décodage
+                if source in tiles:
+                    self.decoder.submit(source, bytes(latest[1]), latest[0], self.recording and current,
+                                        self.tile_width)
+                elif self.mosaic == 0 and current:
+                    self.decoder.submit(source, bytes(latest[1]), latest[0], self.recording)
+    def add_sources(self, timeout=None):
+        """Ajoute au sélecteur les sources trouvées par la recherche, sans interrompre la lecture."""
+        try:
+            source = self.new_sources.get(timeout=timeout) if timeout else self.new_sources.get_nowait()
+            while True:
+                self.selector.register(source, selectors.EVENT_READ)
+                self.video_source.append(source)
+                source = self.new_sources.get_nowait()
+        except queue.Empty:
+            pass
+    def remove_source(self, source):
+        """Retire une source vidéo perdue."""
+        print("[ALERT] Source vidéo perdue (port " + str(source.port) + ")...")
+        try:
+            self.selector.unregister(source)
+        except (KeyError, ValueError):
+            pass
+        source.close()
+        if source is self.recorded_source:
+            self.recorder.close()
+            self.recorded_source = None
+        self.known_addresses.discard(source.address)
+        if source in self.video_source:
+            self.video_source.remove(source)
+        self.decoder.clear(source)
+        if source is self.current_video_source:
+            self.current_video_source = None
+    def refresh_display(self):
+        """Mise à jour de l'interface depuis la boucle Tk, au plus display_fps fois par seconde."""
+        if self.stop_thread:
+            return
+        current = self.current_video_source
+        if self.mosaic:
+            for index, tile in enumerate(self.tiles):
+                source = self.video_source[index] if index < len(self.video_source) else None
+                decoded = self.decoder.take(source) if source is not None else None
+                if decoded is not None:
+                    image = ImageTk.PhotoImage(decoded[1])
+                    tile.configure(image=image)
+                    tile.image = image
+                    self.displayed_frames += 1
+                elif source is None and tile.image is not self.tile_blank:
+                    tile.configure(image=self.tile_blank)
+                    tile.image = self.tile_blank
+        else:
+            decoded = self.decoder.take(current) if current is not None else None
+            if decoded is not None:
+                #Conversion en PhotoImage PIL pour pouvoir l'afficher
+                image = ImageTk.PhotoImage(decoded[1])
+                self.widgets[0].configure(image=image)
+                self.widgets[0].image = image
+                self.displayed_frames += 1
+            elif current is None and self.widgets[0].image is not self.no_image:
+                #Source perdue : effacement de l'image
+                self.widgets[0].configure(image=self.no_image)
+                self.widgets[0].image = self.no_image
+        #Bouton de prise de photo actif dès qu'une image de la source courante a été décodée
+        state = "normal" if current is not None and self.decoder.last_jpeg(current) is not None else "disabled"
+        if self.widgets[1]["state"] != state:
+            self.widgets[1].config(state=state)
+        #Activer les boutons de changements de source s'il existe plus d'une source
+        state = "normal" if len(self.video_source) > 1 and not self.mosaic else "disabled"
+        if self.widgets[2]["state"] != state:
+            #Boutons "source precédente" et "source suivante"
+            self.widgets[2].config(state=state)
+            self.widgets[3].config(state=state)
+        #Images décodées et affichées par seconde
+        now = time.time()
+        if now - self.fps_time >= 1:
+            decoded_fps = (self.decoder.decoded_frames - self.fps_decoded) / (now - self.fps_time)
+            displayed_fps = (self.displayed_frames - self.fps_displayed) / (now - self.fps_time)
+            self.widgets[6].config(text="Reçues : " + str(round(self.fps, 1)) + " i/s - Décodées : " \
+                                   + str(round(decoded_fps, 1)) + " i/s - Affichées : " \
+                                   + str(round(displayed_fps, 1)) + " i/s")
+            self.fps_time = now
+            self.fps_decoded = self.decoder.decoded_frames
+            self.fps_displayed = self.displayed_frames
+        self.root.after(self.refresh_interval, self.refresh_display)
+    def set_view(self, size):
+        """Affichage d'une seule caméra (size = 0) ou d'une mosaïque de size x size caméras."""
+        self.mosaic = 0
+        if self.mosaic_frame is not None:
+            self.mosaic_frame.destroy()
+            self.mosaic_frame = None
+            self.tiles = []
+        self.decoder.clear()
+        if size == 0:
+            self.widgets[0].grid()
+            return
+        print("[INFO] Affichage en mosaïque " + str(size) + "x" + str(size))
+        self.widgets[0].grid_remove()
+        #Vignettes décodées en taille réduite, la pleine résolution est réservée à la caméra sélectionnée
+        self.tile_width = 720 // size
+        self.tile_blank = ImageTk.PhotoImage(Image.new("RGB", [self.tile_width, self.tile_width * 3 // 4]))
+        self.mosaic_frame = tki.Frame(self.root, bg="black")
+        for index in range(size * size):
+            tile = tki.Label(self.mosaic_frame, image=self.tile_blank, bg="black", borderwidth=1)
+            tile.image = self.tile_blank
+            tile.grid(row=index // size, column=index % size)
+            #Un clic sur une vignette affiche la caméra seule, en pleine résolution
+            tile.bind("<Button-1>", lambda event, index=index: self.focus_tile(index))
+            self.tiles.append(tile)
+        self.mosaic_frame.grid(row=1, column=1, columnspan=4)
+        self.mosaic = size
+    def focus_tile(self, index):
+        """Affiche seule la caméra d'une vignette de la mosaïque."""
+        if index < len(self.video_source):
+            self.current_video_source = self.video_source[index]
+            self.set_view(0)
     def find_video_sources(self):
-        """Scan les ports disponibles sur le serveur 8001 - 8010."""
+        """Recherche des caméras sur les hôtes et ports configurés, toutes les connexions étant tentées en même temps."""
         start_scan = time.time()
-        print("[INFO] Recherche de sources vidéo...")
-        ports_ok = []
+        connections = discover(self.hosts, self.ports, timeout=DISCOVERY_TIMEOUT, exclude=self.known_addresses)
         sources_ok = []
-        for port in range(8001, 8005):
-            test_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        for sock, address in connections:
             try:
-                test_socket.connect(("_._._._", port))
-            except Exception:
-                test_socket.close()
+                sources_ok.append(VideoSource(sock, address, self.protocol, self.tier))
+            except OSError:
+                sock.close()
                 continue
-            else:
-                test_socket.settimeout(1)
-                ports_ok.append(port)
-                sources_ok.append(test_socket)
-        print("[INFO] Port(s) open : " + str(ports_ok) + " ; total : " + str(len(ports_ok)))
-        print("in " + str(time.time() - start_scan) + " seconds")
+            self.known_addresses.add(address)
+        if len(sources_ok) > 0:
+            print("[INFO] New source(s) : " + str([source.address for source in sources_ok]) + " ; total : " \
+                  + str(len(self.known_addresses)) + " in " + str(round(time.time() - start_scan, 3)) + " seconds")
         return sources_ok
+    def discovery_loop(self):
+        """Recherche périodique des caméras : les nouvelles sources sont transmises au fil d'acquisition."""
+        print("[INFO] Recherche de sources vidéo...")
+        while not self.stop_thread:
+            for source in self.find_video_sources():
+                self.new_sources.put(source)
+            #Recherche plus fréquente tant qu'aucune source n'est connectée
+            self.rescan_event.wait(self.rescan_interval if len(self.known_addresses) > 0 else 1)
+            self.rescan_event.clear()
+    def rescan(self):
+        """Relance immédiatement la recherche des caméras (bouton RELOAD)."""
+        print("[INFO] Nouvelle recherche de sources vidéo...")
+        self.rescan_event.set()
     def change_source(self, command):
         """Basculer d'une source vidéo à une autre."""
         print("[INFO] Changement de source...")
@@ -231,11 +379,14 @@ class CameraMonitorApp():
                     self.current_video_source = self.video_source[0]
                 else:
                     self.current_video_source = self.video_source[current_source_index + 1]
+            #Une image ancienne de la nouvelle source n'est pas affichée
+            self.decoder.clear(self.current_video_source)
 
     def take_picture(self):
         """ Capture de l'image courante pour l'enregistrer """
         #On commence par vérifier que la source est active et que l'image affiché est valide
-        if not self.current_video_source is None and isinstance(self.frame, np.ndarray):
+        jpeg = self.decoder.last_jpeg(self.current_video_source)
+        if not self.current_video_source is None and jpeg is not None:
             now = str(datetime.datetime.now().strftime("%Y-%m-%d-%H_%M_%S"))
             directory = "./captures/"
             filename = "pic-" + str(now) + ".png"
@@ -245,8 +396,12 @@ class CameraMonitorApp():
                     os.mkdir(directory)
                 except OSError as os_exception:
                     print("[ERROR] OS error detected : " + str(os_exception))
-            #Enregistrement et affichage de l'image actuelle
-            frame_to_save = Image.fromarray(self.frame)
+            #Enregistrement et affichage de l'image actuelle, décodée en pleine résolution
+            frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if frame is None:
+                print("[ERROR] Invalid current image or inactive video source")
+                return
+            frame_to_save = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
             frame_to_save.save(directory + filename, format="png")
             frame_to_save.show()
             print("[INFO] Save of current picture as : " + \
@@ -257,15 +412,21 @@ class CameraMonitorApp():
     def on_close(self):
         """Arret propre du programme pour vider les variables et arreter l'application."""
         print("[INFO] Arret de l'application")
+        #Arrêt du fil d'acquisition (au plus une seconde d'attente) avant de fermer ce qu'il utilise
+        self.stop_thread = True
+        self.rescan_event.set()
+        if self.thread.is_alive():
+            self.thread.join()
         # Vérification de l'existence existence d'une source video et arret
         if not self.current_video_source is None:
             self.current_video_source = None
         for source in self.video_source:
             source.close()
         self.video_source.clear()
-        if self.recording:
-            self.thread_save_record.start()
-        self.stop_thread = True
+        self.decoder.stop()
+        #Les images en file sont écrites avant la fermeture
+        self.recording = False
+        self.recorder.stop()
         self.root.quit()
         self.root.destroy()
     def record(self):
@@ -275,103 +436,77 @@ class CameraMonitorApp():
         else:
             print("[INFO] Début de l'enregistrement...")
             self.recording = True
-    def save_record(self):
-        """Arrete l'enregistrement et sauvegarde les images récupérées en vidéo."""
-        self.recording = False
-        frames = self.frames_to_save
-        print("[INFO] Stop recording, saving " + str(len(frames)) + " frame(s)...")
-        print("[INFO] FPS = " + str(self.fps))
-        now = str(datetime.datetime.now().strftime("%Y-%m-%d-%H_%M_%S"))
-        filename = "rec-" + str(now) + ".mp4"
-        if not os.path.isdir("./records/"):
-            try:
-                os.mkdir("./records/")
-                print("[INFO] Created video record directory")
-            except OSError as os_exception:
-                print("[ERROR] OS error detected : " + str(os_exception))
-        #
-        writer = imageio.get_writer('records/'+filename, format='mp4', mode='I', fps=int(self.fps))
-        print(type(frames[0]))
-        for frame in frames:
-            writer.append_data(frame)
-        writer.close()
-        print("[INFO] Record saved as : " + str(filename) + " in records directory.")
-        self.frames_to_save.clear()
-        self.thread_save_record = threading.Thread(target=self.save_record, args=(), daemon=True)
-    def get_storage(self):
-        """Création d'une fenêtre pour visionner le stockage des enregistrements."""
-        print("[INFO] Consultation des enregistrement...")
-        self.ftp_window = tki.Toplevel(self.root)
-        self.ftp_window.wm_protocol("WM_DELETE_WINDOW", func=self.close_ftp)
-        self.ftp_window.wm_title("Consultation des enregistrements")
-        try:
-            self.ftp_server = FTP('_._._._', "_", "_")
-            content = []
-            directories = self.ftp_server.nlst()
-            for directory in directories:
-                for file in self.ftp_server.mlsd(directory):
-                    filename, meta = file
-                    if meta.get('type') == 'file':
-                        size = meta.get('size')
-                        last_modified = datetime.timedelta(hours=2) + datetime.datetime.strptime(meta.get("modify"), "%Y%m%d%H%M%S")
-                        file_datas = str(directory) + "|" + str(filename) + "|" + str(size) + "|" + str(last_modified)
-                        content.append(file_datas)
-
-            if len(content) > 0:
-                container = tki.Frame(self.ftp_window)
-                canvas = tki.Canvas(container)
-                scrollbar = tki.Scrollbar(container, orient="vertical", command=canvas.yview)
-                scrollable_frame = tki.Frame(canvas)
+    def stop_record(self):
+        """Arrete l'enregistrement, le fichier est terminé par le fil d'écriture."""
+        if self.recording:
+            print("[INFO] Stop recording...")
+            self.recording = False
+    def update_record(self):
+        """Ouvre ou termine l'enregistrement demandé par l'interface (appelé par le fil d'acquisition).
 
-                tki.Label(self.ftp_window, text=str(len(content)) + "file(s) found :").grid(sticky="N", row=1, column=1)
-                tki.Label(self.ftp_window, text="Filename").grid(sticky="N", row=2, column=1)
-                tki.Label(self.ftp_window, text="Taille").grid(sticky="N", row=2, column=2)
-                tki.Label(self.ftp_window, text="Date").grid(sticky="N", row=2, column=3)
-                for file in content:
-                    file_infos = file.split("|")
-                    tki.Label(self.ftp_window, text=file_infos[1]).grid(sticky="W", row=content.index(file) + 3, column=1, padx=20, pady=20)
-                    tki.Label(self.ftp_window, text=file_infos[2]).grid(sticky="W", row=content.index(file) + 3, column=2, padx=20, pady=20)
-                    tki.Label(self.ftp_window, text=file_infos[3]).grid(sticky="W", row=content.index(file) + 3, column=3, padx=20, pady=20)
-                    tki.Button(self.ftp_window, text="\/", command=lambda file=str(file_infos[0])+'/'+str(file_infos[1]): self.download_file(file))\
-                        .grid(row=content.index(file) + 3, column=4, padx=20, pady=20)
-            else:
-                print("No record")
-        except Exception as ftp_err:
-            print("FTP ERROR : " + str(ftp_err))
-        #Afficher la fenêtre en continue
-        self.ftp_window.mainloop()
-    def download_file(self, file):
-        """Telecharge le fichier sélectionné."""
-        directories = ["./download/", "./download/captures/", "./download/records/"]
-        created_directories = []
-        for directory in directories:
-            if not os.path.isdir(directory):
-                try:
-                    os.mkdir(directory)
-                    created_directories.append(directory)
-                except OSError as os_exception:
-                    print("[ERROR] OS error detected : " + str(os_exception))
-        if len(created_directories) > 0:
-            print("[INFO] Created " + str(created_directories))
-        try:
-            self.ftp_server.retrbinary("RETR " + str(file), open("download/" + str(file), 'wb').write)
-        except Exception as dl_err:
-            print("[ERROR] Download failed : " + str(dl_err))
-        else:
-            print("[INFO] << " + str(file) + " >> successfully downloaded...")
-    def close_ftp(self):
-        """Arrête la connexion FTP et ferme la fenêtre de consultation."""
-        print("[INFO] Fenêtre de consultation des enregistrements fermée")
-        if not self.ftp_server is None:
-            self.ftp_server = None
-        self.ftp_window.destroy()
-        self.thread_ftp = threading.Thread(target=self.get_storage, args=(), daemon=True)
+        Un changement de source termine le fichier en cours ; l'enregistrement continue
+        dans un nouveau fichier avec la nouvelle source.
+        """
+        current = self.current_video_source
+        if self.recorder.is_open and (not self.recording or self.recorded_source is not current):
+            self.recorder.close()
+            self.recorded_source = None
+        if self.recording and not self.recorder.is_open and current is not None:
+            print("[INFO] FPS = " + str(round(self.fps, 1)))
+            self.recorder.open(fps=round(self.fps, 2))
+            self.recorded_source = current
+    def connect_ftp(self):
+        """Nouvelle connexion au stockage serveur."""
+        return FTP('_._._._', "_", "_")
+    def open_storage(self):
+        """Ouvre (ou remet au premier plan) la fenêtre de consultation des enregistrements."""
+        if self.storage_browser is not None and not self.storage_browser.closed:
+            self.storage_browser.lift()
+            return
+        print("[INFO] Consultation des enregistrement...")
+        self.storage_browser = StorageBrowser(self.root, self.connect_ftp, self.storage_index, self.download_files,
+                                              progress=self.downloads.status)
+    def download_files(self, files):
+        """Ajoute les fichiers sélectionnés aux téléchargements en tâche de fond."""
+        self.downloads.add(files)
 def main():
     """ Fonction principale : Création et démarrage de l'interface client. """
     print("Camera Monitor [v3.3]")
     print("(c) 2021 by 23")
-    app = CameraMonitorApp()
-    app.thread.start()
+    stream_protocol = protocol.PROTOCOL_LEGACY if "--legacy" in sys.argv else protocol.PROTOCOL_BINARY
+    record_format = "mp4"
+    if "--record-format" in sys.argv and sys.argv.index("--record-format") + 1 < len(sys.argv):
+        record_format = sys.argv[sys.argv.index("--record-format") + 1]
+        if record_format not in CONTAINERS:
+            print("--record-format must be " + " or ".join(CONTAINERS))
+            sys.exit()
+    hosts = None
+    if "--hosts" in sys.argv and sys.argv.index("--hosts") + 1 < len(sys.argv):
+        hosts = sys.argv[sys.argv.index("--hosts") + 1].split(",")
+    ports = None
+    if "--ports" in sys.argv and sys.argv.index("--ports") + 1 < len(sys.argv):
+        try:
+            ports = parse_ports(sys.argv[sys.argv.index("--ports") + 1])
+        except ValueError:
+            print("--ports must be a range (8001-8010) or a list (8001,8003)")
+            sys.exit()
+    rescan_interval = 10
+    if "--rescan" in sys.argv and sys.argv.index("--rescan") + 1 < len(sys.argv):
+        value = sys.argv[sys.argv.index("--rescan") + 1]
+        if not value.isdigit() or int(value) == 0:
+            print("--rescan must be a positive number of seconds")
+            sys.exit()
+        rescan_interval = int(value)
+    tier = protocol.TIER_FULL
+    if "--tier" in sys.argv and sys.argv.index("--tier") + 1 < len(sys.argv):
+        try:
+            tier = protocol.tier_by_name(sys.argv[sys.argv.index("--tier") + 1])
+        except ValueError as err:
+            print("--tier : " + str(err))
+            sys.exit()
+    app = CameraMonitorApp(stream_protocol=stream_protocol, record_format=record_format,
+                           hosts=hosts, ports=ports, rescan_interval=rescan_interval, tier=tier)
+    app.start()
     app.root.mainloop()
     del app
 
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/2026
+
+@author: 23
+
+@desc: Détection de mouvement.\
+       Le fond de la scène est un modèle adaptatif (moyenne glissante ou MOG2) \
+       qui suit les variations lentes d'éclairage, et les zones en mouvement \
+       sont mesurées en une seule passe de composantes connexes.
+"""
+
+import collections
+
+import numpy as np
+import cv2
+
+#Décodage JPEG réduit (mise à l'échelle dans le domaine DCT)
+REDUCED_GRAYSCALE = {1: cv2.IMREAD_GRAYSCALE, 2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+                     4: cv2.IMREAD_REDUCED_GRAYSCALE_4, 8: cv2.IMREAD_REDUCED_GRAYSCALE_8}
+
+#Résultat d'une analyse : mouvement détecté, surface de la plus grande zone et nombre
+#de zones retenues (surfaces exprimées en pixels de l'image pleine résolution)
+Detection = collections.namedtuple("Detection", "motion peak_area blobs")
+
+
+class RunningAverageBackground():
+    """Fond estimé par moyenne glissante pondérée (learning_rate : poids de la nouvelle image)."""
+    def __init__(self, learning_rate=0.02, threshold=50):
+        self.learning_rate = learning_rate
+        self.threshold = threshold
+        self.model = None
+
+    def reset(self):
+        """Oublie le fond appris."""
+        self.model = None
+
+    def apply(self, gray):
+        """Renvoie le masque des pixels différents du fond, puis met le fond à jour."""
+        if self.model is None:
+            self.model = gray.astype(np.float32)
+            return None
+        frame_delta = cv2.absdiff(cv2.convertScaleAbs(self.model), gray)
+        mask = cv2.threshold(frame_delta, self.threshold, 255, cv2.THRESH_BINARY)[1]
+        cv2.accumulateWeighted(gray, self.model, self.learning_rate)
+        return mask
+
+
+class MOGBackground():
+    """Fond estimé par mélange de gaussiennes (cv2 MOG2)."""
+    def __init__(self, learning_rate=0.005, history=500, var_threshold=16):
+        self.learning_rate = learning_rate
+        self.history = history
+        self.var_threshold = var_threshold
+        self.subtractor = None
+        self.reset()
+
+    def reset(self):
+        """Oublie le fond appris."""
+        self.subtractor = cv2.createBackgroundSubtractorMOG2(history=self.history, varThreshold=self.var_threshold,
+                                                             detectShadows=False)
+
+    def apply(self, gray):
+        """Renvoie le masque de premier plan, le fond est mis à jour au passage."""
+        return self.subtractor.apply(gray, learningRate=self.learning_rate)
+
+
+BACKGROUND_MODELS = {"average": RunningAverageBackground, "mog": MOGBackground}
+
+
+class MotionDetector():
+    """Détecteur de mouvement sur images JPEG.
+
+    scale : facteur de réduction du décodage (1, 2, 4 ou 8) ;
+    min_area : surface minimale d'une zone en mouvement, en pixels pleine résolution ;
+    idle_interval : au repos, une image sur idle_interval est analysée.
+    """
+    def __init__(self, background="average", learning_rate=None, scale=4, min_area=500, idle_interval=3):
+        #Paramètres conservés pour recréer un détecteur identique (processus de détection)
+        self.options = {"background": background, "learning_rate": learning_rate, "scale": scale,
+                        "min_area": min_area, "idle_interval": idle_interval}
+        if background not in BACKGROUND_MODELS:
+            raise ValueError("Unknown background model : " + str(background))
+        if scale not in REDUCED_GRAYSCALE:
+            raise ValueError("Scale must be 1, 2, 4 or 8")
+        if learning_rate is None:
+            self.background = BACKGROUND_MODELS[background]()
+        else:
+            self.background = BACKGROUND_MODELS[background](learning_rate=learning_rate)
+        self.scale = scale
+        self.area_factor = scale * scale
+        self.min_area = min_area / float(self.area_factor)
+        self.blur_size = max(3, (21 // scale) | 1)
+        self.idle_interval = idle_interval
+        self.frame_count = 0
+        self.analysed_count = 0
+
+    def should_analyse(self, active):
+        """Vrai si l'image courante doit être analysée (toujours pendant un mouvement)."""
+        self.frame_count += 1
+        return active or self.frame_count == 1 or self.frame_count % self.idle_interval == 0
+
+    def decode(self, jpeg):
+        """Décode directement en niveaux de gris réduits et floutés, None si l'image est invalide."""
+        gray = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), REDUCED_GRAYSCALE[self.scale])
+        if gray is None:
+            return None
+        return cv2.GaussianBlur(gray, (self.blur_size, self.blur_size), 0)
+
+    def analyse_gray(self, gray):
+        """Analyse une image déjà décodée par decode()."""
+        self.analysed_count += 1
+        mask = self.background.apply(gray)
+        if mask is None:
+            return Detection(False, 0, 0)
+        mask = cv2.dilate(mask, None, iterations=2)
+        count, labels, stats, centroids = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        #La composante 0 est le fond
+        areas = stats[1:, cv2.CC_STAT_AREA]
+        blobs = int(np.count_nonzero(areas >= self.min_area))
+        peak_area = int(areas.max()) * self.area_factor if len(areas) > 0 else 0
+        return Detection(blobs > 0, peak_area, blobs)
+
+    def analyse(self, jpeg):
+        """Analyse une image JPEG, renvoie un Detection ou None si l'image est invalide."""
+        gray = self.decode(jpeg)
+        if gray is None:
+            return None
+        return self.analyse_gray(gray)
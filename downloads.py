@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/2026
+
+@author: 23
+
+@desc: Téléchargement des fichiers du stockage en tâche de fond.\
+       Quelques fils de téléchargement, chacun avec sa propre connexion FTP \
+       (gardée ouverte d'un fichier à l'autre), se partagent une file de \
+       fichiers. Un fichier est écrit sous <nom>.part puis renommé une fois \
+       complet ; un transfert interrompu reprend là où il s'était arrêté (REST).
+"""
+
+import os
+import time
+import queue
+import threading
+import ftplib
+
+
+class Transfer():
+    """État d'un téléchargement."""
+    def __init__(self, remote_path, local_path):
+        self.remote_path = remote_path
+        self.local_path = local_path
+        self.size = None
+        self.done = 0
+        #Octets reçus depuis le début de la session (hors reprise) et heure de début
+        self.received = 0
+        self.started = None
+        self.state = "waiting"
+
+    def throughput(self):
+        """Débit moyen de la session en cours, en octets par seconde."""
+        if self.started is None:
+            return 0.0
+        return self.received / max(time.time() - self.started, 0.001)
+
+
+class DownloadManager():
+    """File de téléchargements traitée par un petit groupe de connexions FTP.
+
+    connect : fonction renvoyant une nouvelle connexion FTP.
+    """
+    def __init__(self, connect, directory="./download/", workers=3, block_size=256 * 1024,
+                 buffer_size=1024 * 1024, retries=5, idle_timeout=30, prefix="[DOWNLOAD]"):
+        self.connect = connect
+        self.directory = directory
+        self.workers = workers
+        self.block_size = block_size
+        self.buffer_size = buffer_size
+        self.retries = retries
+        self.idle_timeout = idle_timeout
+        self.prefix = prefix
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        #Téléchargements en attente ou en cours, par chemin distant
+        self.transfers = {}
+        self.completed = 0
+        self.failed = 0
+        self.threads = [threading.Thread(target=self.run, args=(), daemon=True) for _ in range(workers)]
+
+    def start(self):
+        """Démarre les fils de téléchargement."""
+        for thread in self.threads:
+            thread.start()
+
+    def add(self, files):
+        """Ajoute des fichiers (chemins sur le stockage) à la file ; un fichier déjà en file est ignoré."""
+        for remote_path in files:
+            with self.lock:
+                if remote_path in self.transfers:
+                    continue
+                transfer = Transfer(remote_path, os.path.join(self.directory, *remote_path.split("/")))
+                self.transfers[remote_path] = transfer
+            self.queue.put(transfer)
+        print(self.prefix + "[INFO] " + str(self.queue.qsize()) + " file(s) waiting")
+
+    def status(self):
+        """Résumé des téléchargements : fichiers en cours, progression et débit."""
+        with self.lock:
+            transfers = list(self.transfers.values())
+        active = [transfer for transfer in transfers if transfer.state == "active"]
+        waiting = len(transfers) - len(active)
+        if not transfers:
+            return ""
+        done = sum(transfer.done for transfer in active)
+        size = sum(transfer.size or 0 for transfer in active)
+        throughput = sum(transfer.throughput() for transfer in active)
+        text = str(len(active)) + " téléchargement(s) en cours, " + str(waiting) + " en attente"
+        if size:
+            text += " - " + str(int(100 * done / size)) + " % - " + str(round(throughput / 1048576, 2)) + " Mo/s"
+        return text
+
+    def run(self):
+        """Boucle d'un fil de téléchargement : une connexion FTP, réouverte après une erreur."""
+        ftp = None
+        while True:
+            try:
+                transfer = self.queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                #Connexion inutilisée : fermée plutôt que laissée expirer côté serveur
+                ftp = self._close(ftp)
+                continue
+            for attempt in range(self.retries):
+                try:
+                    if ftp is None:
+                        ftp = self.connect()
+                    self.download(ftp, transfer)
+                except ftplib.error_perm as err:
+                    #Erreur définitive (fichier absent, droits...)
+                    print(self.prefix + "[ERROR] " + str(transfer.remote_path) + " : " + str(err))
+                    transfer.state = "failed"
+                    break
+                except (ftplib.Error, OSError, EOFError) as err:
+                    #Transfert interrompu : nouvelle connexion puis reprise
+                    print(self.prefix + "[ALERT] " + str(transfer.remote_path) + " interrupted ("
+                          + str(err) + "), retry " + str(attempt + 1) + "/" + str(self.retries))
+                    ftp = self._close(ftp)
+                    time.sleep(attempt + 1)
+                else:
+                    break
+            else:
+                print(self.prefix + "[ERROR] " + str(transfer.remote_path) + " : download failed")
+                transfer.state = "failed"
+            with self.lock:
+                del self.transfers[transfer.remote_path]
+                if transfer.state == "complete":
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+    @staticmethod
+    def _close(ftp):
+        """Ferme une connexion FTP sans lever d'erreur, renvoie None."""
+        if ftp is not None:
+            try:
+                ftp.quit()
+            except (ftplib.Error, OSError, EOFError):
+                ftp.close()
+        return None
+
+    def download(self, ftp, transfer):
+        """Télécharge un fichier, en reprenant le fichier partiel s'il existe."""
+        directory = os.path.dirname(transfer.local_path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory, exist_ok=True)
+        partial_path = transfer.local_path + ".part"
+        offset = os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+        ftp.voidcmd("TYPE I")
+        transfer.size = ftp.size(transfer.remote_path)
+        if transfer.size is not None and offset > transfer.size:
+            #Fichier distant remplacé depuis : le fichier partiel n'est plus valable
+            os.remove(partial_path)
+            offset = 0
+        transfer.done = offset
+        transfer.received = 0
+        transfer.started = time.time()
+        transfer.state = "active"
+        with open(partial_path, "ab", buffering=self.buffer_size) as output:
+            def write(block):
+                output.write(block)
+                transfer.done += len(block)
+                transfer.received += len(block)
+            if transfer.size is None or offset < transfer.size:
+                ftp.retrbinary("RETR " + str(transfer.remote_path), write, blocksize=self.block_size,
+                               rest=offset or None)
+        if transfer.size is not None and transfer.done < transfer.size:
+            raise EOFError("incomplete transfer (" + str(transfer.done) + "/" + str(transfer.size) + ")")
+        os.replace(partial_path, transfer.local_path)
+        transfer.state = "complete"
+        elapsed = max(time.time() - transfer.started, 0.001)
+        print(self.prefix + "[INFO] << " + str(transfer.remote_path) + " >> successfully downloaded ("
+              + str(round(transfer.done / 1048576, 2)) + " Mo, " + str(round(transfer.received / elapsed / 1048576, 2))
+              + " Mo/s" + (", resumed at " + str(offset) if offset else "") + ")")
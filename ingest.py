@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/2026
+
+@author: 23
+
+@desc: Connexion aux caméras (flux MJPEG sur HTTP) et reconnexion.\
+       La requête HTTP/1.0 est envoyée directement sur une socket : le flux est lu \
+       par grands blocs (recv_into) dans le tampon réutilisé de l'extraction \
+       (mjpeg.FrameExtractor). HTTPResponse.readinto attendrait que le bloc soit \
+       plein, d'où les petites lectures faites jusqu'ici avec urllib.
+       Une source perdue est reconnectée avec un délai qui double à chaque échec \
+       (avec un peu d'aléa) ; l'état du serveur (détection, clients, enregistrement \
+       en cours) n'est pas touché.
+"""
+
+import time
+import random
+import socket
+import urllib.parse
+
+#Taille des lectures de la socket de la caméra
+READ_SIZE = 65536
+#Sans données pendant ce délai, la connexion est considérée comme perdue (caméra éteinte sans fermeture TCP)
+READ_TIMEOUT = 10
+MAX_HEADER_SIZE = 16384
+
+
+def http_request(url):
+    """(hôte, port, requête GET HTTP/1.0) pour l'adresse d'un flux (HTTP/1.0 : pas d'encodage chunked)."""
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme != "http" or not parts.hostname:
+        raise ValueError("Unsupported source url : " + str(url))
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+    request = "GET " + path + " HTTP/1.0\r\nHost: " + str(parts.hostname) + "\r\n\r\n"
+    return parts.hostname, parts.port or 80, request.encode()
+
+
+def parse_response(head):
+    """Vérifie l'en-tête d'une réponse HTTP, renvoie la frontière multipart (bytes) ou None si elle n'est pas annoncée.
+
+    Lève ConnectionError si le statut n'est pas 200.
+    """
+    lines = head.split(b'\r\n')
+    status = lines[0].split()
+    if len(status) < 2 or status[1] != b'200':
+        raise ConnectionError("HTTP status " + lines[0].decode(errors="replace"))
+    for line in lines[1:]:
+        name, _, value = line.partition(b':')
+        if name.strip().lower() != b'content-type':
+            continue
+        for parameter in value.split(b';')[1:]:
+            key, _, boundary = parameter.strip().partition(b'=')
+            if key.lower() == b'boundary':
+                return boundary.strip(b'" ')
+    return None
+
+
+def split_response(response):
+    """Sépare l'en-tête de la réponse du début du flux, renvoie (frontière, corps) ou None si l'en-tête est incomplet."""
+    if b'\r\n\r\n' not in response:
+        if len(response) > MAX_HEADER_SIZE:
+            raise ConnectionError("Invalid HTTP response")
+        return None
+    head, _, body = response.partition(b'\r\n\r\n')
+    return parse_response(head), body
+
+
+def open_source(url, extractor, timeout=5):
+    """Connexion bloquante à un flux : renvoie (socket, frontière multipart).
+
+    Les octets du flux reçus avec l'en-tête sont placés dans extractor (vidé au préalable).
+    """
+    host, port, request = http_request(url)
+    sock = socket.create_connection((host, port), timeout)
+    try:
+        sock.sendall(request)
+        response = b''
+        parsed = None
+        while parsed is None:
+            data = sock.recv(4096)
+            if not data:
+                raise ConnectionError("Invalid HTTP response")
+            response += data
+            parsed = split_response(response)
+    except OSError:
+        sock.close()
+        raise
+    boundary, body = parsed
+    extractor.clear()
+    extractor.feed(body)
+    return sock, boundary
+
+
+def describe_boundary(boundary):
+    """Texte du journal de connexion."""
+    if boundary is None:
+        return "no multipart boundary, JPEG markers used"
+    return "multipart boundary " + boundary.decode(errors="replace")
+
+
+class SourceState():
+    """Connexions d'une source : délai avant la prochaine tentative, reconnexions et durée des coupures.
+
+    Le délai double à chaque échec (au plus max_backoff secondes) et revient au
+    minimum dès qu'une image est reçue. Une connexion perdue n'est rouverte aussitôt
+    que si elle a apporté au moins une image : une caméra qui accepte la connexion
+    puis la coupe sans rien envoyer n'est pas relancée en boucle.
+    """
+    def __init__(self, backoff=0.5, max_backoff=30):
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.failures = 0
+        self.connections = 0
+        self.connected = False
+        #Image reçue depuis la dernière connexion
+        self.received = False
+        #Début de la coupure en cours (time.monotonic), None si la source est connectée ou n'a jamais été vue
+        self.lost_at = None
+        self.downtime = 0.0
+
+    def up(self):
+        """Connexion établie, renvoie la durée de la coupure qui se termine (None à la première connexion)."""
+        self.connections += 1
+        self.connected = True
+        self.received = False
+        if self.lost_at is None:
+            return None
+        outage = time.monotonic() - self.lost_at
+        self.downtime += outage
+        self.lost_at = None
+        return outage
+
+    def lost(self, since=None):
+        """Connexion perdue ou tentative échouée (since : dernières données reçues, time.monotonic)."""
+        self.connected = False
+        if self.lost_at is None and self.connections > 0:
+            self.lost_at = time.monotonic() if since is None else since
+
+    def frame(self):
+        """Image reçue : la source fonctionne, le délai de reconnexion revient au minimum."""
+        self.received = True
+        if self.failures:
+            self.failures = 0
+
+    def retry_delay(self):
+        """Délai avant la prochaine tentative (secondes), aléa compris, au plus max_backoff."""
+        #Exposant borné : au-delà, le délai est de toute façon plafonné (et 2 ** n ne dépasse pas les flottants)
+        delay = min(self.max_backoff, self.backoff * 2 ** min(self.failures, 32) * random.uniform(0.5, 1.5))
+        self.failures += 1
+        return delay
+
+    def reconnect_delay(self):
+        """Délai avant de rouvrir une connexion perdue : aucun si elle a apporté une image, sinon retry_delay()."""
+        if self.received:
+            return 0
+        return self.retry_delay()
+
+    def reconnects(self):
+        """Nombre de reconnexions depuis la première connexion."""
+        return max(self.connections - 1, 0)
+
+    def total_downtime(self):
+        """Durée totale des coupures (secondes), coupure en cours comprise."""
+        if self.lost_at is None:
+            return self.downtime
+        return self.downtime + time.monotonic() - self.lost_at
+
+    def summary(self):
+        """Résumé lisible pour le journal."""
+        return str(self.reconnects()) + " reconnection(s), " + str(round(self.total_downtime(), 1)) + " s without source"
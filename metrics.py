@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/2026
+
+@author: 23
+
+@desc: Mesures du serveur de diffusion et de surveillance.\
+       Compteurs, jauges et histogrammes de latence par étape (lecture de la \
+       source, détection, diffusion, enregistrement), par caméra. Une mesure \
+       coûte une addition et une recherche dichotomique dans des seuils fixes : \
+       elles peuvent rester actives en production. Les valeurs sont servies au \
+       format texte Prometheus sur un port annexe (GET /metrics).
+"""
+
+import os
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = "[METRICS]"
+#Seuils des histogrammes de latence, en millisecondes
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+def process_usage():
+    """Renvoie (mémoire résidente en octets, temps CPU consommé en secondes) du processus."""
+    rss = 0
+    try:
+        with open("/proc/self/status", "r") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    rss = int(line.split()[1]) * 1024
+                    break
+    except OSError:
+        try:
+            import resource
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        except ImportError:
+            pass
+    times = os.times()
+    return rss, times.user + times.system
+
+
+def format_labels(labels):
+    """Etiquettes au format Prometheus : {camera="8001",stage="read"}."""
+    if not labels:
+        return ""
+    return "{" + ",".join(str(key) + '="' + str(value) + '"' for key, value in labels) + "}"
+
+
+class Histogram():
+    """Histogramme à seuils fixes (millisecondes) : nombre de mesures par intervalle, total et nombre."""
+    def __init__(self, bounds=LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        #Un intervalle de plus pour les mesures au-delà du dernier seuil
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        """Ajoute une durée en secondes."""
+        milliseconds = seconds * 1000.0
+        self.counts[bisect.bisect_left(self.bounds, milliseconds)] += 1
+        self.count += 1
+        self.total += milliseconds
+
+    def quantile(self, q):
+        """Estimation d'un quantile (seuil de l'intervalle qui le contient), en millisecondes."""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        cumulated = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulated += count
+            if cumulated >= rank:
+                return float(bound)
+        return float("inf")
+
+    def render(self, name, labels):
+        """Lignes Prometheus de l'histogramme (intervalles cumulés, total et nombre)."""
+        lines = []
+        cumulated = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulated += count
+            lines.append(name + "_bucket" + format_labels(labels + [("le", bound)]) + " " + str(cumulated))
+        lines.append(name + "_bucket" + format_labels(labels + [("le", "+Inf")]) + " " + str(self.count))
+        lines.append(name + "_sum" + format_labels(labels) + " " + str(round(self.total, 3)))
+        lines.append(name + "_count" + format_labels(labels) + " " + str(self.count))
+        return lines
+
+
+class Metrics():
+    """Mesures d'une caméra (ou du processus) : compteurs, jauges et histogrammes par étape.
+
+    inc() et observe() sont appelées dans le chemin critique, sans verrou : une
+    mesure perdue lors d'un accès concurrent est acceptée. Les jauges sont des
+    fonctions évaluées seulement à la lecture des mesures.
+    """
+    def __init__(self, labels=None):
+        self.labels = sorted((labels or {}).items())
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    def inc(self, name, count=1):
+        """Incrémente un compteur."""
+        self.counters[name] = self.counters.get(name, 0) + count
+
+    def observe(self, stage, seconds):
+        """Ajoute la durée d'une étape (secondes)."""
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = Histogram()
+        histogram.observe(seconds)
+
+    def gauge(self, name, function, labels=None):
+        """Déclare une jauge : function() renvoie sa valeur courante (labels : étiquettes en plus de celles de la caméra)."""
+        self.gauges[(name, tuple(sorted((labels or {}).items())))] = function
+
+    def render(self):
+        """Lignes Prometheus de toutes les mesures."""
+        lines = []
+        for name, value in sorted(self.counters.items()):
+            lines.append("rds_" + name + "_total" + format_labels(self.labels) + " " + str(value))
+        for (name, labels), function in sorted(self.gauges.items()):
+            try:
+                value = function()
+            except Exception:
+                continue
+            lines.append("rds_" + name + format_labels(self.labels + list(labels)) + " " + str(value))
+        for stage, histogram in sorted(list(self.histograms.items())):
+            lines += histogram.render("rds_stage_latency_ms", self.labels + [("stage", stage)])
+        return lines
+
+    def summary(self):
+        """Résumé lisible des latences : étape p50/p99 (ms)."""
+        return ", ".join(stage + " p50 " + str(histogram.quantile(0.5)) + "/p99 " + str(histogram.quantile(0.99)) + " ms"
+                         for stage, histogram in sorted(list(self.histograms.items())))
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """GET /metrics : toutes les mesures au format texte."""
+    registry = None
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+            self.reply(404, b"Not found")
+            return
+        self.reply(200, self.registry.render().encode())
+
+    def reply(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Pas de journal par requête."""
+
+
+class MetricsServer():
+    """Service HTTP des mesures d'un processus, dans un fil de fond.
+
+    Le service n'écoute que localement par défaut (host="127.0.0.1").
+    """
+    def __init__(self, port, host="127.0.0.1"):
+        self.port = port
+        self.host = host
+        self.metrics = []
+        self.process = Metrics()
+        self.process.gauge("process_rss_bytes", lambda: process_usage()[0])
+        self.process.gauge("process_cpu_seconds", lambda: round(process_usage()[1], 2))
+        self.process.gauge("threads", threading.active_count)
+        self.server = None
+        self.thread = None
+
+    def register(self, metrics):
+        """Ajoute les mesures d'une caméra."""
+        self.metrics.append(metrics)
+
+    def render(self):
+        """Texte de toutes les mesures du processus."""
+        lines = self.process.render()
+        for metrics in self.metrics:
+            lines += metrics.render()
+        return "\n".join(lines) + "\n"
+
+    def start(self):
+        """Ouvre le port des mesures ; une erreur (port occupé) n'arrête pas le serveur."""
+        handler = type("Handler", (MetricsRequestHandler,), {"registry": self})
+        try:
+            self.server = ThreadingHTTPServer((self.host, self.port), handler)
+        except OSError as os_err:
+            print(PREFIX + "[ERROR] Metrics unavailable on port " + str(self.port) + " : " + str(os_err))
+            return
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(), daemon=True)
+        self.thread.start()
+        print(PREFIX + "[INFO] Metrics served on http://" + str(self.host) + ":" + str(self.port) + "/metrics")
+
+    def close(self):
+        """Ferme le port des mesures."""
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/2026
+
+@author: 23
+
+@desc: Extraction incrémentale des images JPEG d'un flux MJPEG.\
+       Le tampon est un bytearray réutilisé : les octets reçus y sont écrits \
+       directement (readinto / recv_into) et les images sont rendues sous \
+       forme de memoryview, sans copie. Quand l'en-tête multipart de l'image \
+       annonce sa taille (Content-Length), la fin de l'image n'est pas recherchée \
+       (seule la limite de la partie suivante l'est, si la taille annoncée est trop grande).
+"""
+
+SOI = b'\xff\xd8'  # Marqueur de début d'image JPEG
+EOI = b'\xff\xd9'  # Marqueur de fin d'image JPEG
+CONTENT_LENGTH = b'content-length:'
+PART_END = EOI + b'\r\n--'  # Fin d'image suivie de la limite de la partie multipart suivante
+
+
+class FrameExtractor():
+    """Découpe un flux d'octets en images JPEG complètes.
+
+    Les vues rendues par frames() pointent dans le tampon interne : elles restent
+    valides jusqu'au prochain appel à write_buffer(), feed() ou fill(). Un
+    consommateur qui doit conserver l'image plus longtemps en fait une copie (bytes()).
+
+    Une taille annoncée (Content-Length) n'est utilisée que si elle se termine par
+    le marqueur de fin d'image ; sinon la fin est recherchée comme sans en-tête.
+    En attendant les octets annoncés, un marqueur de fin suivi de la limite de la
+    partie suivante ("\r\n--") termine l'image : une taille trop grande ne retarde
+    pas l'image jusqu'à la suivante.
+
+    Politique d'abandon (seuls cas où des octets sont jetés) :
+      - une image en cours qui dépasse max_frame_size est abandonnée ;
+      - les octets hors image (en-têtes, métadonnées) au-delà de max_header_size
+        sont abandonnés en ne gardant que les plus récents.
+    """
+    def __init__(self, capacity=65536, max_frame_size=4 * 1024 * 1024, max_header_size=4096):
+        self.buffer = bytearray(capacity)
+        self.view = memoryview(self.buffer)
+        self.max_frame_size = max_frame_size
+        self.max_header_size = max_header_size
+        #Zone valide du tampon : [start, end[
+        self.start = 0
+        self.end = 0
+        #Position de reprise de la recherche, début et fin annoncée de l'image en cours (-1 si aucune)
+        self.scan = 0
+        self.frame_start = -1
+        self.frame_end = -1
+        #Statistiques (frames_sized : images délimitées par leur Content-Length)
+        self.frames_extracted = 0
+        self.frames_sized = 0
+        self.frames_dropped = 0
+        self.bytes_dropped = 0
+
+    def __len__(self):
+        """Nombre d'octets en attente dans le tampon."""
+        return self.end - self.start
+
+    def clear(self):
+        """Vide le tampon (changement de source, reconnexion...)."""
+        self.start = 0
+        self.end = 0
+        self.scan = 0
+        self.frame_start = -1
+        self.frame_end = -1
+
+    def _reserve(self, size):
+        """Garantit au moins size octets libres en fin de tampon."""
+        if len(self.buffer) - self.end >= size:
+            return
+        pending = self.end - self.start
+        if pending + size <= len(self.buffer) // 2:
+            #Compactage : les octets en attente sont ramenés au début du tampon
+            self.view[0:pending] = self.view[self.start:self.end]
+        else:
+            #Agrandissement : un nouveau tampon est alloué, les anciennes vues restent lisibles
+            new_buffer = bytearray(max(2 * len(self.buffer), pending + size))
+            new_buffer[0:pending] = self.view[self.start:self.end]
+            self.buffer = new_buffer
+            self.view = memoryview(self.buffer)
+        shift = self.start
+        self.start = 0
+        self.end = pending
+        self.scan -= shift
+        if self.frame_start > -1:
+            self.frame_start -= shift
+        if self.frame_end > -1:
+            self.frame_end -= shift
+
+    def write_buffer(self, size=16384):
+        """Renvoie une vue de size octets libres, à remplir puis valider avec commit()."""
+        self._reserve(size)
+        return self.view[self.end:self.end + size]
+
+    def commit(self, count):
+        """Valide count octets écrits dans la vue rendue par write_buffer()."""
+        self.end += count
+
+    def feed(self, data):
+        """Ajoute des octets déjà lus au tampon."""
+        size = len(data)
+        self._reserve(size)
+        self.view[self.end:self.end + size] = data
+        self.end += size
+
+    def fill(self, read_into, size=16384):
+        """Lit directement dans le tampon avec read_into (ex : source.readinto, socket.recv_into).
+
+        Renvoie le nombre d'octets lus (0 en fin de flux).
+        """
+        count = read_into(self.write_buffer(size))
+        if count:
+            self.commit(count)
+        return count or 0
+
+    def _announced_end(self, soi):
+        """Fin de l'image qui commence à soi d'après le Content-Length de son en-tête, -1 si absent ou invalide."""
+        if soi - self.start < len(CONTENT_LENGTH):
+            return -1
+        header = self.buffer[self.start:soi].lower()
+        position = header.rfind(CONTENT_LENGTH)
+        if position < 0:
+            return -1
+        position += len(CONTENT_LENGTH)
+        line_end = header.find(b'\r\n', position)
+        try:
+            length = int(header[position:line_end if line_end > -1 else len(header)])
+        except ValueError:
+            return -1
+        if length < 4 or length > self.max_frame_size:
+            return -1
+        return soi + length
+
+    def _drop(self, position):
+        """Abandonne les octets avant position."""
+        self.bytes_dropped += position - self.start
+        self.start = position
+        if self.scan < position:
+            self.scan = position
+
+    def frames(self):
+        """Générateur des images complètes disponibles, sous forme de (en-tête, jpeg).
+
+        L'en-tête contient les octets reçus entre la fin de l'image précédente et
+        le début de celle-ci (métadonnées, en-têtes multipart).
+        """
+        while True:
+            if self.frame_start < 0:
+                soi = self.buffer.find(SOI, self.scan, self.end)
+                if soi < 0:
+                    #On conserve le dernier octet, un marqueur peut être coupé en deux
+                    self.scan = max(self.start, self.end - 1)
+                    if self.end - self.start > self.max_header_size:
+                        self._drop(self.end - self.max_header_size)
+                    return
+                self.frame_start = soi
+                self.scan = soi + 2
+                self.frame_end = self._announced_end(soi)
+            eoi = -1
+            if self.frame_end > -1:
+                if self.frame_end > self.end:
+                    #Image incomplète de taille connue : seule la limite de la partie suivante est recherchée
+                    #(taille annoncée plus grande que l'image)
+                    eoi = self.buffer.find(PART_END, self.scan, self.end)
+                    if eoi < 0:
+                        self.scan = max(self.frame_start + 2, self.end - len(PART_END) + 1)
+                        return
+                elif self.buffer[self.frame_end - 2] == 0xff and self.buffer[self.frame_end - 1] == 0xd9:
+                    eoi = self.frame_end - 2
+                    self.frames_sized += 1
+                else:
+                    #Taille fausse : la fin est recherchée depuis le début de l'image
+                    self.scan = self.frame_start + 2
+                self.frame_end = -1
+            if eoi < 0:
+                #Le marqueur de fin n'est recherché qu'après le début de l'image courante
+                eoi = self.buffer.find(EOI, self.scan, self.end)
+            if eoi < 0:
+                self.scan = max(self.frame_start + 2, self.end - 1)
+                if self.end - self.frame_start > self.max_frame_size:
+                    #Image trop grande (marqueur de fin perdu) : abandon et resynchronisation
+                    self.frames_dropped += 1
+                    self._drop(self.frame_start + 2)
+                    self.frame_start = -1
+                    continue
+                return
+            header = self.view[self.start:self.frame_start]
+            frame = self.view[self.frame_start:eoi + 2]
+            self.start = eoi + 2
+            self.scan = self.start
+            self.frame_start = -1
+            self.frames_extracted += 1
+            yield header, frame
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/2026
+
+@author: 23
+
+@desc: Mode multi-caméras de stream_and_surveillance.py.\
+       Toutes les caméras (lecture des sources et clients) partagent une seule \
+       boucle asyncio dans un seul processus ; le décodage et la détection sont \
+       confiés à un groupe de fils partagé (OpenCV libère le GIL pendant ces calculs) \
+       ou, avec --detection-processes, au groupe de processus de pipeline.py.
+"""
+
+import os
+import sys
+import time
+import json
+import socket
+import asyncio
+import threading
+import concurrent.futures
+
+from broadcaster import AsyncBroadcaster
+from tiers import TierEncoder
+from metrics import process_usage
+from ingest import http_request, split_response, describe_boundary, READ_SIZE, READ_TIMEOUT
+
+
+def read_config(path):
+    """Lit un fichier de configuration JSON : {"cameras": [{"url": ..., "port": ...}, ...], ...}.
+
+    Renvoie la liste des caméras (url, port) et le dictionnaire complet (options).
+    """
+    with open(path, "r") as config_file:
+        config = json.load(config_file)
+    cameras = []
+    for camera in config.get("cameras", []):
+        cameras.append((str(camera["url"]), int(camera["port"])))
+    return cameras, config
+
+
+class CameraTask():
+    """Lecture d'une caméra dans la boucle asyncio, diffusion immédiate et détection déportée."""
+    def __init__(self, server, executor):
+        self.server = server
+        self.executor = executor
+        self.prefix = server.prefix
+        self.loop = None
+        #Détection : une seule image en cours d'analyse, la plus récente attend son tour
+        self.busy = False
+        self.pending = None
+        self.skipped_frames = 0
+        server.metrics.gauge("frames_not_analysed_total", lambda: self.skipped_frames)
+
+    async def connect(self):
+        """Connexion HTTP/1.0 à la source (pas d'encodage chunked), renvoie (socket, frontière multipart)."""
+        host, port, request = http_request(self.server.source_url)
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        try:
+            await asyncio.wait_for(self.loop.sock_connect(sock, (host, port)), 5)
+            await self.loop.sock_sendall(sock, request)
+            #Lecture de l'en-tête de la réponse
+            response = b''
+            parsed = None
+            while parsed is None:
+                data = await asyncio.wait_for(self.loop.sock_recv(sock, 4096), 5)
+                if not data:
+                    raise ConnectionError("Invalid HTTP response")
+                response += data
+                parsed = split_response(response)
+        except (OSError, asyncio.TimeoutError):
+            sock.close()
+            raise
+        boundary, body = parsed
+        self.server.extractor.clear()
+        self.server.extractor.feed(body)
+        return sock, boundary
+
+    async def run(self):
+        """Lecture de la source, reconnexion en cas de perte (état de la surveillance conservé).
+
+        La reconnexion est immédiate si la connexion a apporté une image, sinon elle attend un délai croissant.
+        """
+        self.loop = asyncio.get_event_loop()
+        server = self.server
+        ingest = server.ingest
+        await server.broadcaster.start()
+        server.recorder.start()
+        print(str(self.prefix) + "[START] Broadcast and surveillance start for " + str(server.source_url) + " on port " + str(server.port))
+        while True:
+            try:
+                sock, boundary = await self.connect()
+            except (OSError, ValueError, asyncio.TimeoutError) as err_source:
+                ingest.lost()
+                delay = ingest.retry_delay()
+                print(str(self.prefix) + "[Error from video source] : " + str(err_source))
+                print(str(self.prefix) + "[INFO] Retry to connect to source in " + str(round(delay, 1)) + " seconds...")
+                await asyncio.sleep(delay)
+                continue
+            print(str(self.prefix) + "[INFO] Source connected ! (" + describe_boundary(boundary) + ")")
+            outage = ingest.up()
+            if outage is not None:
+                print(str(self.prefix) + "[INFO] Source back after " + str(round(outage, 1)) + " seconds (" + ingest.summary() + ")")
+            server.waited = time.perf_counter()
+            try:
+                while True:
+                    self.process_frames()
+                    count = await asyncio.wait_for(self.loop.sock_recv_into(sock, server.extractor.write_buffer(READ_SIZE)),
+                                                   READ_TIMEOUT)
+                    if count == 0:
+                        raise ConnectionResetError("End of stream")
+                    server.extractor.commit(count)
+            except OSError as os_err:
+                print(str(self.prefix) + "[OS Error] " + (str(os_err) or type(os_err).__name__))
+                print(str(self.prefix) + "[ALERT] Stream aborted, reconnecting...")
+                sock.close()
+                ingest.lost()
+            except asyncio.TimeoutError:
+                print(str(self.prefix) + "[OS Error] No data for " + str(READ_TIMEOUT) + " seconds")
+                print(str(self.prefix) + "[ALERT] Stream aborted, reconnecting...")
+                sock.close()
+                ingest.lost(time.monotonic() - READ_TIMEOUT)
+            #Connexion coupée sans aucune image : nouvelle tentative après un délai croissant
+            delay = ingest.reconnect_delay()
+            if delay > 0:
+                print(str(self.prefix) + "[INFO] Retry to connect to source in " + str(round(delay, 1)) + " seconds...")
+                await asyncio.sleep(delay)
+
+    def process_frames(self):
+        """Diffuse les images extraites et soumet la plus récente à la détection."""
+        server = self.server
+        for header, extracted_img in server.extractor.frames():
+            started = time.perf_counter()
+            server.ingest.frame()
+            server.metrics.inc("frames_in")
+            server.metrics.observe("read", started - server.waited)
+            timestamp_us = int(time.monotonic() * 1000000)
+            message = server.make_message(extracted_img, timestamp_us)
+            server.publish(message)
+            recorded = time.perf_counter()
+            server.record_frame(message)
+            server.metrics.observe("record", time.perf_counter() - recorded)
+            if server.detection_pool is not None:
+                server.watch_async(message.payload)
+            else:
+                self.submit(message.payload)
+            server.waited = time.perf_counter()
+            server.metrics.observe("frame", server.waited - started)
+
+    def submit(self, jpeg):
+        """Confie une image au groupe de fils, ou la met en attente si une analyse est en cours."""
+        if self.busy:
+            if self.pending is not None:
+                self.skipped_frames += 1
+            self.pending = jpeg
+            return
+        self.busy = True
+        future = self.loop.run_in_executor(self.executor, self.server.watch, jpeg)
+        future.add_done_callback(self.watched)
+
+    def watched(self, future):
+        """Fin d'une analyse : l'image en attente (la plus récente) est soumise à son tour."""
+        self.busy = False
+        if not future.cancelled() and future.exception() is not None:
+            print(str(self.prefix) + "[ERROR] Detection error : " + str(future.exception()))
+        if self.pending is not None:
+            jpeg = self.pending
+            self.pending = None
+            self.submit(jpeg)
+
+
+class MultiCameraServer():
+    """Toutes les caméras dans un seul processus et une seule boucle asyncio."""
+    def __init__(self, cameras, server_class, workers=None, report_interval=60):
+        self.workers = workers or os.cpu_count() or 2
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers)
+        self.report_interval = report_interval
+        self.tasks = []
+        for source_url, port in cameras:
+            #Niveaux réduits encodés par le même groupe de fils que la détection
+            server = server_class(source_url, port, AsyncBroadcaster(port, "[STREAM PORT " + str(port) + "]",
+                                                                     encoder=TierEncoder(), executor=self.executor))
+            self.tasks.append(CameraTask(server, self.executor))
+        #Coût d'un processus sans caméra, payé une fois par caméra dans le modèle un processus par caméra
+        self.baseline_rss = process_usage()[0]
+
+    def report(self, start_cpu, start_time):
+        """Affiche mémoire et CPU, comparés au modèle un processus par caméra."""
+        rss, cpu = process_usage()
+        cameras = len(self.tasks)
+        cpu_percent = 100.0 * (cpu - start_cpu) / max(time.time() - start_time, 0.001)
+        print("[MULTI][STATS] " + str(cameras) + " camera(s), " + str(threading.active_count()) + " thread(s) : RSS "
+              + str(round(rss / 1048576.0, 1)) + " MB (per-process model : >= "
+              + str(round(cameras * self.baseline_rss / 1048576.0, 1)) + " MB), CPU "
+              + str(round(cpu_percent, 1)) + "% of one core")
+        for task in self.tasks:
+            if task.server.detection_pool is not None:
+                analysed, skipped, latency = task.server.detection_pool.stats(task.server.port)
+                print(str(task.prefix) + "[STATS] Detection : " + str(analysed) + " frame(s) analysed, " + str(skipped)
+                      + " skipped, " + str(round(latency * 1000, 1)) + " ms average latency")
+            elif task.skipped_frames > 0:
+                print(str(task.prefix) + "[STATS] " + str(task.skipped_frames) + " frame(s) not analysed (detection busy)")
+            if task.server.ingest.reconnects() > 0 or not task.server.ingest.connected:
+                print(str(task.prefix) + "[STATS] Source : " + task.server.ingest.summary())
+            task.server.broadcaster.report()
+
+    async def run(self):
+        """Démarre toutes les caméras et affiche régulièrement l'utilisation des ressources."""
+        print("[MULTI][START] " + str(len(self.tasks)) + " camera(s), " + str(self.workers) + " detection worker(s)")
+        for task in self.tasks:
+            asyncio.ensure_future(task.run())
+        start_cpu = process_usage()[1]
+        start_time = time.time()
+        while True:
+            await asyncio.sleep(self.report_interval)
+            self.report(start_cpu, start_time)
+            start_cpu = process_usage()[1]
+            start_time = time.time()
+
+    def start(self):
+        """Point d'entrée bloquant."""
+        try:
+            asyncio.get_event_loop().run_until_complete(self.run())
+        except KeyboardInterrupt:
+            print("[MULTI][ALERT] Script stopped by user...")
+            for task in self.tasks:
+                task.server.broadcaster.close()
+                task.server.recorder.stop()
+            self.executor.shutdown(wait=False)
+            sys.exit()
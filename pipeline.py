@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/2026
+
+@author: 23
+
+@desc: Détection de mouvement dans des processus séparés.\
+       Le fil de lecture diffuse et enregistre chaque image sans attendre ; la \
+       détection se fait dans un groupe de processus (pas de GIL partagé). Chaque \
+       caméra dispose d'un emplacement en mémoire partagée (RawArray) dans lequel \
+       l'image à analyser est copiée : seule une courte description transite par \
+       les files. Une seule image par caméra est analysée à la fois ; pendant ce \
+       temps, seule la plus récente est conservée (la plus récente gagne).
+       Les processus sont lancés par "spawn" : ils n'héritent ni des sockets \
+       (diffusion, mesures), ni du catalogue, ni des fils du serveur, et s'arrêtent \
+       d'eux-mêmes si le serveur disparaît.
+"""
+
+import os
+import time
+import queue
+import threading
+import multiprocessing
+
+from detection import MotionDetector
+
+#Processus neufs : un processus créé par fork garderait les ports du serveur ouverts après sa mort
+CONTEXT = multiprocessing.get_context("spawn")
+#Intervalle de vérification de la présence du processus parent (secondes)
+PARENT_CHECK = 1
+
+
+def detection_worker(tasks, results, slots, options):
+    """Boucle d'un processus de détection (un détecteur par caméra)."""
+    import cv2
+    detectors = {}
+    parent = os.getppid()
+    while True:
+        try:
+            task = tasks.get(timeout=PARENT_CHECK)
+        except queue.Empty:
+            #Serveur arrêté sans close() (processus tué) : le processus est rattaché à un autre parent
+            if os.getppid() != parent:
+                return
+            continue
+        if task is None:
+            return
+        camera_id, length, sequence, data = task
+        if data is None:
+            data = memoryview(slots[camera_id]).cast('B')[:length]
+        detector = detectors.get(camera_id)
+        if detector is None:
+            detector = MotionDetector(**options[camera_id])
+            detectors[camera_id] = detector
+        try:
+            detection = detector.analyse(data)
+        except cv2.error:
+            detection = None
+        results.put((camera_id, sequence, detection))
+
+
+class CameraSlot():
+    """État d'une caméra côté lecture : emplacement partagé, image en cours et image en attente."""
+    def __init__(self, camera_id, capacity, callback, worker):
+        self.camera_id = camera_id
+        self.array = CONTEXT.RawArray('B', capacity)
+        self.view = memoryview(self.array).cast('B')
+        self.callback = callback
+        self.worker = worker
+        self.lock = threading.Lock()
+        self.busy = False
+        self.pending = None
+        self.sequence = 0
+        self.submitted_at = 0
+        #Statistiques
+        self.analysed_frames = 0
+        self.skipped_frames = 0
+        self.total_latency = 0.0
+        self.last_latency = 0.0
+
+
+class DetectionPool():
+    """Groupe de processus de détection partagé par une ou plusieurs caméras.
+
+    Les caméras sont déclarées avec register() avant start() (les emplacements
+    partagés sont transmis aux processus à leur création).
+    """
+    def __init__(self, processes=1, slot_capacity=1024 * 1024, prefix="[DETECTION]"):
+        self.processes = max(1, processes)
+        self.slot_capacity = slot_capacity
+        self.prefix = prefix
+        self.slots = {}
+        self.options = {}
+        self.task_queues = [CONTEXT.Queue(maxsize=64) for _ in range(self.processes)]
+        self.results = CONTEXT.Queue()
+        self.workers = []
+        self.collector = threading.Thread(target=self.collect, args=(), daemon=True)
+
+    def register(self, camera_id, detector_options, callback):
+        """Déclare une caméra : callback(detection) est appelé à chaque résultat (depuis un autre fil)."""
+        worker = len(self.slots) % self.processes
+        self.slots[camera_id] = CameraSlot(camera_id, self.slot_capacity, callback, worker)
+        self.options[camera_id] = detector_options
+
+    def start(self):
+        """Démarre les processus de détection et le fil de collecte des résultats."""
+        arrays = dict((camera_id, slot.array) for camera_id, slot in self.slots.items())
+        for index in range(self.processes):
+            worker = CONTEXT.Process(target=detection_worker,
+                                     args=(self.task_queues[index], self.results, arrays, self.options),
+                                     daemon=True)
+            worker.start()
+            self.workers.append(worker)
+        self.collector.start()
+        print(self.prefix + "[INFO] " + str(self.processes) + " detection process(es) for " + str(len(self.slots)) + " camera(s)")
+
+    def submit(self, camera_id, jpeg):
+        """Soumet une image à la détection sans bloquer ; remplace l'image en attente si la caméra est occupée."""
+        slot = self.slots[camera_id]
+        with slot.lock:
+            if slot.busy:
+                if slot.pending is not None:
+                    slot.skipped_frames += 1
+                slot.pending = jpeg
+                return
+            slot.busy = True
+        self._send(slot, jpeg)
+
+    def _send(self, slot, jpeg):
+        """Copie l'image dans l'emplacement partagé et prévient le processus de la caméra."""
+        slot.sequence += 1
+        slot.submitted_at = time.time()
+        length = len(jpeg)
+        if length <= len(slot.view):
+            slot.view[:length] = jpeg
+            task = (slot.camera_id, length, slot.sequence, None)
+        else:
+            #Image plus grande que l'emplacement : transmise par la file
+            task = (slot.camera_id, length, slot.sequence, bytes(jpeg))
+        self.task_queues[slot.worker].put(task)
+
+    def collect(self):
+        """Fil de collecte : transmet les résultats et soumet l'image en attente de chaque caméra."""
+        while True:
+            result = self.results.get()
+            if result is None:
+                return
+            camera_id, sequence, detection = result
+            slot = self.slots[camera_id]
+            slot.analysed_frames += 1
+            slot.last_latency = time.time() - slot.submitted_at
+            slot.total_latency += slot.last_latency
+            try:
+                slot.callback(detection)
+            except Exception as err:
+                print(self.prefix + "[ERROR] Camera " + str(camera_id) + " : " + str(err))
+            with slot.lock:
+                jpeg = slot.pending
+                slot.pending = None
+                slot.busy = jpeg is not None
+            if jpeg is not None:
+                self._send(slot, jpeg)
+
+    def stats(self, camera_id):
+        """Statistiques d'une caméra : (images analysées, images non analysées, latence moyenne en s)."""
+        slot = self.slots[camera_id]
+        latency = slot.total_latency / slot.analysed_frames if slot.analysed_frames else 0.0
+        return slot.analysed_frames, slot.skipped_frames, latency
+
+    def last_latency(self, camera_id):
+        """Latence de la dernière analyse d'une caméra (s), de la soumission au résultat."""
+        return self.slots[camera_id].last_latency
+
+    def close(self):
+        """Arrête les processus de détection."""
+        for task_queue in self.task_queues:
+            task_queue.put(None)
+        for worker in self.workers:
+            worker.join(timeout=2)
+        self.results.put(None)
+        if self.collector.is_alive():
+            self.collector.join(timeout=2)
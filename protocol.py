@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/2026
+
+@author: 23
+
+@desc: Protocole de diffusion entre stream_and_surveillance.py et client.py.\
+       Deux formats sont disponibles :
+         - "legacy" : préfixe texte camera:<port>;timestamp:...;record:... suivi du JPEG ;
+         - "binary" : en-tête binaire de taille fixe suivi du JPEG (version 1).
+       Le client choisit le format binaire en envoyant un message HELLO dès la \
+       connexion. Un client qui n'envoie rien reçoit le format legacy.
+       L'octet réservé du HELLO indique le niveau de qualité demandé (TIERS) : \
+       image d'origine, réduite ou moins fréquente.
+"""
+
+import time
+import datetime
+import struct
+import collections
+
+PROTOCOL_LEGACY = "legacy"
+PROTOCOL_BINARY = "binary"
+
+VERSION = 1
+
+#Message d'ouverture envoyé par le client : magic, version, niveau de qualité (0 pour les anciens clients)
+HELLO_MAGIC = b'RDSH'
+HELLO = struct.Struct('!4sBB')
+
+#Niveaux de qualité : largeur maximale, qualité JPEG et fréquence maximale (None : comme la caméra)
+Tier = collections.namedtuple("Tier", "name width quality max_fps")
+TIER_FULL = 0
+TIERS = {TIER_FULL: Tier("full", None, None, None),
+         1: Tier("640", 640, 80, None),
+         2: Tier("320", 320, 70, 10),
+         3: Tier("low", 640, 50, 5)}
+
+#En-tête de chaque image : magic, version, drapeaux, identifiant caméra,
+#taille des données, numéro de séquence, horodatage monotone de capture (µs)
+FRAME_MAGIC = b'RDSF'
+FRAME_HEADER = struct.Struct('!4sBBHIIQ')
+
+#Drapeaux de l'en-tête
+FLAG_RECORDING = 0x01
+FLAG_MOTION = 0x02
+
+FrameHeader = collections.namedtuple("FrameHeader", "version flags camera_id length sequence timestamp_us")
+
+
+class ProtocolError(Exception):
+    """Données reçues non conformes au protocole."""
+
+
+def tier_by_name(name):
+    """Niveau de qualité à partir de son nom ("full", "640", "320", "low"), ou lève ValueError."""
+    for tier, description in TIERS.items():
+        if description.name == name:
+            return tier
+    raise ValueError("Unknown tier : " + str(name) + " (" + ", ".join(tier.name for tier in TIERS.values()) + ")")
+
+
+def encode_hello(version=VERSION, tier=TIER_FULL):
+    """Message HELLO demandant le format binaire et un niveau de qualité."""
+    return HELLO.pack(HELLO_MAGIC, version, tier)
+
+
+def decode_hello(data):
+    """Renvoie (version, niveau de qualité) demandés par un message HELLO, ou lève ProtocolError."""
+    magic, version, tier = HELLO.unpack_from(data)
+    if magic != HELLO_MAGIC:
+        raise ProtocolError("Invalid hello magic : " + str(magic))
+    return version, tier
+
+
+def encode_header(camera_id, length, sequence, timestamp_us, flags=0):
+    """En-tête binaire d'une image."""
+    return FRAME_HEADER.pack(FRAME_MAGIC, VERSION, flags, camera_id & 0xffff,
+                             length, sequence & 0xffffffff, timestamp_us)
+
+
+def decode_header(data):
+    """Décode un en-tête binaire, ou lève ProtocolError."""
+    magic, version, flags, camera_id, length, sequence, timestamp_us = FRAME_HEADER.unpack_from(data)
+    if magic != FRAME_MAGIC:
+        raise ProtocolError("Invalid frame magic : " + str(bytes(magic)))
+    if version != VERSION:
+        raise ProtocolError("Unsupported protocol version : " + str(version))
+    return FrameHeader(version, flags, camera_id, length, sequence, timestamp_us)
+
+
+def parse_legacy_header(data):
+    """Décode le préfixe texte legacy en dictionnaire (camera, timestamp, record)."""
+    metadatas = {}
+    for field in bytes(data).decode(errors="replace").split(";"):
+        key, _, value = field.partition(":")
+        metadatas[key.strip()] = value
+    return metadatas
+
+
+class FrameMessage():
+    """Image à diffuser, encodée au plus une fois par format et par niveau de qualité quel que soit le nombre de clients.
+
+    payloads contient l'image de chaque niveau de qualité déjà préparé (tiers.TierEncoder).
+    """
+    def __init__(self, payload, camera_id, sequence, flags=0, timestamp_us=None):
+        self.payload = payload
+        self.payloads = {TIER_FULL: payload}
+        self.camera_id = camera_id
+        self.sequence = sequence
+        self.flags = flags
+        self.timestamp_us = int(time.monotonic() * 1000000) if timestamp_us is None else timestamp_us
+        self.wall_time = datetime.datetime.now()
+        self.encoded = {}
+
+    def encode(self, protocol, tier=TIER_FULL):
+        """Données à envoyer pour le format et le niveau de qualité (déjà préparé) demandés."""
+        data = self.encoded.get((protocol, tier))
+        if data is None:
+            payload = self.payloads[tier]
+            if protocol == PROTOCOL_BINARY:
+                data = encode_header(self.camera_id, len(payload), self.sequence,
+                                     self.timestamp_us, self.flags) + payload
+            else:
+                data = str.encode("camera:" + str(self.camera_id) + ";timestamp:"
+                                  + self.wall_time.strftime("%Y-%m-%d %H:%M:%S") + ";record:"
+                                  + str(bool(self.flags & FLAG_RECORDING))) + payload
+            self.encoded[(protocol, tier)] = data
+        return data
+
+
+class FrameReader():
+    """Lecture d'images au format binaire dans un tampon préalloué, sans recherche de marqueurs.
+
+    Une taille annoncée supérieure à max_frame_size (en-tête corrompu) lève ProtocolError.
+    """
+    def __init__(self, capacity=262144, max_frame_size=4 * 1024 * 1024):
+        self.max_frame_size = max_frame_size
+        self.header = bytearray(FRAME_HEADER.size)
+        self.header_view = memoryview(self.header)
+        self.buffer = bytearray(capacity)
+        self.view = memoryview(self.buffer)
+        #Lecture incrémentale (receive) : en-tête décodé de l'image en cours et octets déjà reçus
+        self.pending = None
+        self.received = 0
+
+    @staticmethod
+    def recv_exactly(sock, view):
+        """Remplit entièrement view avec sock.recv_into."""
+        received = 0
+        size = len(view)
+        while received < size:
+            count = sock.recv_into(view[received:], size - received)
+            if count == 0:
+                raise ConnectionResetError("Connection closed by server")
+            received += count
+
+    def read_frame(self, sock):
+        """Lit une image complète, renvoie (FrameHeader, vue sur le JPEG).
+
+        La vue reste valide jusqu'au prochain appel.
+        """
+        self.recv_exactly(sock, self.header_view)
+        header = decode_header(self.header)
+        self._reserve(header.length)
+        payload = self.view[:header.length]
+        self.recv_exactly(sock, payload)
+        return header, payload
+
+    def _reserve(self, length):
+        """Agrandit le tampon si l'image ne tient pas, refuse une taille au-delà de max_frame_size."""
+        if length > self.max_frame_size:
+            raise ProtocolError("Frame too large : " + str(length) + " bytes (max " + str(self.max_frame_size) + ")")
+        if length > len(self.buffer):
+            self.buffer = bytearray(max(length, 2 * len(self.buffer)))
+            self.view = memoryview(self.buffer)
+
+    def receive(self, sock):
+        """Lecture incrémentale pour un socket prêt (un seul recv_into, jamais bloquant).
+
+        Renvoie (FrameHeader, vue sur le JPEG) quand une image est complète, sinon None.
+        La vue reste valide jusqu'au prochain appel.
+        """
+        if self.pending is None:
+            count = sock.recv_into(self.header_view[self.received:])
+            if count == 0:
+                raise ConnectionResetError("Connection closed by server")
+            self.received += count
+            if self.received < len(self.header):
+                return None
+            self.received = 0
+            self.pending = decode_header(self.header)
+            self._reserve(self.pending.length)
+            if self.pending.length > 0:
+                return None
+        else:
+            count = sock.recv_into(self.view[self.received:self.pending.length])
+            if count == 0:
+                raise ConnectionResetError("Connection closed by server")
+            self.received += count
+            if self.received < self.pending.length:
+                return None
+        header = self.pending
+        self.pending = None
+        self.received = 0
+        return header, self.view[:header.length]
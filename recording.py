@@ -0,0 +1,475 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/2026
+
+@author: 23
+
+@desc: Enregistrement des vidéos au fil de l'eau.\
+       Les images JPEG reçues passent par une file bornée vers un fil d'écriture \
+       dédié qui les écrit directement dans le fichier : la mémoire utilisée ne \
+       dépend pas de la durée de l'enregistrement. Les fichiers sont écrits sous un \
+       nom temporaire (storage.PARTIAL_SUFFIX) et renommés une fois complets, en \
+       segments d'une durée fixe (segment_seconds) dans le dossier de la caméra.
+       Un même fil d'écriture (RecordThread) peut servir plusieurs caméras, chacune \
+       gardant sa propre file bornée.
+       Deux formats sont disponibles :
+         - "mp4" : images décodées puis encodées en H.264 (imageio) ;
+         - "mjpeg" : images JPEG écrites telles que reçues, sans décodage, avec un \
+           index horodaté (voir transcode.py pour la conversion en MP4 plus tard).
+"""
+
+import os
+import time
+import struct
+import collections
+import datetime
+import threading
+
+import numpy as np
+import imageio
+import cv2
+
+from storage import PARTIAL_SUFFIX
+
+
+class Mp4Container():
+    """Fichier MP4 : chaque image est décodée puis ré-encodée.
+
+    La fréquence du fichier est fixe : les horodatages servent à placer chaque image,
+    l'image précédente est répétée pour combler les images perdues (au plus max_gap secondes).
+    Le fichier est écrit sous <nom>.part.mp4 (ffmpeg choisit le format d'après l'extension)
+    et renommé à la fermeture.
+    """
+    extension = ".mp4"
+
+    def __init__(self, path, fps, max_gap=2):
+        self.path = path
+        self.temporary_path = os.path.splitext(path)[0] + PARTIAL_SUFFIX + self.extension
+        self.fps = fps
+        self.max_gap_frames = int(max_gap * fps)
+        self.writer = imageio.get_writer(self.temporary_path, format='mp4', mode='I', fps=fps)
+        self.first_timestamp = None
+        self.written = 0
+        self.last_frame = None
+
+    def append(self, jpeg, timestamp_us):
+        """Ajoute une image JPEG, renvoie False si elle est invalide."""
+        frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            return False
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        if self.first_timestamp is None:
+            self.first_timestamp = timestamp_us
+        position = int(round((timestamp_us - self.first_timestamp) * self.fps / 1000000.0))
+        if self.last_frame is not None:
+            for _ in range(min(position - self.written, self.max_gap_frames)):
+                self.writer.append_data(self.last_frame)
+                self.written += 1
+        #Au-delà de max_gap, la coupure n'est pas comblée
+        self.written = max(self.written, position)
+        self.writer.append_data(frame)
+        self.written += 1
+        self.last_frame = frame
+        return True
+
+    def close(self):
+        """Termine le fichier et le publie sous son nom définitif."""
+        self.writer.close()
+        os.replace(self.temporary_path, self.path)
+
+
+class JpegSequenceContainer():
+    """Séquence JPEG indexée : aucune image n'est décodée.
+
+    <nom>.mjpeg contient les images JPEG concaténées telles que reçues (lisible
+    par ffmpeg -f mjpeg) ; <nom>.idx contient un en-tête puis, pour chaque image,
+    sa position, sa taille et son horodatage de capture en microsecondes.
+    Les deux fichiers sont écrits sous <nom>.mjpeg.part et <nom>.idx.part et
+    renommés à la fermeture, l'index en dernier : un enregistrement sans .idx
+    n'est pas terminé.
+    """
+    extension = ".mjpeg"
+    INDEX_MAGIC = b'RDSI'
+    INDEX_HEADER = struct.Struct('!4sBxxxI')
+    INDEX_ENTRY = struct.Struct('!QIQ')
+
+    def __init__(self, path, fps):
+        self.path = path
+        self.index_path = os.path.splitext(path)[0] + ".idx"
+        self.data = open(path + PARTIAL_SUFFIX, "wb", buffering=1048576)
+        self.index = open(self.index_path + PARTIAL_SUFFIX, "wb", buffering=65536)
+        #Fréquence nominale, les horodatages de l'index font foi
+        self.index.write(self.INDEX_HEADER.pack(self.INDEX_MAGIC, 1, int(fps)))
+        self.offset = 0
+
+    def append(self, jpeg, timestamp_us):
+        """Ajoute une image JPEG sans la décoder."""
+        self.data.write(jpeg)
+        self.index.write(self.INDEX_ENTRY.pack(self.offset, len(jpeg), timestamp_us))
+        self.offset += len(jpeg)
+        return True
+
+    def close(self):
+        """Termine le fichier et publie son index."""
+        self.data.close()
+        self.index.close()
+        os.replace(self.path + PARTIAL_SUFFIX, self.path)
+        os.replace(self.index_path + PARTIAL_SUFFIX, self.index_path)
+
+
+CONTAINERS = {"mp4": Mp4Container, "mjpeg": JpegSequenceContainer}
+
+
+def read_jpeg_sequence(path):
+    """Générateur des images d'une séquence JPEG indexée : (horodatage µs, jpeg)."""
+    index_path = os.path.splitext(path)[0] + ".idx"
+    with open(index_path, "rb") as index, open(path, "rb") as data:
+        magic, version, fps = JpegSequenceContainer.INDEX_HEADER.unpack(index.read(JpegSequenceContainer.INDEX_HEADER.size))
+        if magic != JpegSequenceContainer.INDEX_MAGIC:
+            raise ValueError("Invalid index file : " + str(index_path))
+        entry_size = JpegSequenceContainer.INDEX_ENTRY.size
+        while True:
+            entry = index.read(entry_size)
+            if len(entry) < entry_size:
+                return
+            offset, length, timestamp_us = JpegSequenceContainer.INDEX_ENTRY.unpack(entry)
+            data.seek(offset)
+            yield timestamp_us, data.read(length)
+
+
+class PreEventBuffer():
+    """Dernières images JPEG reçues (compressées), pour inclure dans l'enregistrement
+    les secondes qui précèdent la détection.
+
+    Le tampon est limité à la fois en durée (max_seconds) et en taille (max_bytes).
+    """
+    def __init__(self, max_seconds=5, max_bytes=4 * 1024 * 1024):
+        self.max_duration_us = int(max_seconds * 1000000)
+        self.max_bytes = max_bytes
+        self.frames = collections.deque()
+        self.size = 0
+
+    def __len__(self):
+        return len(self.frames)
+
+    def push(self, jpeg, timestamp_us):
+        """Ajoute une image et oublie les plus anciennes au-delà des limites."""
+        self.frames.append((timestamp_us, jpeg))
+        self.size += len(jpeg)
+        while self.frames and (self.size > self.max_bytes
+                               or timestamp_us - self.frames[0][0] > self.max_duration_us):
+            self.size -= len(self.frames.popleft()[1])
+
+    def drain(self):
+        """Renvoie les images en attente (de la plus ancienne à la plus récente) et vide le tampon."""
+        frames = list(self.frames)
+        self.frames.clear()
+        self.size = 0
+        return frames
+
+
+class RecordQueue():
+    """File des commandes d'un fil d'écriture, dans l'ordre d'arrivée, sans jamais bloquer l'appelant.
+
+    Seules les images (et les mouvements) sont limitées à max_frames : au-delà, elles
+    sont refusées. Les commandes open, close et stop sont toujours acceptées ; l'ordre
+    commun garantit que chaque image est écrite dans le fichier ouvert avant elle.
+    condition peut être partagée par les files d'un même fil d'écriture (RecordThread).
+    """
+    def __init__(self, max_frames, condition=None):
+        self.max_frames = max_frames
+        self.items = collections.deque()
+        self.frames = 0
+        self.condition = threading.Condition() if condition is None else condition
+
+    def put_frame(self, command, value):
+        """Ajoute une image ou un mouvement, renvoie False si la file est pleine."""
+        with self.condition:
+            if self.frames >= self.max_frames:
+                return False
+            self.items.append((command, value))
+            self.frames += 1
+            self.condition.notify()
+        return True
+
+    def put_command(self, command, value=None):
+        """Ajoute une commande (toujours acceptée)."""
+        with self.condition:
+            self.items.append((command, value))
+            self.condition.notify()
+
+    def get(self):
+        """Renvoie la plus ancienne commande, attend s'il n'y en a pas (fil d'écriture)."""
+        with self.condition:
+            while not self.items:
+                self.condition.wait()
+            command, value = self.items.popleft()
+            if command in ("frame", "motion"):
+                self.frames -= 1
+        return command, value
+
+    def qsize(self):
+        """Nombre d'images en attente."""
+        return self.frames
+
+
+class RecordThread():
+    """Fil d'écriture d'un ou plusieurs RecordWriter.
+
+    Les files des caméras sont servies à tour de rôle, une commande à la fois. Un fil
+    partagé (shared) attend de nouvelles caméras après l'arrêt de toutes les autres ;
+    le fil propre à un RecordWriter se termine avec lui.
+    """
+    def __init__(self, shared=True):
+        self.shared = shared
+        self.condition = threading.Condition()
+        self.writers = []
+        self.thread = threading.Thread(target=self.run, args=(), daemon=True)
+
+    def add(self, writer):
+        """Ajoute une caméra (RecordWriter) servie par ce fil."""
+        with self.condition:
+            self.writers.append(writer)
+
+    def start(self):
+        """Démarre le fil d'écriture."""
+        self.thread.start()
+
+    def is_alive(self):
+        """Vrai si le fil d'écriture tourne."""
+        return self.thread.is_alive()
+
+    def run(self):
+        """Boucle du fil d'écriture."""
+        while True:
+            with self.condition:
+                ready = [writer for writer in self.writers if writer.queue.items]
+                while not ready:
+                    self.condition.wait()
+                    ready = [writer for writer in self.writers if writer.queue.items]
+            for writer in ready:
+                command, value = writer.queue.get()
+                if writer.handle(command, value):
+                    continue
+                with self.condition:
+                    self.writers.remove(writer)
+                    if not self.shared and not self.writers:
+                        return
+
+
+class RecordStats():
+    """Informations d'un enregistrement pour le catalogue : horodatages, détections et image de la plus grande détection."""
+    def __init__(self):
+        self.first_timestamp = None
+        self.last_timestamp = None
+        self.first_jpeg = None
+        self.last_jpeg = None
+        self.peak_area = 0
+        self.peak_jpeg = None
+        #Début de chaque détection (horodatages µs)
+        self.events = []
+        self.last_motion = None
+
+    def frame(self, jpeg, timestamp_us):
+        """Image écrite dans le fichier."""
+        if self.first_timestamp is None:
+            self.first_timestamp = timestamp_us
+            self.first_jpeg = jpeg
+        self.last_timestamp = timestamp_us
+        self.last_jpeg = jpeg
+
+    def motion(self, timestamp_us, area, gap_us=1000000):
+        """Mouvement détecté : une nouvelle détection commence après gap_us sans mouvement."""
+        if self.last_motion is None or timestamp_us - self.last_motion > gap_us:
+            self.events.append(timestamp_us)
+        self.last_motion = timestamp_us
+        if area > self.peak_area:
+            self.peak_area = area
+            self.peak_jpeg = self.last_jpeg
+
+    def offsets(self):
+        """Instants des détections en secondes depuis le début de l'enregistrement."""
+        return [(event - self.first_timestamp) / 1000000.0 for event in self.events
+                if self.first_timestamp <= event <= self.last_timestamp]
+
+
+class RecordWriter():
+    """Fil d'écriture des enregistrements d'une caméra.
+
+    Les méthodes open(), write(), rotate() et close() sont appelées par un seul fil
+    (celui de la lecture du flux) ; l'écriture est faite par le fil du RecordWriter.
+    Avec segment_seconds, un nouveau fichier est commencé dès que le fichier en cours
+    couvre cette durée (horodatages des images).
+    motion() peut être appelée depuis n'importe quel fil.
+    Avec un catalogue (catalog.RecordingCatalog), chaque enregistrement terminé y est ajouté.
+    Aucune de ces méthodes ne bloque, sauf stop() qui attend la fin des écritures :
+    le changement de fichier (rotate()) est une seule commande exécutée par le fil d'écriture.
+    Avec writer_thread (RecordThread partagé, démarré par son propriétaire), les écritures
+    sont faites par ce fil ; sinon le RecordWriter a son propre fil.
+    """
+    def __init__(self, prefix="", directory="./storage/records/", fps=26, max_queue=256, record_format="mp4",
+                 catalog=None, camera_id=0, segment_seconds=None, writer_thread=None):
+        if record_format not in CONTAINERS:
+            raise ValueError("Unknown record format : " + str(record_format))
+        self.prefix = prefix
+        self.directory = directory
+        self.fps = fps
+        self.catalog = catalog
+        self.camera_id = camera_id
+        self.segment_seconds = segment_seconds
+        self.container_class = CONTAINERS[record_format]
+        self.owns_thread = writer_thread is None
+        self.writer_thread = RecordThread(shared=False) if writer_thread is None else writer_thread
+        self.queue = RecordQueue(max_queue, self.writer_thread.condition)
+        self.stopped = threading.Event()
+        self.writer_thread.add(self)
+        #État vu par le fil d'écriture
+        self.container = None
+        self.filename = None
+        self.saved_frames = 0
+        self.stats = RecordStats()
+        #État vu par le fil de lecture
+        self.is_open = False
+        self.open_fps = fps
+        self.frame_count = 0
+        self.segment_start_us = None
+        self.dropped_frames = 0
+
+    def start(self):
+        """Démarre le fil d'écriture (sauf fil partagé)."""
+        if self.owns_thread:
+            self.writer_thread.start()
+
+    def open(self, fps=None):
+        """Commence un nouvel enregistrement (fps : fréquence mesurée du flux, self.fps par défaut)."""
+        now = str(datetime.datetime.now().strftime("%Y-%m-%d-%H_%M_%S"))
+        self.open_fps = fps or self.fps
+        self.queue.put_command("open", ("rec-" + str(now), self.open_fps))
+        self.is_open = True
+        self.frame_count = 0
+        self.segment_start_us = None
+
+    def write(self, jpeg, timestamp_us):
+        """Ajoute une image JPEG (bytes) à l'enregistrement en cours, sans bloquer."""
+        if self.segment_start_us is None:
+            self.segment_start_us = timestamp_us
+        elif self.segment_seconds and timestamp_us - self.segment_start_us >= self.segment_seconds * 1000000:
+            self.rotate()
+            self.segment_start_us = timestamp_us
+        if not self.queue.put_frame("frame", (jpeg, timestamp_us)):
+            self.dropped_frames += 1
+            return
+        self.frame_count += 1
+
+    def motion(self, timestamp_us, area):
+        """Signale un mouvement (surface en pixels) pour le catalogue, sans bloquer."""
+        self.queue.put_frame("motion", (timestamp_us, area))
+
+    def rotate(self):
+        """Termine le fichier en cours et continue l'enregistrement dans un nouveau fichier (une seule commande)."""
+        if not self.is_open:
+            return
+        now = str(datetime.datetime.now().strftime("%Y-%m-%d-%H_%M_%S"))
+        self.queue.put_command("rotate", ("rec-" + str(now), self.open_fps))
+        self.frame_count = 0
+        self.segment_start_us = None
+
+    def close(self):
+        """Termine l'enregistrement en cours."""
+        if self.is_open:
+            self.queue.put_command("close")
+            self.is_open = False
+
+    def stop(self):
+        """Termine l'enregistrement en cours, attend l'écriture des images en file et arrête le fil (s'il est propre)."""
+        self.close()
+        if self.writer_thread.is_alive():
+            self.queue.put_command("stop")
+            self.stopped.wait()
+
+    def _create_directory(self):
+        """Création du dossier d'enregistrement (et de ses parents) si besoin."""
+        if self.directory and not os.path.isdir(self.directory):
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                print(str(self.prefix) + "[INFO] Created directory " + str(self.directory))
+            except OSError as os_exception:
+                print(str(self.prefix) + "[ERROR] OS error detected : " + str(os_exception))
+
+    def handle(self, command, value):
+        """Exécute une commande de la file (fil d'écriture), renvoie False après stop."""
+        if command == "frame":
+            if self.container is None:
+                return True
+            try:
+                if self.container.append(value[0], value[1]):
+                    self.saved_frames += 1
+                    self.stats.frame(value[0], value[1])
+            except Exception as err:
+                print(str(self.prefix) + "[ERROR] Record " + str(self.filename) + " aborted : " + str(err))
+                self.container = None
+            return True
+        if command == "motion":
+            self.stats.motion(value[0], value[1])
+            return True
+        #rotate : fermeture du fichier en cours puis ouverture du suivant
+        if command in ("close", "rotate", "stop"):
+            if self.container is not None:
+                self._finish()
+            #Fichier non créé ou abandonné, mouvements hors enregistrement : rien n'est reporté sur le suivant
+            self.stats = RecordStats()
+            if self.dropped_frames > 0:
+                print(str(self.prefix) + "[ALERT] " + str(self.dropped_frames) + " frame(s) dropped, writer too slow")
+            if command == "stop":
+                self.stopped.set()
+                return False
+        if command in ("open", "rotate"):
+            self._begin(*value)
+        return True
+
+    def _begin(self, name, fps):
+        """Crée le fichier d'un nouvel enregistrement (statistiques remises à zéro)."""
+        self.stats = RecordStats()
+        self._create_directory()
+        extension = self.container_class.extension
+        filename = name + extension
+        #Deux enregistrements commencés dans la même seconde ne s'écrasent pas
+        index = 1
+        while os.path.exists(os.path.join(self.directory, filename)):
+            filename = name + "-" + str(index) + extension
+            index += 1
+        self.filename = filename
+        self.saved_frames = 0
+        try:
+            self.container = self.container_class(os.path.join(self.directory, filename), fps)
+        except Exception as err:
+            print(str(self.prefix) + "[ERROR] Unable to create record " + str(filename) + " : " + str(err))
+            self.container = None
+
+    def _finish(self):
+        """Termine le fichier en cours et l'ajoute au catalogue."""
+        frames = self.saved_frames
+        try:
+            self.container.close()
+        except Exception as err:
+            #Disque plein : le fichier temporaire reste, il sera supprimé par retention.py
+            print(str(self.prefix) + "[ERROR] Record " + str(self.filename) + " not saved : " + str(err))
+            frames = 0
+        else:
+            print(str(self.prefix) + "[INFO] Record saved as : " + str(self.filename) + " (" + str(frames) + " frame(s)) in records directory.")
+        self.container = None
+        if self.catalog is not None and frames > 0:
+            self._add_to_catalog(os.path.join(self.directory, self.filename), frames, self.stats)
+
+    def _add_to_catalog(self, path, frames, stats):
+        """Ajoute au catalogue un enregistrement terminé (horodatages monotones convertis en heure murale)."""
+        #Import à la demande : le client n'utilise pas de catalogue (sqlite3, serveur HTTP)
+        from catalog import make_thumbnail
+        clock_offset = time.time() - time.monotonic()
+        try:
+            thumbnail = make_thumbnail(stats.peak_jpeg or stats.first_jpeg)
+            self.catalog.add(self.camera_id, path, stats.first_timestamp / 1000000.0 + clock_offset,
+                             stats.last_timestamp / 1000000.0 + clock_offset, frames, stats.peak_area,
+                             stats.offsets(), thumbnail)
+        except Exception as err:
+            print(str(self.prefix) + "[ERROR] Unable to add " + str(path) + " to the catalog : " + str(err))
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/2026
+
+@author: 23
+
+@desc: Décodage des images pour l'affichage du client.\
+       Le fil réseau dépose les images JPEG reçues, le fil de décodage ne traite \
+       que la plus récente de chaque source (les images en retard sont abandonnées) \
+       et la décode directement à la taille d'affichage (réduite pour les vignettes \
+       de la mosaïque). L'interface récupère la dernière image \
+       décodée depuis sa propre boucle.
+"""
+
+import threading
+import collections
+
+import numpy as np
+import cv2
+from PIL import Image
+
+from tiers import REDUCED_COLOR, reduction_for
+
+
+def decode_for_display(jpeg, target_width, source_width=None):
+    """Décode une image JPEG en RGB à la largeur target_width.
+
+    Renvoie (image RGB, largeur de l'image source) ou (None, source_width) si l'image est invalide.
+    """
+    scale = reduction_for(source_width, target_width) if source_width else 1
+    frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), REDUCED_COLOR[scale])
+    if frame is None:
+        return None, source_width
+    source_width = frame.shape[1] * scale
+    if frame.shape[1] != target_width:
+        height = int(round(frame.shape[0] * target_width / float(frame.shape[1])))
+        interpolation = cv2.INTER_AREA if frame.shape[1] > target_width else cv2.INTER_LINEAR
+        frame = cv2.resize(frame, (target_width, height), interpolation=interpolation)
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), source_width
+
+
+class FrameDecoder():
+    """Fil de décodage unique pour une ou plusieurs sources (une case par source, repérée par key).
+
+    Pour chaque source, seule l'image la plus récente est conservée ; les sources en
+    attente sont servies à tour de rôle, une source rapide ne retarde pas les autres.
+    """
+    def __init__(self, width=720):
+        self.width = width
+        self.condition = threading.Condition()
+        #Images reçues en attente de décodage : key -> (jpeg, texte, enregistrement en cours, largeur)
+        self.pending = collections.OrderedDict()
+        #Dernières images décodées, prêtes à être affichées : key -> (image RGB, image PIL)
+        self.latest = {}
+        self.latest_jpeg = {}
+        self.source_widths = {}
+        self.running = False
+        self.thread = threading.Thread(target=self.run, args=(), daemon=True)
+        #Statistiques
+        self.decoded_frames = 0
+        self.dropped_frames = 0
+
+    def start(self):
+        """Démarre le fil de décodage."""
+        self.running = True
+        self.thread.start()
+
+    def stop(self):
+        """Arrête le fil de décodage."""
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+
+    def clear(self, key=None):
+        """Oublie les images d'une source (ou de toutes si key vaut None)."""
+        with self.condition:
+            if key is None:
+                self.pending.clear()
+                self.latest.clear()
+                self.latest_jpeg.clear()
+                self.source_widths.clear()
+            else:
+                self.pending.pop(key, None)
+                self.latest.pop(key, None)
+                self.latest_jpeg.pop(key, None)
+                self.source_widths.pop(key, None)
+
+    def submit(self, key, jpeg, text, recording=False, width=None):
+        """Dépose une image reçue ; une image de la même source pas encore décodée est abandonnée."""
+        with self.condition:
+            if key in self.pending:
+                self.dropped_frames += 1
+            #La source garde sa place dans le tour de rôle
+            self.pending[key] = (jpeg, text, recording, width or self.width)
+            self.condition.notify()
+
+    def take(self, key):
+        """Renvoie la dernière image décodée de la source (RGB, image PIL) si elle n'a pas encore été prise, sinon None."""
+        with self.condition:
+            return self.latest.pop(key, None)
+
+    def last_jpeg(self, key):
+        """Dernière image JPEG décodée de la source (pour une capture en pleine résolution)."""
+        with self.condition:
+            return self.latest_jpeg.get(key)
+
+    def run(self):
+        """Boucle du fil de décodage."""
+        while True:
+            with self.condition:
+                while self.running and not self.pending:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                key, (jpeg, text, recording, width) = self.pending.popitem(last=False)
+                source_width = self.source_widths.get(key)
+            try:
+                frame, source_width = decode_for_display(jpeg, width, source_width)
+            except cv2.error:
+                continue
+            if frame is None:
+                continue
+            #Texte plus petit sur les vignettes
+            font_scale = 0.5 if width >= 480 else 0.35
+            if recording:
+                cv2.putText(frame, "RECORDING...", (10, 20), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (255, 0, 0), 2)
+            cv2.putText(frame, text, (10, frame.shape[0] - 30 * width // self.width), cv2.FONT_HERSHEY_SIMPLEX,
+                        font_scale, (255, 0, 0), 1 if width < 480 else 2)
+            image = Image.fromarray(frame)
+            with self.condition:
+                if key in self.latest:
+                    #Image décodée jamais affichée
+                    self.dropped_frames += 1
+                self.latest[key] = (frame, image)
+                self.latest_jpeg[key] = jpeg
+                self.source_widths[key] = source_width
+                self.decoded_frames += 1
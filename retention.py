@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/2026
+
+@author: 23
+
+@desc: Durée de conservation et quotas des enregistrements (une caméra par dossier).\
+       Les segments les plus anciens sont supprimés quand une caméra ou l'ensemble \
+       dépasse son quota (octets) ou sa durée de conservation. L'occupation est suivie \
+       en mémoire : à chaque passage, seul le dossier dont la date de modification a \
+       changé est relu, et seuls ses nouveaux fichiers sont examinés (un ajout, un \
+       renommage ou une suppression modifie la date du dossier).
+       Usage : retention.py [<dossier>] [--storage-quota <Go>] [--camera-quota <Go>] [--max-age <jours>] \
+               [--interval <60>] [--catalog <catalog.sqlite>] [--once]
+"""
+
+import os
+import sys
+import time
+import bisect
+import threading
+
+from storage import camera_of, is_partial
+from metrics import Metrics
+from catalog import RecordingCatalog
+
+PREFIX = "[RETENTION]"
+GIGABYTE = 1024 ** 3
+DAY = 86400
+#Fichier temporaire abandonné (arrêt brutal pendant l'écriture) : plus modifié depuis ce délai
+STALE_SECONDS = 3600
+#Dates de modification peu précises (FAT : 2 secondes) : un dossier modifié récemment est toujours relu
+MODIFY_RESOLUTION = 2
+
+
+class SegmentDirectory():
+    """Segments terminés d'un dossier, du plus ancien au plus récent.
+
+    Un segment regroupe les fichiers de même nom sans extension (.mjpeg et .idx,
+    .mp4 après conversion) ; il est supprimé en entier.
+    """
+    def __init__(self, path, name):
+        self.path = path
+        self.name = name
+        self.modify = None
+        #Fichier -> (segment, taille) ; segment -> [date, taille, fichiers] ; (date, segment) triés
+        self.files = {}
+        self.segments = {}
+        self.order = []
+        self.size = 0
+
+    def changed(self, now):
+        """Vrai si le dossier doit être relu (date de modification changée ou récente)."""
+        try:
+            modify = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return True
+        if modify == self.modify and now - modify > MODIFY_RESOLUTION:
+            return False
+        self.modify = modify
+        return True
+
+    def scan(self, now):
+        """Relit le dossier : ajoute les nouveaux fichiers, oublie les fichiers disparus.
+
+        Renvoie la liste des sous-dossiers et celle des fichiers temporaires abandonnés.
+        """
+        names = set()
+        subdirectories = []
+        stale = []
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirectories.append(entry.name)
+                    continue
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                names.add(entry.name)
+                if entry.name in self.files:
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if is_partial(entry.name):
+                    if now - stat.st_mtime > STALE_SECONDS:
+                        stale.append(entry.path)
+                    continue
+                self._add(entry.name, stat.st_mtime, stat.st_size)
+        for name in set(self.files) - names:
+            self._forget(name)
+        return subdirectories, stale
+
+    def _add(self, filename, modify, size):
+        """Ajoute un fichier à son segment."""
+        stem = os.path.splitext(filename)[0]
+        segment = self.segments.get(stem)
+        if segment is None:
+            segment = self.segments[stem] = [modify, 0, []]
+            bisect.insort(self.order, (modify, stem))
+        segment[1] += size
+        segment[2].append(filename)
+        self.files[filename] = (stem, size)
+        self.size += size
+
+    def _forget(self, filename):
+        """Retire un fichier supprimé par ailleurs (conversion, suppression manuelle)."""
+        stem, size = self.files.pop(filename)
+        segment = self.segments[stem]
+        segment[1] -= size
+        segment[2].remove(filename)
+        self.size -= size
+        if not segment[2]:
+            del self.segments[stem]
+            self.order.remove((segment[0], stem))
+
+    def oldest(self):
+        """Date du plus ancien segment, None si le dossier est vide."""
+        return self.order[0][0] if self.order else None
+
+    def delete_oldest(self):
+        """Supprime le plus ancien segment, renvoie (octets libérés, chemins supprimés)."""
+        modify, stem = self.order.pop(0)
+        segment = self.segments.pop(stem)
+        paths = []
+        for filename in segment[2]:
+            path = os.path.join(self.path, filename)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            del self.files[filename]
+            paths.append(path)
+        self.size -= segment[1]
+        return segment[1], paths
+
+
+class RetentionManager():
+    """Suppression des plus anciens enregistrements, dans un fil de fond.
+
+    root contient un dossier par caméra (recording.RecordWriter : <root>/cam8001/).
+    Limites : max_bytes pour l'ensemble, camera_max_bytes et max_age (secondes) pour
+    chaque caméra, cameras pour les valeurs propres à une caméra
+    ({"8001": (max_bytes, max_age)}, None pour garder la valeur commune).
+    Avec un catalogue (catalog.RecordingCatalog), les enregistrements supprimés en sont retirés.
+    """
+    def __init__(self, root="./storage/records/", max_bytes=None, camera_max_bytes=None, max_age=None, cameras=None,
+                 interval=60, catalog=None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.camera_max_bytes = camera_max_bytes
+        self.max_age = max_age
+        self.cameras = cameras or {}
+        self.interval = interval
+        self.catalog = catalog
+        self.top = SegmentDirectory(root, "")
+        self.directories = {}
+        self.metrics = Metrics({"storage": os.path.normpath(root)})
+        self.metrics.gauge("storage_bytes", self.total_size)
+        self.metrics.gauge("storage_segments", lambda: sum(len(directory.order) for directory in self.all_directories()))
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self.run, args=(), daemon=True)
+
+    def all_directories(self):
+        """Dossier racine (anciens enregistrements) et dossiers des caméras."""
+        return [self.top] + list(self.directories.values())
+
+    def total_size(self):
+        """Octets occupés par les segments terminés."""
+        return sum(directory.size for directory in self.all_directories())
+
+    def limits(self, directory):
+        """(octets, secondes) autorisés pour un dossier de caméra."""
+        max_bytes, max_age = self.cameras.get(camera_of(directory.name), (None, None))
+        return (self.camera_max_bytes if max_bytes is None else max_bytes), (self.max_age if max_age is None else max_age)
+
+    def refresh(self, now):
+        """Met à jour l'occupation : seuls les dossiers modifiés sont relus."""
+        stale = []
+        if self.top.changed(now):
+            try:
+                subdirectories, stale = self.top.scan(now)
+            except FileNotFoundError:
+                subdirectories = []
+            for name in subdirectories:
+                if name not in self.directories:
+                    self.directories[name] = SegmentDirectory(os.path.join(self.root, name), name)
+            for name in set(self.directories) - set(subdirectories):
+                del self.directories[name]
+        for directory in list(self.directories.values()):
+            if directory.changed(now):
+                try:
+                    stale += directory.scan(now)[1]
+                except FileNotFoundError:
+                    del self.directories[directory.name]
+        for path in stale:
+            print(PREFIX + "[ALERT] Removing unfinished file " + str(path))
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def delete(self, directory, reason):
+        """Supprime le plus ancien segment d'un dossier, renvoie les octets libérés."""
+        freed, paths = directory.delete_oldest()
+        self.metrics.inc("segments_deleted")
+        self.metrics.inc("bytes_deleted", freed)
+        if self.catalog is not None:
+            for path in paths:
+                try:
+                    self.catalog.remove(path)
+                except Exception as err:
+                    print(PREFIX + "[ERROR] Unable to remove " + str(path) + " from the catalog : " + str(err))
+        print(PREFIX + "[INFO] " + os.path.splitext(paths[0])[0] + " deleted (" + reason + ", " + str(len(paths))
+              + " file(s), " + str(round(freed / 1048576.0, 1)) + " MB)")
+        return freed
+
+    def check(self):
+        """Un passage : mise à jour de l'occupation puis suppressions, renvoie le nombre de segments supprimés."""
+        now = time.time()
+        self.refresh(now)
+        deleted = 0
+        for directory in self.all_directories():
+            max_bytes, max_age = self.limits(directory)
+            while directory.order:
+                if max_age and directory.oldest() < now - max_age:
+                    self.delete(directory, "age")
+                elif max_bytes and directory.size > max_bytes:
+                    self.delete(directory, "camera quota")
+                else:
+                    break
+                deleted += 1
+        if self.max_bytes:
+            total = self.total_size()
+            while total > self.max_bytes:
+                candidates = [directory for directory in self.all_directories() if directory.order]
+                if not candidates:
+                    break
+                total -= self.delete(min(candidates, key=SegmentDirectory.oldest), "storage quota")
+                deleted += 1
+        return deleted
+
+    def start(self):
+        """Démarre le fil de fond."""
+        print(PREFIX + "[START] " + str(self.root) + " : storage quota " + self.describe(self.max_bytes, GIGABYTE, "GB")
+              + ", camera quota " + self.describe(self.camera_max_bytes, GIGABYTE, "GB")
+              + ", max age " + self.describe(self.max_age, DAY, "day(s)"))
+        self.thread.start()
+
+    @staticmethod
+    def describe(value, unit, name):
+        """Limite lisible ("none" si absente)."""
+        return "none" if not value else str(round(value / float(unit), 2)) + " " + name
+
+    def run(self):
+        """Boucle du fil de fond."""
+        while not self.stopping.is_set():
+            try:
+                self.check()
+            except OSError as os_err:
+                print(PREFIX + "[ERROR] OS error detected : " + str(os_err))
+            self.stopping.wait(self.interval)
+
+    def stop(self):
+        """Arrête le fil de fond."""
+        self.stopping.set()
+        if self.thread.is_alive():
+            self.thread.join()
+
+
+def main():
+    """Fonction principale : application des quotas une fois ou en continu."""
+    usage = "Usage : retention.py [<directory>] [--storage-quota <GB>] [--camera-quota <GB>] [--max-age <days>]\n" \
+            "        [--interval <seconds>] [--catalog <catalog.sqlite>] [--once]"
+    root = "./storage/records/"
+    options = {"--storage-quota": 0, "--camera-quota": 0, "--max-age": 0, "--interval": 60}
+    catalog_path = None
+    once = False
+    args = sys.argv[1:]
+    i = 0
+    while i < len(args):
+        if args[i] == "--once":
+            once = True
+        elif args[i] in options and i + 1 < len(args):
+            if not args[i + 1].isdigit():
+                print(args[i] + " must be int")
+                sys.exit()
+            options[args[i]] = int(args[i + 1])
+            i += 1
+        elif args[i] == "--catalog" and i + 1 < len(args):
+            catalog_path = args[i + 1]
+            i += 1
+        elif not args[i].startswith("--"):
+            root = args[i]
+        else:
+            print(usage)
+            sys.exit()
+        i += 1
+    catalog = None
+    if catalog_path is not None:
+        catalog = RecordingCatalog(catalog_path)
+    manager = RetentionManager(root, options["--storage-quota"] * GIGABYTE, options["--camera-quota"] * GIGABYTE,
+                               options["--max-age"] * DAY, interval=options["--interval"], catalog=catalog)
+    if once:
+        deleted = manager.check()
+        print(PREFIX + "[INFO] " + str(deleted) + " segment(s) deleted, " + str(round(manager.total_size() / 1048576.0, 1))
+              + " MB used")
+        return
+    manager.start()
+    try:
+        while manager.thread.is_alive():
+            manager.thread.join(1)
+    except KeyboardInterrupt:
+        print(PREFIX + "[ALERT] Stopped by user...")
+    manager.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/2026
+
+@author: 23
+
+@desc: Sources vidéo du client (une connexion par caméra du serveur).\
+       Chaque source lit son socket de façon non bloquante : toutes les sources \
+       sont surveillées par un même sélecteur et lues en continu, y compris celles \
+       qui ne sont pas affichées (les tampons du noyau ne se remplissent pas et le \
+       flux est à jour dès qu'on bascule dessus).
+       La recherche des caméras tente toutes les connexions en même temps, avec \
+       une durée totale bornée.
+"""
+
+import time
+import errno
+import socket
+import datetime
+import selectors
+
+from mjpeg import FrameExtractor
+import protocol
+
+#Codes d'erreur d'une connexion non bloquante en cours
+CONNECT_IN_PROGRESS = (errno.EINPROGRESS, errno.EWOULDBLOCK, getattr(errno, "WSAEWOULDBLOCK", errno.EWOULDBLOCK))
+
+
+def parse_ports(text):
+    """Liste de ports à partir d'un texte "8001-8010" ou "8001,8003,8005"."""
+    ports = []
+    for part in text.split(","):
+        first, _, last = part.partition("-")
+        if last:
+            ports.extend(range(int(first), int(last) + 1))
+        elif first:
+            ports.append(int(first))
+    return ports
+
+
+def discover(hosts, ports, timeout=0.5, exclude=()):
+    """Tente simultanément une connexion à chaque (hôte, port), renvoie les connexions établies : [(socket, adresse)].
+
+    Les connexions sont non bloquantes et surveillées par un même sélecteur : la recherche
+    dure au plus timeout secondes quel que soit le nombre de ports fermés ou injoignables.
+    Les adresses de exclude (sources déjà connectées) ne sont pas testées.
+    """
+    selector = selectors.DefaultSelector()
+    connected = []
+    for host in hosts:
+        try:
+            ip = socket.gethostbyname(host)
+        except OSError:
+            continue
+        for port in ports:
+            address = (host, port)
+            if address in exclude:
+                continue
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setblocking(False)
+            error = sock.connect_ex((ip, port))
+            if error == 0:
+                connected.append((sock, address))
+            elif error in CONNECT_IN_PROGRESS:
+                selector.register(sock, selectors.EVENT_WRITE, address)
+            else:
+                sock.close()
+    deadline = time.monotonic() + timeout
+    while selector.get_map():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        for key, mask in selector.select(remaining):
+            selector.unregister(key.fileobj)
+            if key.fileobj.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                connected.append((key.fileobj, key.data))
+            else:
+                key.fileobj.close()
+    #Connexions sans réponse dans le délai
+    for key in list(selector.get_map().values()):
+        key.fileobj.close()
+    selector.close()
+    return connected
+
+
+class VideoSource():
+    """Connexion à une caméra : lecture non bloquante des images au format binaire ou legacy."""
+    def __init__(self, sock, address, stream_protocol=protocol.PROTOCOL_BINARY, tier=protocol.TIER_FULL):
+        self.sock = sock
+        self.address = address
+        self.port = address[1]
+        self.protocol = stream_protocol
+        self.frame_reader = protocol.FrameReader()
+        self.extractor = FrameExtractor()
+        self.sock.setblocking(False)
+        if self.protocol == protocol.PROTOCOL_BINARY:
+            self.sock.sendall(protocol.encode_hello(tier=tier))
+        self.frame_count = 0
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def close(self):
+        """Ferme la connexion."""
+        self.sock.close()
+
+    def poll(self):
+        """Lecture d'un socket prêt, renvoie les images complètes reçues : [(texte des métadonnées, jpeg, horodatage µs)].
+
+        L'horodatage est celui de la capture (horloge monotone du serveur) au format binaire,
+        celui de la réception (horloge monotone du client) au format legacy : seuls les écarts
+        entre images d'une même source ont un sens. Les vues rendues restent valides jusqu'au
+        prochain appel. Lève une exception si la connexion est perdue.
+        """
+        try:
+            if self.protocol == protocol.PROTOCOL_BINARY:
+                return self._binary_frames()
+            if self.extractor.fill(self.sock.recv_into, 65536) == 0:
+                raise ConnectionResetError("Source fermée")
+        except BlockingIOError:
+            return []
+        return self._legacy_frames()
+
+    def _binary_frames(self):
+        """Image au format binaire, si elle est complète."""
+        try:
+            result = self.frame_reader.receive(self.sock)
+        except protocol.ProtocolError:
+            #Un serveur legacy commence chaque image par "camera:" : bascule sans perdre les octets reçus
+            if not bytes(self.frame_reader.header).startswith(b'camera:'):
+                raise ConnectionResetError("Flux binaire corrompu")
+            print("[ALERT] Port " + str(self.port) + " : format binaire non supporté par le serveur, utilisation du format legacy")
+            self.protocol = protocol.PROTOCOL_LEGACY
+            self.extractor.feed(self.frame_reader.header)
+            return self._legacy_frames()
+        if result is None:
+            return []
+        header, jpg = result
+        self.frame_count += 1
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        return [("Port " + str(header.camera_id) + " - " + timestamp, jpg, header.timestamp_us)]
+
+    def _legacy_frames(self):
+        """Images extraites du tampon au format legacy, précédées de leurs métadonnées."""
+        frames = []
+        timestamp_us = int(time.monotonic() * 1000000)
+        for header, jpg in self.extractor.frames():
+            metadatas = protocol.parse_legacy_header(header)
+            frames.append(("Port " + str(metadatas.get("camera")) + " - " + str(metadatas.get("timestamp")),
+                           jpg, timestamp_us))
+        self.frame_count += len(frames)
+        return frames
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/2026
+
+@author: 23
+
+@desc: Index local du stockage des enregistrements (serveur FTP).\
+       L'index est conservé sur disque entre deux sessions. Lors d'une mise à \
+       jour, seuls les dossiers dont la date de modification a changé sont \
+       relus (un ajout ou une suppression de fichier modifie la date du dossier).
+"""
+
+import os
+import re
+import json
+import datetime
+
+#Identifiant de caméra dans un chemin : "8001", "cam8001", "camera-2"...
+CAMERA_PATTERN = re.compile(r"^(?:cam(?:era)?[-_]?)?(\d+)$")
+#Fichier en cours d'écriture : "<nom>.part" ou "<nom>.part.mp4" (renommé une fois complet)
+PARTIAL_SUFFIX = ".part"
+
+
+def parse_modify(value):
+    """Convertit une date MLSD (AAAAMMJJHHMMSS, UTC) en texte "AAAA-MM-JJ HH:MM:SS" à l'heure locale."""
+    try:
+        date = datetime.datetime.strptime(value[:14], "%Y%m%d%H%M%S")
+    except (TypeError, ValueError):
+        return ""
+    date = date.replace(tzinfo=datetime.timezone.utc).astimezone()
+    return date.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def is_partial(filename):
+    """Vrai pour un fichier en cours d'écriture (pas encore renommé sous son nom définitif)."""
+    return filename.endswith(PARTIAL_SUFFIX) or PARTIAL_SUFFIX + "." in filename or ".tmp." in filename
+
+
+def camera_of(directory):
+    """Caméra d'un dossier : dernier élément du chemin qui identifie une caméra, sinon le dossier."""
+    for part in reversed(directory.split("/")):
+        match = CAMERA_PATTERN.match(part)
+        if match:
+            return match.group(1)
+    return directory
+
+
+class StorageIndex():
+    """Index des fichiers du stockage : dossier -> date de modification, fichiers et sous-dossiers."""
+    def __init__(self, cache_path="./cache/storage_index.json"):
+        self.cache_path = cache_path
+        self.directories = {}
+        #Incrémenté à chaque modification (les listes calculées à partir de l'index sont alors à refaire)
+        self.version = 0
+        self._entries = None
+        self._entries_version = -1
+
+    def load(self):
+        """Charge l'index conservé sur disque, s'il existe."""
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as cache:
+                self.directories = json.load(cache)
+        except (OSError, ValueError):
+            self.directories = {}
+        self.version += 1
+
+    def save(self):
+        """Enregistre l'index sur disque (fichier temporaire puis renommage)."""
+        directory = os.path.dirname(self.cache_path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory, exist_ok=True)
+        with open(self.cache_path + ".part", "w", encoding="utf-8") as cache:
+            json.dump(self.directories, cache)
+        os.replace(self.cache_path + ".part", self.cache_path)
+
+    def refresh(self, ftp, force=False):
+        """Met à jour l'index depuis une connexion FTP, renvoie le nombre de dossiers relus.
+
+        Un dossier qui ne contient que des fichiers n'est relu que si sa date de
+        modification a changé (ou si force est vrai) ; les dossiers qui contiennent
+        des sous-dossiers sont toujours relus pour détecter les changements plus bas.
+        """
+        #Le nouvel index est construit à part puis remplace l'ancien : l'interface peut lire
+        #l'index pendant la mise à jour, et les dossiers supprimés disparaissent
+        directories = {}
+        listed = 0
+        stack = [("", None)]
+        while stack:
+            path, modify = stack.pop()
+            cached = self.directories.get(path)
+            if not force and cached is not None and modify is not None \
+                    and cached["modify"] == modify and not cached["subdirectories"]:
+                directories[path] = cached
+                continue
+            files = []
+            subdirectories = []
+            for name, facts in ftp.mlsd(path, facts=["type", "size", "modify"]):
+                kind = facts.get("type")
+                if kind == "dir":
+                    child = path + "/" + name if path else name
+                    subdirectories.append(child)
+                    stack.append((child, facts.get("modify")))
+                elif kind == "file":
+                    files.append([name, int(facts.get("size", 0)), facts.get("modify", "")])
+            directories[path] = {"modify": modify, "files": files, "subdirectories": subdirectories}
+            listed += 1
+        self.directories = directories
+        self.version += 1
+        return listed
+
+    def entries(self):
+        """Liste de tous les fichiers : (caméra, dossier, nom, taille, date), recalculée seulement si l'index a changé."""
+        if self._entries_version != self.version:
+            entries = []
+            for path, directory in self.directories.items():
+                camera = camera_of(path)
+                for name, size, modify in directory["files"]:
+                    entries.append((camera, path, name, size, parse_modify(modify)))
+            self._entries = entries
+            self._entries_version = self.version
+        return self._entries
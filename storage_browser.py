@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/2026
+
+@author: 23
+
+@desc: Fenêtre de consultation du stockage des enregistrements.\
+       La liste est affichée à partir de l'index local dès l'ouverture, puis \
+       mise à jour par un fil de fond (seuls les dossiers modifiés sont relus). \
+       Le tableau est virtualisé : seules les lignes visibles existent dans le \
+       Treeview, quel que soit le nombre de fichiers.
+"""
+
+import queue
+import threading
+import tkinter as tki
+from tkinter import ttk
+
+ALL_CAMERAS = "Toutes"
+
+
+def format_size(size):
+    """Taille lisible (o, Ko, Mo, Go)."""
+    for unit in ("o", "Ko", "Mo"):
+        if size < 1024:
+            return str(round(size, 1)) + " " + unit
+        size /= 1024.0
+    return str(round(size, 1)) + " Go"
+
+
+class StorageBrowser():
+    """Fenêtre de consultation : filtre par caméra et par date, tri par colonne, téléchargement des fichiers choisis.
+
+    connect : fonction renvoyant une nouvelle connexion FTP ;
+    index : StorageIndex partagé entre les ouvertures de la fenêtre ;
+    on_download : fonction appelée avec la liste des chemins des fichiers à télécharger ;
+    progress : fonction renvoyant l'état des téléchargements, affiché sous la liste.
+    """
+    COLUMNS = ("camera", "name", "size", "date")
+    HEADINGS = {"camera": "Caméra", "name": "Fichier", "size": "Taille", "date": "Date"}
+    #Position de chaque colonne dans les entrées de l'index (caméra, dossier, nom, taille, date)
+    KEYS = {"camera": 0, "name": 2, "size": 3, "date": 4}
+
+    def __init__(self, root, connect, index, on_download, progress=None, rows=25):
+        self.connect = connect
+        self.index = index
+        self.on_download = on_download
+        self.progress = progress
+        self.visible_rows = rows
+        #Lignes filtrées et triées, première ligne affichée et chemins sélectionnés
+        self.rows = []
+        self.offset = 0
+        self.selected = set()
+        self.sort_column = "date"
+        self.sort_reverse = True
+        self.results = queue.Queue()
+        self.refreshing = False
+        self.closed = False
+
+        self.window = tki.Toplevel(root)
+        self.window.wm_title("Consultation des enregistrements")
+        self.window.wm_protocol("WM_DELETE_WINDOW", func=self.close)
+        #Filtres
+        filters = tki.Frame(self.window)
+        tki.Label(filters, text="Caméra :").pack(side="left")
+        self.camera_filter = ttk.Combobox(filters, values=[ALL_CAMERAS], state="readonly", width=12)
+        self.camera_filter.set(ALL_CAMERAS)
+        self.camera_filter.bind("<<ComboboxSelected>>", lambda event: self.apply_filters())
+        self.camera_filter.pack(side="left", padx=5)
+        tki.Label(filters, text="Date (AAAA-MM-JJ) :").pack(side="left")
+        self.date_filter = tki.Entry(filters, width=12)
+        self.date_filter.bind("<KeyRelease>", lambda event: self.apply_filters())
+        self.date_filter.pack(side="left", padx=5)
+        tki.Button(filters, text="Actualiser", command=lambda: self.refresh(force=True)).pack(side="left", padx=5)
+        filters.grid(row=1, column=1, sticky="W", padx=5, pady=5)
+        #Tableau virtualisé
+        table = tki.Frame(self.window)
+        self.tree = ttk.Treeview(table, columns=self.COLUMNS, show="headings", height=rows, selectmode="extended")
+        for column in self.COLUMNS:
+            self.tree.heading(column, text=self.HEADINGS[column], command=lambda column=column: self.sort_by(column))
+        self.tree.column("camera", width=90)
+        self.tree.column("name", width=260)
+        self.tree.column("size", width=90, anchor="e")
+        self.tree.column("date", width=150)
+        self.scrollbar = tki.Scrollbar(table, orient="vertical", command=self.scroll)
+        self.tree.bind("<<TreeviewSelect>>", self.on_select)
+        self.tree.bind("<MouseWheel>", lambda event: self.scroll("scroll", -event.delta // 120, "units"))
+        self.tree.bind("<Button-4>", lambda event: self.scroll("scroll", -1, "units"))
+        self.tree.bind("<Button-5>", lambda event: self.scroll("scroll", 1, "units"))
+        self.tree.pack(side="left")
+        self.scrollbar.pack(side="left", fill="y")
+        table.grid(row=2, column=1, padx=5)
+        #Etat et téléchargement
+        bottom = tki.Frame(self.window)
+        self.status = tki.Label(bottom, text="")
+        self.status.pack(side="left")
+        tki.Button(bottom, text="Télécharger la sélection", command=self.download).pack(side="right")
+        bottom.grid(row=3, column=1, sticky="WE", padx=5, pady=5)
+        self.download_status = tki.Label(self.window, text="")
+        self.download_status.grid(row=4, column=1, sticky="W", padx=5)
+
+        self.apply_filters()
+        self.refresh()
+        self.window.after(200, self.poll_refresh)
+
+    def lift(self):
+        """Remet la fenêtre au premier plan."""
+        self.window.deiconify()
+        self.window.lift()
+
+    def close(self):
+        """Ferme la fenêtre (une mise à jour en cours se termine en arrière-plan)."""
+        print("[INFO] Fenêtre de consultation des enregistrements fermée")
+        self.closed = True
+        self.window.destroy()
+
+    def refresh(self, force=False):
+        """Mise à jour de l'index par un fil de fond."""
+        if self.refreshing:
+            return
+        self.refreshing = True
+        self.status.config(text="Mise à jour de la liste...")
+        threading.Thread(target=self.refresh_index, args=(force,), daemon=True).start()
+
+    def refresh_index(self, force):
+        """Fil de fond : relit les dossiers modifiés et enregistre l'index."""
+        try:
+            ftp = self.connect()
+            try:
+                listed = self.index.refresh(ftp, force)
+            finally:
+                ftp.quit()
+            self.index.save()
+        except Exception as ftp_err:
+            print("FTP ERROR : " + str(ftp_err))
+            self.results.put("Erreur FTP : " + str(ftp_err))
+        else:
+            self.results.put(str(listed) + " dossier(s) relu(s)")
+
+    def poll_refresh(self):
+        """Prise en compte, depuis la boucle Tk, de la fin d'une mise à jour et de l'avancement des téléchargements."""
+        if self.closed:
+            return
+        if self.progress is not None:
+            self.download_status.config(text=self.progress())
+        try:
+            message = self.results.get_nowait()
+        except queue.Empty:
+            pass
+        else:
+            self.refreshing = False
+            self.apply_filters(message)
+        self.window.after(200, self.poll_refresh)
+
+    def apply_filters(self, message=None):
+        """Recalcule les lignes affichées (filtres et tri) à partir de l'index."""
+        entries = self.index.entries()
+        cameras = sorted(set(entry[0] for entry in entries))
+        self.camera_filter.config(values=[ALL_CAMERAS] + cameras)
+        camera = self.camera_filter.get()
+        date = self.date_filter.get().strip()
+        rows = entries
+        if camera != ALL_CAMERAS:
+            rows = [entry for entry in rows if entry[0] == camera]
+        if date:
+            rows = [entry for entry in rows if entry[4].startswith(date)]
+        key = self.KEYS[self.sort_column]
+        self.rows = sorted(rows, key=lambda entry: entry[key], reverse=self.sort_reverse)
+        self.offset = 0
+        text = str(len(self.rows)) + " fichier(s) sur " + str(len(entries))
+        if message:
+            text += " - " + message
+        elif self.refreshing:
+            text += " - Mise à jour de la liste..."
+        self.status.config(text=text)
+        self.render()
+
+    def sort_by(self, column):
+        """Tri par colonne (un second clic inverse l'ordre)."""
+        if self.sort_column == column:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column = column
+            self.sort_reverse = column in ("size", "date")
+        self.apply_filters()
+
+    def render(self):
+        """Affiche les lignes visibles uniquement."""
+        self.tree.delete(*self.tree.get_children())
+        visible = self.rows[self.offset:self.offset + self.visible_rows]
+        selection = []
+        for entry in visible:
+            path = self.path_of(entry)
+            self.tree.insert("", "end", iid=path, values=(entry[0], entry[2], format_size(entry[3]), entry[4]))
+            if path in self.selected:
+                selection.append(path)
+        self.tree.selection_set(selection)
+        total = max(1, len(self.rows))
+        self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.visible_rows) / total))
+
+    def scroll(self, command, value, unit=None):
+        """Défilement (barre de défilement ou molette) : déplace la fenêtre de lignes affichées."""
+        if command == "moveto":
+            offset = int(float(value) * len(self.rows))
+        else:
+            step = self.visible_rows if unit == "pages" else 1
+            offset = self.offset + int(value) * step
+        offset = max(0, min(offset, len(self.rows) - self.visible_rows))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+
+    def on_select(self, event):
+        """Mémorise la sélection, y compris celle des lignes qui ne sont plus affichées."""
+        visible = set(self.tree.get_children())
+        self.selected = (self.selected - visible) | set(self.tree.selection())
+
+    @staticmethod
+    def path_of(entry):
+        """Chemin d'un fichier sur le stockage."""
+        return entry[1] + "/" + entry[2] if entry[1] else entry[2]
+
+    def download(self):
+        """Transmet les fichiers sélectionnés au téléchargement."""
+        if self.selected:
+            self.on_download(sorted(self.selected))
+        else:
+            print("[ERROR] Aucun fichier sélectionné")
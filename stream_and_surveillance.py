@@ -11,213 +11,452 @@ import os
 import sys
 import time
 import datetime
-
-import threading
+import functools
 
 import socket
-import errno
-import urllib.request
-
-import numpy as np
 
-import imageio
 import cv2
 
-import imutils
-
+from mjpeg import FrameExtractor
+from ingest import SourceState, open_source, describe_boundary, READ_SIZE, READ_TIMEOUT
+from broadcaster import Broadcaster
+import protocol
+from tiers import TierEncoder
+from detection import MotionDetector
+from recording import RecordWriter, PreEventBuffer
+from pipeline import DetectionPool
+from catalog import RecordingCatalog
+from retention import RetentionManager, GIGABYTE, DAY
+from metrics import Metrics, MetricsServer
+from multi_camera import MultiCameraServer, read_config
 
 
 class Server():
     """Classe d'instance de diffusion et de surveillance."""
-    def __init__(self, source, port):
+    def __init__(self, source, port, broadcaster=None, detector=None, record_format="mp4",
+                 pre_event_seconds=5, pre_event_bytes=4 * 1024 * 1024, detection_pool=None, catalog=None,
+                 records_directory="./storage/records/", segment_seconds=60):
         #Reception du flux (source:port, data)
         self.source_url = source
         self.port = port
         self.source = None
-        self.data = b''
+        self.extractor = FrameExtractor()
+        #Reconnexions de la source (délai croissant, nombre et durée des coupures)
+        self.ingest = SourceState()
+        self.last_data = time.monotonic()
 
         self.prefix = "[STREAM PORT " + str(self.port) + "]"
 
-        #Client serveur (socket, client)
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.socket.settimeout(0.01)
-        self.socket.bind(("0.0.0.0", self.port))
-        self.socket.listen(1)
-        self.client = None
+        #Diffusion vers les clients (nombre quelconque, file d'envoi bornée par client,
+        #images réduites préparées une fois par niveau de qualité demandé)
+        self.broadcaster = Broadcaster(self.port, self.prefix, encoder=TierEncoder()) if broadcaster is None else broadcaster
+        self.sequence = 0
 
-        #Surveillance
-        self.img_reference = None
+        #Surveillance (fond adaptatif, décodage réduit, images sautées au repos)
+        self.detector = MotionDetector() if detector is None else detector
+        #Détection dans des processus séparés (pipeline.DetectionPool), sinon dans le fil de lecture
+        self.detection_pool = detection_pool
+        if detection_pool is not None:
+            detection_pool.register(self.port, self.detector.options, self.pool_detection)
         self.detected = False
         self.last_presence_time = None
         self.recording = False
-        self.frames_to_save = []
-        self.thread_save_record = threading.Thread(target=self.save_record, args=(), daemon=True)
+
+        #Enregistrement au fil de l'eau (file bornée et fil d'écriture dédié),
+        #en MP4 ou en JPEG reçus sans ré-encodage (record_format="mjpeg"), avec ajout au catalogue,
+        #en segments de segment_seconds dans le dossier de la caméra (<records_directory>/cam8001/)
+        self.recorder = RecordWriter(self.prefix, os.path.join(records_directory, "cam" + str(self.port), ""),
+                                     record_format=record_format, catalog=catalog, camera_id=self.port,
+                                     segment_seconds=segment_seconds)
+        self.record_timeout = 5
+        #Images précédant la détection, ajoutées au début de l'enregistrement
+        self.pre_event = PreEventBuffer(pre_event_seconds, pre_event_bytes)
+
+        #Mesures (metrics.py) : compteurs et latences par étape dans le chemin critique,
+        #jauges évaluées seulement à la lecture des mesures
+        self.metrics = Metrics({"camera": self.port})
+        self.metrics.gauge("frames_analysed_total", self.analysed_frames)
+        self.metrics.gauge("frames_sent_total", lambda: self.broadcaster.totals()[0])
+        self.metrics.gauge("bytes_sent_total", lambda: self.broadcaster.totals()[1])
+        self.metrics.gauge("frames_dropped_clients_total", lambda: self.broadcaster.totals()[2])
+        self.metrics.gauge("clients", self.broadcaster.client_count)
+        self.metrics.gauge("buffer_resets_total", lambda: self.extractor.frames_dropped)
+        self.metrics.gauge("buffer_dropped_bytes_total", lambda: self.extractor.bytes_dropped)
+        self.metrics.gauge("frames_sized_total", lambda: self.extractor.frames_sized)
+        self.metrics.gauge("source_connected", lambda: int(self.ingest.connected))
+        self.metrics.gauge("source_reconnects_total", self.ingest.reconnects)
+        self.metrics.gauge("source_downtime_seconds_total", lambda: round(self.ingest.total_downtime(), 1))
+        self.metrics.gauge("record_queue_depth", lambda: self.recorder.queue.qsize())
+        self.metrics.gauge("frames_dropped_record_total", lambda: self.recorder.dropped_frames)
+        self.metrics.gauge("recording", lambda: int(self.recording))
+        for tier, description in protocol.TIERS.items():
+            labels = {"tier": description.name}
+            self.metrics.gauge("tier_clients", lambda tier=tier: self.broadcaster.tier_stats().get(tier, (0, 0))[0], labels)
+            self.metrics.gauge("tier_bytes_sent_total", lambda tier=tier: self.broadcaster.tier_stats().get(tier, (0, 0))[1],
+                               labels)
+            if tier != protocol.TIER_FULL and self.broadcaster.encoder is not None:
+                encoder = self.broadcaster.encoder
+                self.metrics.gauge("tier_encoded_frames_total", lambda tier=tier: encoder.encoded_frames.get(tier, 0), labels)
+                self.metrics.gauge("tier_encode_seconds_total", lambda tier=tier: round(encoder.encode_time.get(tier, 0.0), 3),
+                                   labels)
+                self.metrics.gauge("tier_frames_skipped_total",
+                                   lambda tier=tier: self.broadcaster.skipped_encodings.get(tier, 0), labels)
+        #Début de l'attente de la prochaine image (latence de lecture de la source)
+        self.waited = time.perf_counter()
 
     def broadcast_and_watch(self):
-        """Fonction de diffusion par socket et de surveillance du flux vidéo."""
+        """Fonction de diffusion par socket et de surveillance du flux vidéo.
+
+        Une source perdue est reconnectée (ingest.SourceState) sans toucher à la détection,
+        aux clients ni à l'enregistrement en cours.
+        """
         print(str(self.prefix) + "[START] Broadcast and surveillance start for " + str(self.source_url) + " on port " + str(self.port))
+        self.broadcaster.start()
+        self.recorder.start()
         while True:
             if self.source is None:
                 try:
-                    self.source = urllib.request.urlopen(self.source_url, timeout=1)
-                    print(str(self.prefix) + "[INFO] Source connected !")
-                except Exception as err_source:
+                    self.source, boundary = open_source(self.source_url, self.extractor)
+                    self.source.settimeout(1)
+                except (OSError, ValueError) as err_source:
                     print(str(self.prefix) + "[Error from video source] : " + str(err_source))
                     self.source = None
-                    print(str(self.prefix) + "[INFO] Retry to connect to source in 5 seconds...")
-                    time.sleep(5)
+                    self.ingest.lost()
+                    self.wait_retry(self.ingest.retry_delay())
+                    continue
+                self.source_connected(boundary)
             else:
                 try:
-                    self.data += self.source.read(512)
+                    if self.extractor.fill(self.source.recv_into, READ_SIZE) == 0:
+                        raise ConnectionResetError("End of stream")
+                    self.last_data = time.monotonic()
                 except socket.timeout:
-                    pass
+                    if time.monotonic() - self.last_data >= READ_TIMEOUT:
+                        self.source_lost(TimeoutError("No data for " + str(READ_TIMEOUT) + " seconds"), self.last_data)
                 except KeyboardInterrupt:
-                    print(str(self.prefix) + "[ALERT] Script stopped by user...")
-                    self.client.close()
-                    self.client = None
-                    self.source.close()
-                    sys.exit()
+                    self.stop()
                 except OSError as os_err:
-                    print(str(self.prefix) + "[OS Error] " + str(os_err))
-                    print(str(self.prefix) + "[ALERT] Stream aborted !")
-                    self.socket.close()
-                    if len(self.frames_to_save) > 0:
-                        self.thread_save_record.start()
-                        while len(threading.enumerate()) > 1:
-                            time.sleep(1)
-                    break
+                    self.source_lost(os_err)
                 except Exception as err:
                     print(str(self.prefix) + "[ERROR] Other error : " + str(err))
-                    self.client.close()
-                    self.client = None
+                    self.broadcaster.close()
+                    self.recorder.stop()
                     self.source.close()
                     sys.exit()
                 else:
-                    img_start = self.data.find(b'\xff\xd8')
-                    img_end = self.data.find(b'\xff\xd9')
-                    if img_start > -1 and img_end > -1:
-                        try:
-                            extracted_img = self.data[img_start:img_end+2]
-                            self.data = self.data[img_end+2:]
-                            jpg = cv2.imdecode(np.frombuffer(extracted_img, dtype='int8'), cv2.IMREAD_COLOR)
-                            gray = cv2.cvtColor(jpg, cv2.COLOR_BGR2GRAY)
-                            gray = cv2.GaussianBlur(gray, (21, 21), 0)
-                            if self.img_reference is None:
-                                self.img_reference = gray
-                                continue
-                            frame_delta = cv2.absdiff(self.img_reference, gray)
-                            thresh = cv2.threshold(frame_delta, 50, 255, cv2.THRESH_BINARY)[1]
-                            thresh = cv2.dilate(thresh, None, iterations=2)
-                            cnts = cv2.findContours(thresh.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-                            cnts = imutils.grab_contours(cnts)
-                            for c in cnts:
-                                # if the contour is too small, ignore it
-                                if cv2.contourArea(c) < 500:
-                                    if self.detected:
-                                        self.detected = False
-                                    continue
-                                self.detected = True
-                                self.last_presence_time = datetime.datetime.now()
-                                #Si une présence est detectée, mise en route si necessaire de l'enregistrement
-                                if self.detected:
-                                    if not self.recording:
-                                        print(str(self.prefix) + "[INFO] Presence detected ! Start record")
-                                        self.recording = True
-                            #Si l'option "enregistrement" est activée, on conserve l'image courante
-                            if self.recording:
-                                self.frames_to_save.append(cv2.cvtColor(jpg, cv2.COLOR_BGR2RGB))
-                                if int((datetime.datetime.now()- self.last_presence_time).total_seconds()) == 5:
-                                    print(str(self.prefix) + "[INFO] Nothing detected since 5 seconds, stop record...")
-                                    self.thread_save_record.start()
-                                elif len(self.frames_to_save) >= 1000:
-                                    print(str(self.prefix) + "[INFO] More than 1000 frames recorded, save...")
-                                    self.img_reference = gray
-                                    self.thread_save_record.start()
-                            to_send = str.encode("camera:" + str(self.port) + ";timestamp:" + datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S") + ";record:" + str(self.recording)) + extracted_img
-                        except cv2.error:
-                            pass
-                        if len(self.data) > 10000:
-                            print(str(self.prefix) + "[ALERT] Variable too large (over 10000)")
-                            self.data = b''
-                        elif len(self.data) > 8000:
-                            print(str(self.prefix) + "[ALERT] Variable large (over 8000)")
-                            self.data = b''
-
-                        if self.client is None:
-                            try:
-                                self.client, address = self.socket.accept()
-                                print(str(self.prefix) + "[INFO] New client : " + str(address))
-                            except socket.timeout:
-                                self.client = None
-                                continue
-                        else:
-                            try:
-                                self.client.send(to_send)
-                            except KeyboardInterrupt:
-                                print(str(self.prefix) + "[ALERT] Stream shutdown by user...")
-                                if not self.client is None:
-                                    self.client.close()
-                                    self.socket.close()
-                                    sys.exit()
-                            except socket.error as s_err:
-                                if s_err.errno == errno.ECONNRESET:
-                                    print(str(self.prefix) + "[INFO] Client disconnected...")
-                                else:
-                                    print(str(self.prefix) + "[ERROR] Socket error : " + str(s_err))
-                                    self.client.close()
-                                    self.client = None
-
-    def save_record(self):
-        """ Arrete l'enregistrement et sauvegarde les images récupérées en vidéo """
-        self.recording = False
-        self.thread_save_record = threading.Thread(target=self.save_record, args=(), daemon=True)
-        frames = self.frames_to_save
-        print(str(self.prefix) + "[INFO] Stop recording, saving " + str(len(frames)) + " frame(s)...")
-        now = str(datetime.datetime.now().strftime("%Y-%m-%d-%H_%M_%S"))
-        filename = "rec-" + str(now) + ".mp4"
-        if not os.path.isdir("./storage/"):
-            try:
-                os.mkdir("./storage/")
-                print(str(self.prefix) + "[INFO] Created storage directory")
-            except OSError as os_exception:
-                print(str(self.prefix) + "[ERROR] OS error detected : " + str(os_exception))
-        if not os.path.isdir("./storage/records/"):
-            try:
-                os.mkdir("./storage/records/")
-                print(str(self.prefix) + "[INFO] Created video record directory")
-            except OSError as os_exception:
-                print(str(self.prefix) + "[ERROR] OS error detected : " + str(os_exception))
-        writer = imageio.get_writer('storage/records/'+filename, format='mp4', mode='I', fps=26)
-        for frame in frames:
-            writer.append_data(frame)
-        writer.close()
-        print(str(self.prefix) + "[INFO] Record saved as : " + str(filename) + " in records directory.")
-        self.frames_to_save.clear()
+                    for header, extracted_img in self.extractor.frames():
+                        self.process_frame(extracted_img)
+
+    def source_connected(self, boundary):
+        """Source (re)connectée : la lecture reprend avec le même état de surveillance."""
+        print(str(self.prefix) + "[INFO] Source connected ! (" + describe_boundary(boundary) + ")")
+        outage = self.ingest.up()
+        if outage is not None:
+            print(str(self.prefix) + "[INFO] Source back after " + str(round(outage, 1)) + " seconds (" + self.ingest.summary() + ")")
+        self.last_data = time.monotonic()
+        self.waited = time.perf_counter()
+
+    def source_lost(self, err, since=None):
+        """Source perdue : la socket est fermée, puis la reconnexion est tentée.
+
+        Aussitôt si la connexion a apporté une image, sinon (et après chaque échec) avec un délai croissant.
+        """
+        print(str(self.prefix) + "[OS Error] " + (str(err) or type(err).__name__))
+        print(str(self.prefix) + "[ALERT] Stream aborted, reconnecting...")
+        self.source.close()
+        self.source = None
+        self.ingest.lost(since)
+        delay = self.ingest.reconnect_delay()
+        if delay > 0:
+            self.wait_retry(delay)
+
+    def wait_retry(self, delay):
+        """Attente avant une nouvelle tentative de connexion (Ctrl+C arrête le serveur)."""
+        print(str(self.prefix) + "[INFO] Retry to connect to source in " + str(round(delay, 1)) + " seconds...")
+        try:
+            time.sleep(delay)
+        except KeyboardInterrupt:
+            self.stop()
+
+    def stop(self):
+        """Arrêt par l'utilisateur : statistiques, fermeture des clients, de l'enregistrement et de la source."""
+        print(str(self.prefix) + "[ALERT] Script stopped by user...")
+        self.broadcaster.report()
+        if self.detection_pool is not None:
+            analysed, skipped, latency = self.detection_pool.stats(self.port)
+            print(str(self.prefix) + "[STATS] Detection : " + str(analysed) + " frame(s) analysed, " + str(skipped)
+                  + " skipped, " + str(round(latency * 1000, 1)) + " ms average latency")
+        print(str(self.prefix) + "[STATS] Latency : " + self.metrics.summary())
+        print(str(self.prefix) + "[STATS] Source : " + self.ingest.summary())
+        self.broadcaster.close()
+        self.recorder.stop()
+        if self.source is not None:
+            self.source.close()
+        sys.exit()
+
+    def process_frame(self, extracted_img):
+        """Surveillance, diffusion et enregistrement d'une image extraite du flux, avec la durée de chaque étape."""
+        started = time.perf_counter()
+        self.ingest.frame()
+        self.metrics.inc("frames_in")
+        self.metrics.observe("read", started - self.waited)
+        timestamp_us = int(time.monotonic() * 1000000)
+        if self.detection_pool is not None or self.watch(extracted_img):
+            message = self.make_message(extracted_img, timestamp_us)
+            self.publish(message)
+            recorded = time.perf_counter()
+            self.record_frame(message)
+            self.metrics.observe("record", time.perf_counter() - recorded)
+            if self.detection_pool is not None:
+                self.watch_async(message.payload)
+        self.waited = time.perf_counter()
+        self.metrics.observe("frame", self.waited - started)
+
+    def publish(self, message):
+        """Diffusion d'une image (protocol.FrameMessage) aux clients."""
+        started = time.perf_counter()
+        self.broadcaster.publish(message)
+        self.metrics.inc("frames_published")
+        self.metrics.observe("publish", time.perf_counter() - started)
+
+    def analysed_frames(self):
+        """Nombre d'images décodées et analysées par la détection."""
+        if self.detection_pool is not None:
+            return self.detection_pool.stats(self.port)[0]
+        return self.detector.analysed_count
+
+    def watch(self, extracted_img):
+        """Surveillance d'une image extraite du flux, renvoie False si elle ne doit pas être diffusée."""
+        try:
+            if self.detector.should_analyse(self.detected or self.recording):
+                started = time.perf_counter()
+                detection = self.detector.analyse(extracted_img)
+                self.metrics.observe("detect", time.perf_counter() - started)
+                if detection is None:
+                    self.metrics.inc("frames_invalid")
+                    return False
+                self.apply_detection(detection)
+        except cv2.error:
+            self.metrics.inc("frames_invalid")
+            return False
+        return True
+
+    def watch_async(self, jpeg):
+        """Soumet l'image (bytes) au groupe de processus de détection si elle doit être analysée."""
+        if self.detector.should_analyse(self.detected or self.recording):
+            self.detection_pool.submit(self.port, jpeg)
+
+    def pool_detection(self, detection):
+        """Résultat du groupe de processus de détection (fil de collecte de pipeline.DetectionPool)."""
+        self.metrics.observe("detect", self.detection_pool.last_latency(self.port))
+        self.apply_detection(detection)
+
+    def apply_detection(self, detection):
+        """Met à jour l'état de la surveillance avec le résultat d'une analyse."""
+        if detection is None:
+            return
+        self.detected = detection.motion
+        if self.detected:
+            self.last_presence_time = datetime.datetime.now()
+            self.recorder.motion(int(time.monotonic() * 1000000), detection.peak_area)
+            #Si une présence est detectée, mise en route si necessaire de l'enregistrement
+            if not self.recording:
+                print(str(self.prefix) + "[INFO] Presence detected ! Start record")
+                self.recording = True
+
+    def record_frame(self, message):
+        """Transmet l'image (protocol.FrameMessage) à l'enregistrement en cours, ouvre ou ferme les fichiers au besoin."""
+        if self.recording:
+            if (datetime.datetime.now() - self.last_presence_time).total_seconds() >= self.record_timeout:
+                print(str(self.prefix) + "[INFO] Nothing detected since " + str(self.record_timeout) + " seconds, stop record...")
+                self.recording = False
+            else:
+                if not self.recorder.is_open:
+                    self.recorder.open()
+                    for timestamp_us, jpeg in self.pre_event.drain():
+                        self.recorder.write(jpeg, timestamp_us)
+                self.recorder.write(message.payload, message.timestamp_us)
+                return
+        if self.recorder.is_open:
+            print(str(self.prefix) + "[INFO] Stop recording, saving " + str(self.recorder.frame_count) + " frame(s)...")
+            self.recorder.close()
+        self.pre_event.push(message.payload, message.timestamp_us)
+
+    def make_message(self, extracted_img, timestamp_us):
+        """Image à diffuser (protocol.FrameMessage) avec l'état courant de la surveillance."""
+        self.sequence += 1
+        flags = protocol.FLAG_RECORDING if self.recording else 0
+        if self.detected:
+            flags |= protocol.FLAG_MOTION
+        return protocol.FrameMessage(bytes(extracted_img), self.port, self.sequence, flags, timestamp_us)
 
 def main():
-    """Fonction principale : Vérification des arguments et démarrage d'une instance serveur."""
-    if len(sys.argv) == 5:
-        for i in range(1, len(sys.argv)):
-            if i % 2 == 1:
-                if sys.argv[i] == "--url":
-                    if isinstance(sys.argv[i + 1], str):
-                        source_url = sys.argv[i+1]
-                    else:
-                        print("--url must be string")
-                        sys.exit()
-                elif sys.argv[i] == "--port" or sys.argv[i] == "-p":
-                    if sys.argv[i + 1].isdigit():
-                        broadcast_port = int(sys.argv[i+1])
-                    else:
-                        print("--port must be int")
-                        sys.exit()
-    else:
-        print("Usage : stream_and_surveillance.py --url <link> --port <800X>")
+    """Fonction principale : Vérification des arguments et démarrage d'une instance serveur.
+
+    Une paire --url/--port démarre une instance classique ; plusieurs paires ou
+    un fichier --config démarrent le mode multi-caméras (un seul processus).
+    """
+    usage = "Usage : stream_and_surveillance.py --url <link> --port <800X> [--url <link> --port <800X> ...]\n" \
+            "        stream_and_surveillance.py --config <cameras.json> [--workers <n>]\n" \
+            "Options : --record-format <mp4|mjpeg>, --detection-processes <n> (0 : detection in the reading thread),\n" \
+            "          --catalog <catalog.sqlite>, --metrics-port <port> (0 : no metrics ; default : 1000 + port,\n" \
+            "          9000 in multi-camera mode), --segment <seconds> (record file duration, default : 60),\n" \
+            "          --storage-quota <GB>, --camera-quota <GB>, --max-age <days> (oldest records deleted)"
+    source_urls = []
+    broadcast_ports = []
+    config_path = None
+    workers = None
+    record_format = None
+    detection_processes = None
+    catalog_path = None
+    metrics_port = None
+    segment_seconds = None
+    retention = {}
+    if len(sys.argv) < 3 or len(sys.argv) % 2 == 0:
+        print(usage)
         sys.exit()
-    server = Server(source_url, broadcast_port)
-    server.broadcast_and_watch()
-    del server
+    for i in range(1, len(sys.argv), 2):
+        if sys.argv[i] == "--url":
+            source_urls.append(sys.argv[i+1])
+        elif sys.argv[i] == "--port" or sys.argv[i] == "-p":
+            if sys.argv[i + 1].isdigit():
+                broadcast_ports.append(int(sys.argv[i+1]))
+            else:
+                print("--port must be int")
+                sys.exit()
+        elif sys.argv[i] == "--config":
+            config_path = sys.argv[i+1]
+        elif sys.argv[i] == "--record-format":
+            if sys.argv[i + 1] in ("mp4", "mjpeg"):
+                record_format = sys.argv[i+1]
+            else:
+                print("--record-format must be mp4 or mjpeg")
+                sys.exit()
+        elif sys.argv[i] == "--detection-processes":
+            if sys.argv[i + 1].isdigit():
+                detection_processes = int(sys.argv[i+1])
+            else:
+                print("--detection-processes must be int")
+                sys.exit()
+        elif sys.argv[i] == "--catalog":
+            catalog_path = sys.argv[i+1]
+        elif sys.argv[i] == "--metrics-port":
+            if sys.argv[i + 1].isdigit():
+                metrics_port = int(sys.argv[i+1])
+            else:
+                print("--metrics-port must be int")
+                sys.exit()
+        elif sys.argv[i] in ("--segment", "--storage-quota", "--camera-quota", "--max-age"):
+            if sys.argv[i + 1].isdigit():
+                if sys.argv[i] == "--segment":
+                    segment_seconds = int(sys.argv[i+1])
+                else:
+                    retention[sys.argv[i]] = int(sys.argv[i+1])
+            else:
+                print(sys.argv[i] + " must be int")
+                sys.exit()
+        elif sys.argv[i] == "--workers":
+            if sys.argv[i + 1].isdigit():
+                workers = int(sys.argv[i+1])
+            else:
+                print("--workers must be int")
+                sys.exit()
+        else:
+            print(usage)
+            sys.exit()
+    if len(source_urls) != len(broadcast_ports):
+        print("Each --url needs a --port")
+        sys.exit()
+    cameras = list(zip(source_urls, broadcast_ports))
+    if config_path is not None:
+        try:
+            config_cameras, config = read_config(config_path)
+        except (OSError, ValueError, KeyError) as config_err:
+            print("Invalid config file : " + str(config_err))
+            sys.exit()
+        cameras += config_cameras
+        workers = workers or config.get("workers")
+        record_format = record_format or config.get("record_format")
+        if detection_processes is None:
+            detection_processes = config.get("detection_processes")
+        catalog_path = catalog_path or config.get("catalog")
+        if metrics_port is None:
+            metrics_port = config.get("metrics_port")
+        segment_seconds = segment_seconds or config.get("segment_seconds")
+        for name, key in (("--storage-quota", "storage_quota_gb"), ("--camera-quota", "camera_quota_gb"),
+                          ("--max-age", "max_age_days")):
+            if name not in retention and config.get(key):
+                retention[name] = config[key]
+    if len(cameras) == 0:
+        print(usage)
+        sys.exit()
+    single = len(cameras) == 1 and config_path is None
+    #Une caméra seule : détection dans un processus séparé par défaut ; plusieurs caméras :
+    #groupe de fils partagé par défaut (un processus par caméra recharge numpy/cv2)
+    if detection_processes is None:
+        detection_processes = 1 if single else 0
+    #Processus lancés par "spawn" (pipeline.CONTEXT) : démarrés après l'enregistrement des caméras, ils
+    #n'héritent pas des sockets, du catalogue ni des fils créés d'ici là
+    detection_pool = DetectionPool(detection_processes) if detection_processes > 0 else None
+    #Catalogue des enregistrements (--catalog), partagé par toutes les caméras (et par les autres processus)
+    catalog = RecordingCatalog(catalog_path) if catalog_path is not None else None
+    server_class = functools.partial(Server, record_format=record_format or "mp4", detection_pool=detection_pool,
+                                     catalog=catalog, segment_seconds=segment_seconds or 60)
+    #Suppression des plus anciens enregistrements (quotas de l'ensemble et par caméra, durée de conservation),
+    #valeurs propres à une caméra dans cameras.json ("quota_gb", "max_age_days")
+    retention_manager = None
+    overrides = {}
+    if config_path is not None:
+        for camera in config.get("cameras", []):
+            if camera.get("quota_gb") or camera.get("max_age_days"):
+                overrides[str(camera["port"])] = (camera.get("quota_gb", 0) * GIGABYTE or None,
+                                                  camera.get("max_age_days", 0) * DAY or None)
+    if single and retention:
+        #Un processus par caméra : chacun ne s'occupe que de son dossier, le quota de l'ensemble
+        #n'a de sens que pour un gestionnaire unique (mode multi-caméras ou superviseur)
+        if retention.get("--storage-quota"):
+            print("--storage-quota needs the multi-camera mode (--config) or supervisor.py, use --camera-quota")
+            sys.exit()
+        retention_manager = RetentionManager(root=os.path.join("./storage/records/", "cam" + str(cameras[0][1]), ""),
+                                             camera_max_bytes=retention.get("--camera-quota", 0) * GIGABYTE,
+                                             max_age=retention.get("--max-age", 0) * DAY, catalog=catalog)
+        retention_manager.start()
+    elif retention or overrides:
+        retention_manager = RetentionManager(max_bytes=retention.get("--storage-quota", 0) * GIGABYTE,
+                                             camera_max_bytes=retention.get("--camera-quota", 0) * GIGABYTE,
+                                             max_age=retention.get("--max-age", 0) * DAY, cameras=overrides,
+                                             catalog=catalog)
+        retention_manager.start()
+    #Mesures servies localement sur un port annexe
+    if metrics_port is None:
+        metrics_port = cameras[0][1] + 1000 if single else 9000
+    metrics_server = MetricsServer(metrics_port) if metrics_port > 0 else None
+    if single:
+        server = server_class(cameras[0][0], cameras[0][1])
+        if metrics_server is not None:
+            metrics_server.register(server.metrics)
+            if retention_manager is not None:
+                metrics_server.register(retention_manager.metrics)
+            metrics_server.start()
+        if detection_pool is not None:
+            detection_pool.start()
+        server.broadcast_and_watch()
+        if detection_pool is not None:
+            detection_pool.close()
+        if metrics_server is not None:
+            metrics_server.close()
+        del server
+    else:
+        multi_camera_server = MultiCameraServer(cameras, server_class, workers)
+        if metrics_server is not None:
+            for task in multi_camera_server.tasks:
+                metrics_server.register(task.server.metrics)
+            if retention_manager is not None:
+                metrics_server.register(retention_manager.metrics)
+            metrics_server.start()
+        if detection_pool is not None:
+            detection_pool.start()
+        multi_camera_server.start()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/2026
+
+@author: 23
+
+@desc: Superviseur des serveurs de diffusion et de surveillance (remplace la \
+       boucle de server_v1.sh).\
+       Les caméras du sous-réseau sont recherchées à intervalle régulier par des \
+       connexions TCP simultanées (asyncio). Chaque caméra trouvée reçoit un port \
+       déduit de son adresse (toujours le même) et son propre processus \
+       stream_and_surveillance.py. La santé de chaque processus est suivie par ses \
+       mesures (metrics.py : images reçues) ; un processus arrêté ou bloqué est \
+       redémarré avec un délai qui double à chaque échec. Avec des quotas, un \
+       processus retention.py unique supprime les plus anciens enregistrements de \
+       toutes les caméras.
+       Usage : supervisor.py [--hosts <192.168.10.10-20>] [--camera-port <81>] [--first-port <8001>] \
+               [--interval <30>] [--storage-quota <Go>] [--camera-quota <Go>] [--max-age <jours>] \
+               [-- <options de stream_and_surveillance.py>]
+"""
+
+import os
+import sys
+import time
+import signal
+import random
+import asyncio
+import ipaddress
+
+PREFIX = "[SUPERVISOR]"
+DEFAULT_HOSTS = "192.168.10.10-20"
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stream_and_surveillance.py")
+RETENTION_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "retention.py")
+
+
+def parse_hosts(text):
+    """Adresses à surveiller : "192.168.10.10-20", "192.168.10.0/28" ou liste séparée par des virgules."""
+    hosts = []
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "/" in part:
+            hosts.extend(str(ip) for ip in ipaddress.ip_network(part, strict=False).hosts())
+        elif "-" in part:
+            first, _, last = part.partition("-")
+            first_ip = ipaddress.ip_address(first)
+            if "." in last:
+                last_ip = ipaddress.ip_address(last)
+            else:
+                last_ip = ipaddress.ip_address(first.rsplit(".", 1)[0] + "." + last)
+            hosts.extend(str(ipaddress.ip_address(value)) for value in range(int(first_ip), int(last_ip) + 1))
+        else:
+            hosts.append(str(ipaddress.ip_address(part)))
+    return hosts
+
+
+def parse_frames(text):
+    """Total des images reçues (rds_frames_in_total) dans le texte des mesures d'un serveur."""
+    total = None
+    for line in text.splitlines():
+        if line.startswith("rds_frames_in_total"):
+            total = (total or 0) + float(line.rsplit(" ", 1)[1])
+    return total
+
+
+class CameraProcess():
+    """Serveur d'une caméra : processus, santé et redémarrages."""
+    def __init__(self, ip, port, metrics_port):
+        self.ip = ip
+        self.port = port
+        self.metrics_port = metrics_port
+        self.prefix = PREFIX + "[" + str(ip) + " -> " + str(port) + "]"
+        self.process = None
+        self.present = False
+        self.missing_scans = 0
+        #Redémarrages : échecs consécutifs et heure du prochain démarrage autorisé
+        self.failures = 0
+        self.restarts = 0
+        self.next_start = 0.0
+        #Santé : heure de démarrage, dernier nombre d'images reçues et heure de sa dernière progression
+        self.started_at = 0.0
+        self.frames = None
+        self.last_progress = 0.0
+
+    def running(self):
+        """Vrai si le processus tourne."""
+        return self.process is not None and self.process.returncode is None
+
+
+class Supervisor():
+    """Recherche des caméras, un processus serveur par caméra, surveillance et redémarrage."""
+    def __init__(self, hosts, camera_port=81, first_port=8001, metrics_offset=1000, interval=30, probe_timeout=1.0,
+                 health_interval=10, startup_grace=30, stall_timeout=60, missing_scans=3, backoff=2, max_backoff=300,
+                 stable_time=120, server_args=(), max_probes=256, retention_args=None):
+        self.hosts = hosts
+        self.camera_port = camera_port
+        self.first_port = first_port
+        self.metrics_offset = metrics_offset
+        self.interval = interval
+        self.probe_timeout = probe_timeout
+        self.health_interval = health_interval
+        self.startup_grace = startup_grace
+        self.stall_timeout = stall_timeout
+        self.missing_scans = missing_scans
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.stable_time = stable_time
+        self.server_args = list(server_args)
+        #Options de retention.py (None : pas de suppression des anciens enregistrements) et son processus
+        self.retention_args = retention_args
+        self.retention = None
+        self.probes = asyncio.Semaphore(max_probes)
+        #Port de chaque adresse : position dans la liste des adresses surveillées
+        self.ports = {ip: first_port + index for index, ip in enumerate(hosts)}
+        self.cameras = {}
+        self.stopping = asyncio.Event()
+
+    async def probe(self, ip):
+        """Vrai si le port de la caméra accepte une connexion dans le délai."""
+        async with self.probes:
+            try:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, self.camera_port), self.probe_timeout)
+            except (OSError, asyncio.TimeoutError):
+                return False
+            writer.close()
+            return True
+
+    async def scan(self):
+        """Recherche simultanée de toutes les caméras, met à jour leur présence."""
+        results = await asyncio.gather(*[self.probe(ip) for ip in self.hosts])
+        for ip, present in zip(self.hosts, results):
+            camera = self.cameras.get(ip)
+            if present:
+                if camera is None:
+                    port = self.ports[ip]
+                    camera = self.cameras[ip] = CameraProcess(ip, port, port + self.metrics_offset)
+                    print(camera.prefix + "[INFO] Camera found")
+                camera.present = True
+                camera.missing_scans = 0
+            elif camera is not None and camera.present:
+                camera.missing_scans += 1
+                if camera.missing_scans >= self.missing_scans:
+                    #Caméra absente depuis plusieurs recherches : son serveur est arrêté
+                    print(camera.prefix + "[ALERT] Camera lost")
+                    camera.present = False
+                    await self.stop_camera(camera)
+                    #Arrêt volontaire : il ne doit pas être compté comme une panne par check_health
+                    camera.process = None
+
+    async def start_camera(self, camera):
+        """Démarre le serveur d'une caméra."""
+        command = [sys.executable, SERVER_SCRIPT, "--url", "http://" + str(camera.ip) + ":" + str(self.camera_port),
+                   "--port", str(camera.port), "--metrics-port", str(camera.metrics_port)] + self.server_args
+        try:
+            camera.process = await asyncio.create_subprocess_exec(*command)
+        except OSError as os_err:
+            print(camera.prefix + "[ERROR] Unable to start server : " + str(os_err))
+            self.failed(camera)
+            return
+        camera.started_at = time.monotonic()
+        camera.frames = None
+        camera.last_progress = camera.started_at
+        print(camera.prefix + "[START] Server started (pid " + str(camera.process.pid) + ")")
+
+    async def stop_camera(self, camera, timeout=10):
+        """Arrête le serveur d'une caméra comme par Ctrl+C, de force s'il ne s'arrête pas."""
+        if camera.running():
+            await self.stop_process(camera.process, timeout)
+
+    @staticmethod
+    async def stop_process(process, timeout=10):
+        """Arrête un processus comme par Ctrl+C, de force s'il ne s'arrête pas."""
+        try:
+            process.send_signal(signal.SIGINT)
+            await asyncio.wait_for(process.wait(), timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+        except ProcessLookupError:
+            pass
+
+    async def check_retention(self):
+        """Démarre (ou redémarre) l'unique processus de suppression des anciens enregistrements."""
+        if self.retention is not None and self.retention.returncode is None:
+            return
+        if self.retention is not None:
+            print(PREFIX + "[RETENTION][ALERT] Exited with code " + str(self.retention.returncode) + ", restart")
+        try:
+            self.retention = await asyncio.create_subprocess_exec(sys.executable, RETENTION_SCRIPT, *self.retention_args)
+        except OSError as os_err:
+            print(PREFIX + "[RETENTION][ERROR] Unable to start : " + str(os_err))
+            self.retention = None
+
+    def failed(self, camera):
+        """Échec d'un serveur : prochain démarrage retardé (délai doublé à chaque échec, avec un peu d'aléa)."""
+        camera.failures += 1
+        delay = min(self.max_backoff, self.backoff * 2 ** (camera.failures - 1))
+        delay *= random.uniform(0.8, 1.2)
+        camera.next_start = time.monotonic() + delay
+        print(camera.prefix + "[ALERT] Restart in " + str(round(delay, 1)) + " seconds (failure " + str(camera.failures) + ")")
+
+    async def read_frames(self, camera):
+        """Nombre d'images reçues par le serveur d'une caméra (mesures), None s'il ne répond pas."""
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection("127.0.0.1", camera.metrics_port), 2)
+        except (OSError, asyncio.TimeoutError):
+            return None
+        try:
+            writer.write(b"GET /metrics HTTP/1.0\r\nHost: 127.0.0.1\r\n\r\n")
+            response = await asyncio.wait_for(reader.read(), 2)
+        except (OSError, asyncio.TimeoutError):
+            return None
+        finally:
+            writer.close()
+        head, _, body = response.partition(b"\r\n\r\n")
+        return parse_frames(body.decode(errors="replace"))
+
+    async def check_health(self, camera):
+        """Vérifie un serveur : processus terminé, mesures absentes ou images qui n'arrivent plus."""
+        now = time.monotonic()
+        if camera.process is not None and camera.process.returncode is not None:
+            print(camera.prefix + "[ALERT] Server exited with code " + str(camera.process.returncode))
+            camera.process = None
+            self.failed(camera)
+            return
+        if not camera.running():
+            if camera.present and now >= camera.next_start:
+                if camera.failures > 0:
+                    camera.restarts += 1
+                await self.start_camera(camera)
+            return
+        frames = await self.read_frames(camera)
+        if frames is not None and (camera.frames is None or frames > camera.frames):
+            camera.frames = frames
+            camera.last_progress = now
+            if camera.failures > 0 and now - camera.started_at >= self.stable_time:
+                print(camera.prefix + "[INFO] Server stable, failure count reset")
+                camera.failures = 0
+            return
+        if now - camera.started_at < self.startup_grace:
+            return
+        if now - camera.last_progress >= self.stall_timeout:
+            reason = "no metrics" if frames is None else "no frame"
+            print(camera.prefix + "[ALERT] Server unhealthy (" + reason + " for "
+                  + str(int(now - camera.last_progress)) + " seconds), restart")
+            await self.stop_camera(camera)
+            camera.process = None
+            self.failed(camera)
+
+    async def scan_loop(self):
+        """Recherche des caméras toutes les interval secondes."""
+        while not self.stopping.is_set():
+            started = time.monotonic()
+            await self.scan()
+            present = sum(1 for camera in self.cameras.values() if camera.present)
+            print(PREFIX + "[INFO] " + str(present) + " camera(s) found in " + str(round(time.monotonic() - started, 2))
+                  + " seconds")
+            try:
+                await asyncio.wait_for(self.stopping.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def health_loop(self):
+        """Vérification de tous les serveurs toutes les health_interval secondes."""
+        while not self.stopping.is_set():
+            await asyncio.gather(*[self.check_health(camera) for camera in list(self.cameras.values())])
+            if self.retention_args is not None:
+                await self.check_retention()
+            try:
+                await asyncio.wait_for(self.stopping.wait(), self.health_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self):
+        """Recherche et surveillance jusqu'à l'arrêt, puis arrêt de tous les serveurs."""
+        print(PREFIX + "[START] " + str(len(self.hosts)) + " address(es), camera port " + str(self.camera_port)
+              + ", server ports " + str(self.first_port) + "-" + str(self.first_port + len(self.hosts) - 1))
+        await asyncio.gather(self.scan_loop(), self.health_loop())
+        await asyncio.gather(*[self.stop_camera(camera) for camera in self.cameras.values()])
+        if self.retention is not None and self.retention.returncode is None:
+            await self.stop_process(self.retention)
+        print(PREFIX + "[INFO] All servers stopped")
+
+    def stop(self):
+        """Demande l'arrêt (Ctrl+C, SIGTERM)."""
+        print(PREFIX + "[ALERT] Stopping...")
+        self.stopping.set()
+
+
+def main():
+    """Fonction principale : vérification des arguments et démarrage du superviseur.
+
+    Les arguments qui suivent "--" sont transmis à chaque stream_and_surveillance.py.
+    """
+    usage = "Usage : supervisor.py [--hosts <192.168.10.10-20 | 192.168.10.0/24>] [--camera-port <81>]\n" \
+            "        [--first-port <8001>] [--interval <30>] [--storage-quota <GB>] [--camera-quota <GB>] [--max-age <days>]\n" \
+            "        [-- <stream_and_surveillance.py options>]"
+    args = sys.argv[1:]
+    server_args = []
+    if "--" in args:
+        server_args = args[args.index("--") + 1:]
+        args = args[:args.index("--")]
+    options = {"--hosts": DEFAULT_HOSTS, "--camera-port": "81", "--first-port": "8001", "--interval": "30",
+               "--storage-quota": "0", "--camera-quota": "0", "--max-age": "0"}
+    if len(args) % 2 == 1:
+        print(usage)
+        sys.exit()
+    for i in range(0, len(args), 2):
+        if args[i] not in options:
+            print(usage)
+            sys.exit()
+        options[args[i]] = args[i + 1]
+    for name in ("--camera-port", "--first-port", "--interval", "--storage-quota", "--camera-quota", "--max-age"):
+        if not options[name].isdigit():
+            print(name + " must be int")
+            sys.exit()
+    try:
+        hosts = parse_hosts(options["--hosts"])
+    except ValueError as err:
+        print("Invalid --hosts : " + str(err))
+        sys.exit()
+    #Quotas : un seul processus pour toutes les caméras, même catalogue que les serveurs
+    retention_args = None
+    quotas = [name for name in ("--storage-quota", "--camera-quota", "--max-age") if int(options[name]) > 0]
+    if quotas:
+        retention_args = []
+        for name in quotas:
+            retention_args += [name, options[name]]
+        if "--catalog" in server_args and server_args.index("--catalog") + 1 < len(server_args):
+            retention_args += ["--catalog", server_args[server_args.index("--catalog") + 1]]
+    loop = asyncio.get_event_loop()
+    supervisor = Supervisor(hosts, int(options["--camera-port"]), int(options["--first-port"]),
+                            interval=int(options["--interval"]), server_args=server_args, retention_args=retention_args)
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signal_number, supervisor.stop)
+    loop.run_until_complete(supervisor.run())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/2026
+
+@author: 23
+
+@desc: Tests de l'extraction des images d'un flux MJPEG (mjpeg.FrameExtractor) :\
+       taille annoncée (Content-Length) exacte, trop petite ou trop grande.
+       Usage : python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mjpeg import FrameExtractor
+
+
+def make_jpeg(size):
+    """Faux JPEG de size octets : marqueurs de début et de fin autour d'octets sans marqueur."""
+    return b'\xff\xd8' + bytes(index % 200 for index in range(size - 4)) + b'\xff\xd9'
+
+
+def make_part(jpeg, length=None):
+    """Partie multipart (en-têtes, image, fin de ligne) avec la taille annoncée length."""
+    return b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: " \
+        + str(len(jpeg) if length is None else length).encode() + b"\r\n\r\n" + jpeg + b"\r\n"
+
+
+class ContentLengthTest(unittest.TestCase):
+    """Une image est rendue dès qu'elle est complète, quelle que soit la taille annoncée."""
+    def extract(self, extractor, data):
+        """Ajoute data au tampon, renvoie les images complètes."""
+        extractor.feed(data)
+        return [bytes(frame) for header, frame in extractor.frames()]
+
+    def test_exact_length(self):
+        extractor = FrameExtractor()
+        jpeg = make_jpeg(1000)
+        self.assertEqual(self.extract(extractor, make_part(jpeg)), [jpeg])
+        self.assertEqual(extractor.frames_sized, 1)
+
+    def test_short_length(self):
+        extractor = FrameExtractor()
+        jpeg = make_jpeg(1000)
+        self.assertEqual(self.extract(extractor, make_part(jpeg, 500)), [jpeg])
+        self.assertEqual(extractor.frames_sized, 0)
+
+    def test_oversized_length(self):
+        #La dernière image avant une coupure est rendue sans attendre les octets annoncés
+        extractor = FrameExtractor()
+        first, second = make_jpeg(1000), make_jpeg(800)
+        self.assertEqual(self.extract(extractor, make_part(first, 5000)), [])
+        self.assertEqual(self.extract(extractor, b"--"), [first])
+        self.assertEqual(self.extract(extractor, make_part(second, 5000)[2:] + b"--"), [second])
+        self.assertEqual(extractor.frames_sized, 0)
+
+    def test_oversized_length_in_chunks(self):
+        #Marqueur de fin et limite de partie coupés entre deux lectures
+        extractor = FrameExtractor()
+        jpeg = make_jpeg(1000)
+        data = make_part(jpeg, 5000) + b"--frame\r\n"
+        frames = []
+        for position in range(0, len(data), 7):
+            frames += self.extract(extractor, data[position:position + 7])
+        self.assertEqual(frames, [jpeg])
+
+    def test_incomplete_frame(self):
+        extractor = FrameExtractor()
+        jpeg = make_jpeg(1000)
+        part = make_part(jpeg)
+        self.assertEqual(self.extract(extractor, part[:600]), [])
+        self.assertEqual(self.extract(extractor, part[600:]), [jpeg])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/2026
+
+@author: 23
+
+@desc: Tests de l'écriture des enregistrements (recording.RecordWriter) :\
+       un enregistrement qui suit un fichier non créé ou abandonné, ou des \
+       mouvements signalés hors enregistrement, a une ligne de catalogue propre.
+       Usage : python -m unittest discover tests
+"""
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+try:
+    import numpy as np
+    import cv2
+    from recording import RecordWriter, JpegSequenceContainer
+    from catalog import RecordingCatalog
+except ImportError as import_error:
+    raise unittest.SkipTest("numpy, cv2 and imageio are required : " + str(import_error))
+
+
+def make_jpeg(value):
+    """Petite image JPEG unie."""
+    ok, data = cv2.imencode(".jpg", np.full((32, 32, 3), value, dtype=np.uint8))
+    return data.tobytes()
+
+
+class BrokenContainer(JpegSequenceContainer):
+    """Fichier qui ne peut pas être créé."""
+    def __init__(self, path, fps):
+        raise OSError("No space left on device")
+
+
+class AbortedContainer(JpegSequenceContainer):
+    """Fichier dont l'écriture échoue après la première image."""
+    def append(self, jpeg, timestamp_us):
+        if self.offset:
+            raise OSError("No space left on device")
+        return JpegSequenceContainer.append(self, jpeg, timestamp_us)
+
+
+class RecordStatsResetTest(unittest.TestCase):
+    """Les statistiques d'un enregistrement ne viennent que de ses propres images et mouvements."""
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.catalog = RecordingCatalog(os.path.join(self.directory, "catalog.sqlite"))
+        self.writer = RecordWriter("[TEST]", os.path.join(self.directory, "cam1", ""), record_format="mjpeg",
+                                   catalog=self.catalog, camera_id=1)
+
+    def tearDown(self):
+        self.catalog.connection.close()
+        shutil.rmtree(self.directory)
+
+    def record(self, name, first_us, count):
+        """Enregistrement correct de count images (commandes exécutées dans le fil du test)."""
+        self.writer.container_class = JpegSequenceContainer
+        self.writer.handle("open", (name, 10))
+        for index in range(count):
+            self.writer.handle("frame", (make_jpeg(200), first_us + index * 100000))
+        self.writer.handle("close", None)
+
+    def check_clean(self, name, count):
+        """Une seule ligne au catalogue, celle de l'enregistrement correct, sans mouvement."""
+        rows = self.catalog.connection.execute("SELECT path, start, end, frames, peak_area, events FROM recordings").fetchall()
+        self.assertEqual(len(rows), 1)
+        path, start, end, frames, peak_area, events = rows[0]
+        self.assertTrue(path.endswith(name + JpegSequenceContainer.extension))
+        self.assertEqual(frames, count)
+        self.assertEqual(peak_area, 0)
+        self.assertEqual(json.loads(events), [])
+        self.assertAlmostEqual(end - start, (count - 1) * 0.1, places=3)
+
+    def test_after_failed_creation(self):
+        self.writer.container_class = BrokenContainer
+        self.writer.handle("open", ("rec-broken", 10))
+        self.writer.handle("motion", (1000000, 5000))
+        self.writer.handle("frame", (make_jpeg(0), 1000000))
+        self.writer.handle("close", None)
+        self.record("rec-clean", 50000000, 3)
+        self.check_clean("rec-clean", 3)
+
+    def test_after_aborted_record(self):
+        self.writer.container_class = AbortedContainer
+        self.writer.handle("open", ("rec-aborted", 10))
+        self.writer.handle("frame", (make_jpeg(0), 1000000))
+        self.writer.handle("motion", (1000000, 5000))
+        self.writer.handle("frame", (make_jpeg(0), 1100000))
+        self.writer.handle("close", None)
+        self.record("rec-clean", 50000000, 3)
+        self.check_clean("rec-clean", 3)
+
+    def test_motion_between_records(self):
+        self.writer.handle("motion", (40000000, 5000))
+        self.record("rec-clean", 50000000, 3)
+        self.check_clean("rec-clean", 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
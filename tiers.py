@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/2026
+
+@author: 23
+
+@desc: Images diffusées par niveau de qualité (protocol.TIERS).\
+       Chaque image n'est réduite et ré-encodée qu'une fois par niveau, et seulement \
+       pour les niveaux demandés par au moins un client ; le résultat est partagé \
+       par tous les clients du niveau. Le décodage se fait directement à une taille \
+       réduite (mise à l'échelle dans le domaine DCT) quand la largeur le permet.
+"""
+
+import time
+import threading
+
+import numpy as np
+import cv2
+
+import protocol
+
+#Décodage JPEG réduit (mise à l'échelle dans le domaine DCT)
+REDUCED_COLOR = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2,
+                 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+DEFAULT_QUALITY = 80
+
+
+def reduction_for(source_width, target_width):
+    """Plus grand facteur de réduction JPEG gardant une largeur au moins égale à target_width."""
+    scale = 1
+    for candidate in (2, 4, 8):
+        if source_width // candidate >= target_width:
+            scale = candidate
+    return scale
+
+
+def transcode(jpeg, tier, source_width=None):
+    """Image JPEG au niveau de qualité tier (protocol.Tier).
+
+    Renvoie (jpeg, largeur de l'image source) ou (None, source_width) si l'image est invalide.
+    """
+    scale = reduction_for(source_width, tier.width) if tier.width and source_width else 1
+    frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), REDUCED_COLOR[scale])
+    if frame is None:
+        return None, source_width
+    source_width = frame.shape[1] * scale
+    if tier.width and frame.shape[1] > tier.width:
+        height = int(round(frame.shape[0] * tier.width / float(frame.shape[1])))
+        frame = cv2.resize(frame, (tier.width, height), interpolation=cv2.INTER_AREA)
+    ok, data = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, tier.quality or DEFAULT_QUALITY])
+    return (data.tobytes() if ok else None), source_width
+
+
+class TierEncoder():
+    """Préparation des images de chaque niveau de qualité pour un diffuseur (une caméra).
+
+    admit() applique la fréquence maximale du niveau (fil de publication), prepare()
+    ajoute l'image du niveau au message (protocol.FrameMessage.payloads) si elle n'y
+    est pas déjà. prepare() peut être appelée par plusieurs fils à la fois pour des
+    niveaux différents : largeur de la source, compteurs et images du message sont
+    modifiés sous self.lock, l'encodage se fait hors du verrou.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.source_width = None
+        #Par niveau : horodatage de la dernière image admise, images encodées et temps d'encodage (s)
+        self.last_timestamps = {}
+        self.encoded_frames = {}
+        self.encode_time = {}
+
+    def admit(self, tier, message):
+        """Vrai si l'image doit être envoyée aux clients du niveau (fréquence maximale)."""
+        max_fps = protocol.TIERS[tier].max_fps
+        if not max_fps:
+            return True
+        last = self.last_timestamps.get(tier)
+        #Tolérance de 10 % sur l'intervalle pour ne pas sauter une image sur deux à cause de la gigue
+        if last is not None and message.timestamp_us - last < 900000 / max_fps:
+            return False
+        self.last_timestamps[tier] = message.timestamp_us
+        return True
+
+    def prepare(self, tier, message):
+        """Ajoute au message l'image du niveau, renvoie False si elle n'a pas pu être produite."""
+        with self.lock:
+            if tier in message.payloads:
+                return True
+            description = protocol.TIERS[tier]
+            if not description.width and not description.quality:
+                message.payloads[tier] = message.payload
+                return True
+            source_width = self.source_width
+        started = time.perf_counter()
+        data, source_width = transcode(message.payload, description, source_width)
+        with self.lock:
+            self.source_width = source_width
+            self.encode_time[tier] = self.encode_time.get(tier, 0.0) + time.perf_counter() - started
+            if data is None:
+                return False
+            self.encoded_frames[tier] = self.encoded_frames.get(tier, 0) + 1
+            message.payloads[tier] = data
+        return True
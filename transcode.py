@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 10/2026
+
+@author: 23
+
+@desc: Conversion en MP4 des enregistrements au format "mjpeg" (séquences JPEG indexées).\
+       Le programme tourne en basse priorité (nice 19) pour ne pas concurrencer la \
+       diffusion et la surveillance : il peut être lancé ponctuellement ou laissé en \
+       tâche de fond avec --watch.
+       Usage : transcode.py [<dossier>] [--watch <secondes>] [--delete]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import imageio
+import cv2
+
+from recording import JpegSequenceContainer, read_jpeg_sequence
+
+PREFIX = "[TRANSCODE]"
+
+
+def pending_recordings(directory):
+    """Enregistrements terminés (index présent) qui n'ont pas encore été convertis."""
+    pending = []
+    for root, directories, files in os.walk(directory):
+        for filename in sorted(files):
+            name, extension = os.path.splitext(filename)
+            if extension != JpegSequenceContainer.extension:
+                continue
+            if name + ".idx" in files and name + ".mp4" not in files:
+                pending.append(os.path.join(root, filename))
+    return pending
+
+
+def sequence_fps(path, default=26):
+    """Fréquence moyenne d'une séquence, calculée à partir des horodatages de l'index."""
+    first = None
+    last = None
+    count = 0
+    with open(os.path.splitext(path)[0] + ".idx", "rb") as index:
+        index.seek(JpegSequenceContainer.INDEX_HEADER.size)
+        entry_size = JpegSequenceContainer.INDEX_ENTRY.size
+        while True:
+            entry = index.read(entry_size)
+            if len(entry) < entry_size:
+                break
+            timestamp_us = JpegSequenceContainer.INDEX_ENTRY.unpack(entry)[2]
+            if first is None:
+                first = timestamp_us
+            last = timestamp_us
+            count += 1
+    if count < 2 or last <= first:
+        return default
+    return (count - 1) * 1000000.0 / (last - first)
+
+
+def transcode(path, delete=False):
+    """Convertit une séquence JPEG indexée en MP4, renvoie le chemin du fichier créé."""
+    name = os.path.splitext(path)[0]
+    #Le fichier est écrit sous un nom temporaire puis renommé une fois complet
+    temporary_path = name + ".tmp.mp4"
+    fps = sequence_fps(path)
+    frames = 0
+    writer = imageio.get_writer(temporary_path, format='mp4', mode='I', fps=fps)
+    try:
+        for timestamp_us, jpeg in read_jpeg_sequence(path):
+            frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if frame is not None:
+                writer.append_data(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+                frames += 1
+    finally:
+        writer.close()
+    os.replace(temporary_path, name + ".mp4")
+    print(PREFIX + "[INFO] " + str(path) + " -> " + str(name) + ".mp4 (" + str(frames) + " frame(s), "
+          + str(round(fps, 1)) + " fps)")
+    if delete:
+        os.remove(path)
+        os.remove(name + ".idx")
+    return name + ".mp4"
+
+
+def lower_priority():
+    """Passe le processus en priorité minimale."""
+    try:
+        os.nice(19)
+    except (AttributeError, OSError):
+        pass
+
+
+def main():
+    """Fonction principale : conversion des enregistrements en attente, une fois ou en continu."""
+    directory = "./storage/records/"
+    interval = None
+    delete = False
+    args = sys.argv[1:]
+    i = 0
+    while i < len(args):
+        if args[i] == "--watch" and i + 1 < len(args) and args[i + 1].isdigit():
+            interval = int(args[i + 1])
+            i += 1
+        elif args[i] == "--delete":
+            delete = True
+        elif not args[i].startswith("--"):
+            directory = args[i]
+        else:
+            print("Usage : transcode.py [<directory>] [--watch <seconds>] [--delete]")
+            sys.exit()
+        i += 1
+    lower_priority()
+    while True:
+        for path in pending_recordings(directory):
+            try:
+                transcode(path, delete)
+            except Exception as err:
+                print(PREFIX + "[ERROR] " + str(path) + " : " + str(err))
+        if interval is None:
+            break
+        time.sleep(interval)
+
+if __name__ == '__main__':
+    main()